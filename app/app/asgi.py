@@ -0,0 +1,21 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Serve it through gunicorn with the uvicorn worker class, for example:
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn app.asgi:application
+
+Views run in a pool of ASGI_THREADS threads while the event loop handles
+the client sockets; see core.asgi.
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -20,12 +21,16 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = '%qllz0#u50rt&jf$@=@$jd#$2snzyo)$(u(#w1_3jevbl14q)$'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', '%qllz0#u50rt&jf$@=@$jd#$2snzyo)$(u(#w1_3jevbl14q)$'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = bool(int(os.environ.get('DEBUG', 1)))
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
 
 
 # Application definition
@@ -45,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.hashers.HashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -78,16 +85,87 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# DB_POOL_MAX_SIZE > 0 hands connections back to an in-process pool at
+# the end of each request; otherwise each thread keeps its own connection
+# open for DB_CONN_MAX_AGE seconds.
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get('DB_ENGINE', 'core.backends.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'HEALTH_CHECK_INTERVAL': int(
+            os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30)
+        ),
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'IDLE_TIMEOUT': int(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+            'WAIT_TIMEOUT': int(os.environ.get('DB_POOL_WAIT_TIMEOUT', 10)),
+        } if DB_POOL_MAX_SIZE else None,
+    }
+}
+
+# Number of hash partitions on user_id `partition_products` converts the
+# product table into on PostgreSQL 11 or later, see core.partitioning
+PRODUCT_PARTITIONS = int(os.environ.get('PRODUCT_PARTITIONS', 0))
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# Local memory (LRU culled) by default, which each worker process keeps to
+# itself. docker-compose points CACHE_BACKEND/CACHE_LOCATION at memcached
+# to share it between workers (python-memcached has to be installed).
+
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+# Whether every worker sees the same default cache; response caching,
+# token lookups and rate limits only use it by default when they do
+CACHE_SHARED = not CACHE_BACKEND.endswith('.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'product-api'),
+        'OPTIONS': {} if CACHE_SHARED else {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+        },
     }
 }
 
+# Cache alias and TTL (seconds) for product list/detail responses. 0 turns
+# the cache off, the default without a shared cache: a write only
+# invalidates the responses cached by the worker that handled it
+PRODUCT_CACHE_ALIAS = 'default'
+PRODUCT_CACHE_TIMEOUT = int(
+    os.environ.get('PRODUCT_CACHE_TIMEOUT', 300 if CACHE_SHARED else 0)
+)
+
+# Lifetime of API tokens in seconds, and how often (seconds) the times
+# they were last used are written back, in one UPDATE per process
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 14 * 24 * 60 * 60))
+AUTH_TOKEN_LAST_USED_INTERVAL = int(
+    os.environ.get('AUTH_TOKEN_LAST_USED_INTERVAL', 60)
+)
+
+# Token authentication cache: the cache alias shared between workers, the
+# default one when it is shared, and the TTL in seconds. Without an alias
+# entries are kept per process, up to TOKEN_CACHE_MAX_SIZE, and a revoked
+# token stays valid in the other workers for up to the TTL, so it is short
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_ALIAS = os.environ.get(
+    'TOKEN_CACHE_ALIAS', 'default' if CACHE_SHARED else ''
+) or None
+TOKEN_CACHE_TTL = int(
+    os.environ.get('TOKEN_CACHE_TTL', 60 if TOKEN_CACHE_ALIAS else 5)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -107,6 +185,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Argon2 (argon2-cffi) or bcrypt when installed, PBKDF2 otherwise; hashes
+# made by a later hasher or with other costs are upgraded on login. At
+# most PASSWORD_HASH_CONCURRENCY hashes run at once per process, see
+# core.hashers
+PASSWORD_HASHERS = [
+    hasher for hasher, module in (
+        ('core.hashers.Argon2PasswordHasher', 'argon2'),
+        ('core.hashers.BCryptSHA256PasswordHasher', 'bcrypt'),
+        ('core.hashers.PBKDF2PasswordHasher', None),
+        ('core.hashers.PBKDF2SHA1PasswordHasher', None),
+    ) if module is None or find_spec(module) is not None
+]
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)
+)
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 150000)
+)
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 2))
+PASSWORD_HASH_MAX_WAITING = int(os.environ.get('PASSWORD_HASH_MAX_WAITING', 0))
+PASSWORD_HASH_WAIT_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 1)
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -131,6 +238,137 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Uploads are content-addressed and stored once; see core.storage
+DEFAULT_FILE_STORAGE = 'core.storage.MediaStorage'
+
+# Media files are served by core.media. Names that never change content
+# are cached for a year, other files for MEDIA_CACHE_MAX_AGE seconds. Set
+# MEDIA_OFFLOAD to `x-accel-redirect` (nginx, with an internal location
+# at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or `x-sendfile` to let the
+# proxy send the files
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 24 * 60 * 60))
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_BLOCK_SIZE = 64 * 1024
+
+# Threads per worker running views under ASGI (app/asgi.py); the event
+# loop keeps idle and slow connections off them
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+# Uploaded product images are resized in a background thread pool; turn
+# IMAGE_PROCESSING_ASYNC off to process them inside the request instead
+IMAGE_PROCESSING_ASYNC = bool(int(os.environ.get('IMAGE_PROCESSING_ASYNC', 1)))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+
+# Limits of uploaded images, checked while they stream in (see
+# product.uploads), and the lifetime of resumable upload sessions
+IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('IMAGE_MAX_UPLOAD_SIZE', 20 * 1024 * 1024)
+)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 40000000))
+# Request bodies are buffered whole under ASGI, so the handler refuses
+# anything larger than an image upload with its multipart framing
+ASGI_MAX_BODY_SIZE = int(
+    os.environ.get('ASGI_MAX_BODY_SIZE', IMAGE_MAX_UPLOAD_SIZE + 1024 * 1024)
+)
+IMAGE_UPLOAD_SESSION_TTL = int(
+    os.environ.get('IMAGE_UPLOAD_SESSION_TTL', 24 * 60 * 60)
+)
+
+# Delta sync (product.sync): how long tombstones of deleted rows are kept,
+# and how many seconds the sync cursor stays behind the clock so writes
+# still committing aren't skipped
+SYNC_TOMBSTONE_TTL = int(
+    os.environ.get('SYNC_TOMBSTONE_TTL', 90 * 24 * 60 * 60)
+)
+SYNC_SETTLE_TIME = int(os.environ.get('SYNC_SETTLE_TIME', 5))
+
+# orjson-backed JSON with a stdlib fallback; see core.renderers.
+# NUM_PROXIES is the number of reverse proxies in front of the app: client
+# addresses, throttled per address, are read that many hops back in
+# X-Forwarded-For. The default of 0 ignores the header, which any client
+# can set, and uses the connecting address
+REST_FRAMEWORK = {
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.BucketRateThrottle',
+    ),
+    # Token bucket rates by `<scope>.<action>:<tier>`, see core.throttling:
+    # every API view is limited by the `api` rate unless a more specific
+    # one applies. Token requests are limited per client address and per
+    # account, and signups per client address; see user.throttles
+    'DEFAULT_THROTTLE_RATES': {
+        'api': os.environ.get('API_THROTTLE_RATE', '1200/min'),
+        'api:staff': os.environ.get('API_STAFF_THROTTLE_RATE', '6000/min'),
+        'products.list': os.environ.get('PRODUCT_LIST_THROTTLE_RATE', '600/min'),
+        'products.list:staff': '3000/min',
+        'products.create': os.environ.get(
+            'PRODUCT_CREATE_THROTTLE_RATE', '120/min'
+        ),
+        'products.bulk': os.environ.get('PRODUCT_BULK_THROTTLE_RATE', '30/min'),
+        'products.export': '10/min',
+        'products.upload_image': os.environ.get(
+            'PRODUCT_UPLOAD_THROTTLE_RATE', '30/min'
+        ),
+        'products.image_upload': os.environ.get(
+            'PRODUCT_UPLOAD_THROTTLE_RATE', '30/min'
+        ),
+        'token': os.environ.get('TOKEN_THROTTLE_RATE', '10/min'),
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '30/min'),
+        'login_account': os.environ.get('LOGIN_ACCOUNT_THROTTLE_RATE', '10/min'),
+        'signup': os.environ.get('SIGNUP_THROTTLE_RATE', '10/min'),
+    },
+}
+
+# Turn API_THROTTLE off to lift every rate limit. Buckets are kept in
+# THROTTLE_CACHE_ALIAS, the default cache when it is shared by every
+# worker. Without an alias each process keeps its own, at most
+# THROTTLE_MAX_KEYS of them, and allows the full rate by itself
+API_THROTTLE = bool(int(os.environ.get('API_THROTTLE', 1)))
+THROTTLE_MAX_KEYS = int(os.environ.get('THROTTLE_MAX_KEYS', 100000))
+THROTTLE_CACHE_ALIAS = os.environ.get(
+    'THROTTLE_CACHE_ALIAS', 'default' if CACHE_SHARED else ''
+) or None
+
+# Default page size of list endpoints and the upper bound for their
+# `limit` query parameter
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
+# Bulk product writes: items accepted per request and rows per INSERT
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 50000))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+
+# Render product lists and details from `.values()` rows instead of model
+# instances; the JSON is identical, only cheaper to build
+API_FAST_SERIALIZERS = bool(int(os.environ.get('API_FAST_SERIALIZERS', 1)))
+
+# Request metrics served at /metrics; see core.middleware. Every request
+# records its time and size, METRICS_SAMPLE_RATE of them also their query
+# count, query time, serializer and render time. A query repeated
+# METRICS_DUPLICATE_QUERIES times in one request is logged as a likely N+1.
+# Set METRICS_TOKEN to require it as a bearer token on /metrics.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.1))
+METRICS_DUPLICATE_QUERIES = int(os.environ.get('METRICS_DUPLICATE_QUERIES', 10))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 1)))
+
+# PostgreSQL text search configuration used to index and query products
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'english')
+
+# Products read per server-side cursor fetch in catalog exports
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
 """Create a new model
 core is the app
 User is the model inside the models.py"""
@@ -30,3 +30,4 @@ admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Attribute)
 admin.site.register(models.Product)
+admin.site.register(models.AuthToken)
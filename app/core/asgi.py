@@ -0,0 +1,212 @@
+"""ASGI front end for the Django application
+
+Django 2.2 has neither async views nor an async ORM, so the views still
+run on threads, but only for as long as they compute a response. The
+handler reads request bodies and writes responses on the event loop and
+runs the views in a bounded thread pool (ASGI_THREADS), so a slow client
+holds a socket rather than a thread and a worker can keep thousands of
+keep-alive connections open. Every request goes through the same
+middleware and views as under WSGI, so the responses are identical.
+
+Streaming responses (exports, files) are the exception: they iterate on
+their thread until the last chunk has been handed to the server.
+
+Bodies are buffered before the view sees them, so they are capped at
+ASGI_MAX_BODY_SIZE here; Django's own upload limits only apply once the
+view reads the buffered body.
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+
+def build_environ(scope, body):
+    """Return the WSGI environ of an ASGI HTTP scope"""
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'] = server[0]
+    environ['SERVER_PORT'] = str(server[1] or 80)
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        if name in environ:
+            value = environ[name] + ',' + value
+        environ[name] = value
+    if 'CONTENT_LENGTH' not in environ:
+        # Chunked bodies carry no length but are buffered whole by now,
+        # and Django reads nothing without one
+        body.seek(0, 2)
+        length = body.tell()
+        body.seek(0)
+        if length:
+            environ['CONTENT_LENGTH'] = str(length)
+    return environ
+
+
+class ASGIHandler:
+    """Serve a WSGI application over ASGI from a bounded thread pool"""
+
+    def __init__(self, wsgi_application=None, executor=None):
+        self.wsgi_application = wsgi_application or get_wsgi_application()
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope %r' % scope['type'])
+
+        body = await self.read_body(scope, receive, send)
+        if body is None:
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            start, chunks = await loop.run_in_executor(
+                self.executor, self.run_wsgi, scope, body, send, loop
+            )
+        finally:
+            body.close()
+        if start is not None:
+            await send(start)
+            await send({
+                'type': 'http.response.body',
+                'body': b''.join(chunks),
+            })
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, scope, receive, send):
+        """Buffer the request body
+
+        Return None if the client left, or if the body is larger than
+        ASGI_MAX_BODY_SIZE, which is refused with a 413 as soon as the
+        content length or the bytes received so far go over it.
+        """
+        limit = settings.ASGI_MAX_BODY_SIZE
+        length = dict(scope.get('headers', ())).get(b'content-length', b'')
+        if length.isdigit() and int(length) > limit:
+            await self.send_too_large(send)
+            return None
+
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                body.close()
+                await self.send_too_large(send)
+                return None
+            body.write(chunk)
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    async def send_too_large(self, send):
+        content = json.dumps({'detail': 'Request body is too large.'})
+        content = content.encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(content)).encode()),
+                (b'connection', b'close'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    def run_wsgi(self, scope, body, send, loop):
+        """Run the view on a pool thread
+
+        Return the response start message and body chunks for the event
+        loop to send, or (None, None) for a streaming response, which is
+        sent from this thread as it is iterated.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            started['message'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in headers
+                ],
+            }
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = self.wsgi_application(
+            build_environ(scope, body), start_response
+        )
+        # Closing the response fires request_finished, which releases this
+        # thread's database connection, so it has to happen here
+        try:
+            if not getattr(response, 'streaming', False):
+                return started['message'], list(response)
+            started['sent'] = True
+            send_from_thread(started['message'])
+            for chunk in response:
+                if chunk:
+                    send_from_thread({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            send_from_thread({'type': 'http.response.body'})
+            return None, None
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
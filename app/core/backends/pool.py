@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the wait timeout"""
+
+
+class ConnectionPool:
+    """A thread-safe pool of DB-API connections
+
+    Connections are created on demand through `connect` up to `max_size`.
+    Idle connections older than `idle_timeout` seconds are closed on
+    checkout, and ones idle for longer than `health_check_interval` are
+    pinged with `check` before being handed out.
+    """
+
+    def __init__(self, connect, max_size=10, idle_timeout=300,
+                 wait_timeout=10, check=None, health_check_interval=30,
+                 clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self.check = check
+        self.health_check_interval = health_check_interval
+        self.clock = clock
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._metrics = dict.fromkeys(
+            ('checkouts', 'waits', 'timeouts', 'created', 'discarded'), 0
+        )
+
+    def getconn(self):
+        """Check out a connection, waiting for one if the pool is full"""
+        deadline = None
+        with self._cond:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    self._metrics['checkouts'] += 1
+                    return conn
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                if deadline is None:
+                    self._metrics['waits'] += 1
+                    deadline = self.clock() + self.wait_timeout
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeout(
+                        'No connection available within %ss (max_size=%s)'
+                        % (self.wait_timeout, self.max_size)
+                    )
+                self._cond.wait(remaining)
+
+        # Connect outside the lock so a slow server doesn't block returns
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._metrics['created'] += 1
+            self._metrics['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection, closing it instead if `discard` is set"""
+        with self._cond:
+            if discard:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, self.clock()))
+                self._reap()
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._cond:
+            while self._idle:
+                conn, _last_used = self._idle.popleft()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._metrics,
+                size=self._size,
+                idle=len(self._idle),
+                max_size=self.max_size,
+            )
+
+    def _reap(self):
+        # The oldest idle connections sit at the left end
+        if self.idle_timeout is None:
+            return
+        now = self.clock()
+        while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+            conn, _last_used = self._idle.popleft()
+            self._discard(conn)
+
+    def _take_idle(self):
+        # Most recently used first: it is the most likely to still be alive
+        # and lets the oldest ones age out under the idle timeout.
+        self._reap()
+        while self._idle:
+            conn, last_used = self._idle.pop()
+            idle_for = self.clock() - last_used
+            if self.check is not None and \
+                    self.health_check_interval is not None and \
+                    idle_for >= self.health_check_interval and \
+                    not self._is_usable(conn):
+                self._discard(conn)
+                continue
+            return conn
+        return None
+
+    def _is_usable(self, conn):
+        try:
+            return self.check(conn)
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._size -= 1
+        self._metrics['discarded'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,157 @@
+"""PostgreSQL backend with connection health checks and optional pooling
+
+Configure it on a DATABASES entry:
+
+    'ENGINE': 'core.backends.postgresql',
+    'HEALTH_CHECK_INTERVAL': 30,
+    'POOL': {'MAX_SIZE': 10, 'IDLE_TIMEOUT': 300, 'WAIT_TIMEOUT': 10},
+
+Without `POOL` it behaves like the stock backend, except that a persistent
+connection (CONN_MAX_AGE > 0) that sat idle for longer than
+HEALTH_CHECK_INTERVAL seconds is pinged before a request reuses it.
+With `POOL`, closing the connection hands it back to a per-process pool
+shared by every thread, so set CONN_MAX_AGE to 0.
+"""
+import functools
+import threading
+import time
+
+from django.db.backends.postgresql import base, creation
+
+from core.backends.pool import ConnectionPool, PoolTimeout
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    """Return the pool behind a database alias, if it has one"""
+    return _pools.get(alias)
+
+
+def pool_stats():
+    """Return the metrics of every pool in this process keyed by alias"""
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def reset_pools(close=True):
+    """Forget every pool, closing their idle connections if `close` is set
+
+    A forked worker must pass close=False: the sockets it inherited still
+    belong to the parent's sessions.
+    """
+    with _pools_lock:
+        if close:
+            for pool in _pools.values():
+                pool.close()
+        _pools.clear()
+
+
+def _connect(params, isolation_level=None):
+    conn = Database.connect(**params)
+    if isolation_level is not None and \
+            isolation_level != conn.isolation_level:
+        conn.set_session(isolation_level=isolation_level)
+    return conn
+
+
+def _ping(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    conn.rollback()
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use
+        pool = get_pool(self.connection.alias)
+        if pool is not None:
+            pool.close()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last_used = None
+
+    @property
+    def health_check_interval(self):
+        return self.settings_dict.get('HEALTH_CHECK_INTERVAL')
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        params = self.get_connection_params()
+        pool = _pools.get(self.alias)
+        if pool is None or pool.params != params:
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None or pool.params != params:
+                    # The settings changed under us (the test runner
+                    # switching to the test database): start afresh.
+                    if pool is not None:
+                        pool.close()
+                    pool = _pools[self.alias] = ConnectionPool(
+                        functools.partial(
+                            _connect, params,
+                            self.settings_dict['OPTIONS'].get(
+                                'isolation_level'
+                            ),
+                        ),
+                        max_size=options.get('MAX_SIZE', 10),
+                        idle_timeout=options.get('IDLE_TIMEOUT', 300),
+                        wait_timeout=options.get('WAIT_TIMEOUT', 10),
+                        check=_ping,
+                        health_check_interval=self.health_check_interval,
+                    )
+                    pool.params = params
+        return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.getconn()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        conn = self.connection
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                # Leave no transaction open for the next borrower
+                conn.rollback()
+            except Database.Error:
+                discard = True
+        pool.putconn(conn, discard=discard)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self.connection is None:
+            return
+        now = time.monotonic()
+        interval = self.health_check_interval
+        if interval is not None and self._last_used is not None and \
+                now - self._last_used >= interval and not self.is_usable():
+            self.close()
+            self._last_used = None
+            return
+        self._last_used = now
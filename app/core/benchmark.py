@@ -0,0 +1,275 @@
+"""Benchmark harness for the product API
+
+Scenarios are plain request descriptions driven either in-process through
+Django's test client, where the queries of every request are counted too,
+or over HTTP against a running server. Results are summarized per
+scenario and can be compared against the results of an earlier run.
+"""
+import io
+import json
+import math
+import subprocess
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+
+Request = namedtuple('Request', 'method path data content_type')
+Sample = namedtuple('Sample', 'seconds status queries')
+
+
+class BenchContext:
+    """IDs and credentials of the seeded user the scenarios run as"""
+
+    def __init__(self, token, product_ids, tag_ids):
+        self.token = token
+        self.product_ids = product_ids
+        self.tag_ids = tag_ids
+
+    def product_id(self, i):
+        return self.product_ids[i % len(self.product_ids)]
+
+    def tag_id(self, i):
+        return self.tag_ids[i % len(self.tag_ids)]
+
+
+def _jpeg(size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(120, 80, 40)).save(buffer, format='JPEG')
+    buffer.seek(0)
+    buffer.name = 'bench.jpg'
+    return buffer
+
+
+def _list(ctx, i):
+    return Request('get', '/api/product/products/', None, None)
+
+
+def _detail(ctx, i):
+    return Request(
+        'get', f'/api/product/products/{ctx.product_id(i)}/', None, None
+    )
+
+
+def _filter(ctx, i):
+    return Request(
+        'get', f'/api/product/products/?tags={ctx.tag_id(i)}', None, None
+    )
+
+
+def _search(ctx, i):
+    return Request(
+        'get', f'/api/product/products/search/?q=product+{i % 10}', None,
+        None
+    )
+
+
+def _create(ctx, i):
+    body = {
+        'title': f'Bench product {uuid.uuid4().hex[:8]}',
+        'time_minutes': 5,
+        'price': '9.99',
+        'tags': [ctx.tag_id(i)],
+        'attributes': [],
+    }
+    return Request(
+        'post', '/api/product/products/', json.dumps(body), 'application/json'
+    )
+
+
+def _upload(ctx, i):
+    return Request(
+        'post',
+        f'/api/product/products/{ctx.product_id(i)}/upload-image/',
+        {'image': _jpeg()},
+        None,
+    )
+
+
+def _list_1k(ctx, i):
+    return Request('get', '/api/product/products/?limit=1000', None, None)
+
+
+SCENARIOS = {
+    'list': _list,
+    'list_1k': _list_1k,
+    'detail': _detail,
+    'filter': _filter,
+    'search': _search,
+    'create': _create,
+    'upload': _upload,
+}
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of the values"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(samples, elapsed):
+    """Summarize the samples of one scenario"""
+    seconds = [sample.seconds for sample in samples]
+    queries = [s.queries for s in samples if s.queries is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 400),
+        'p50_ms': round(percentile(seconds, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(seconds, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 0.99) * 1000, 3),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3),
+        'throughput_rps': (
+            round(len(samples) / elapsed, 2) if elapsed else None
+        ),
+        'queries_per_request': (
+            round(sum(queries) / len(queries), 2) if queries else None
+        ),
+    }
+
+
+class InProcessRunner:
+    """Drive requests through Django's test client, counting queries"""
+
+    def __init__(self, token):
+        self.client = Client(
+            HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Token {token}'
+        )
+
+    def __call__(self, request):
+        kwargs = {}
+        if request.data is not None:
+            kwargs['data'] = request.data
+        if request.content_type:
+            kwargs['content_type'] = request.content_type
+        send = getattr(self.client, request.method)
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(request.path, **kwargs)
+            seconds = time.perf_counter() - start
+
+        return Sample(seconds, response.status_code, len(queries))
+
+
+class HttpRunner:
+    """Drive requests against a running server over HTTP"""
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def _encode(self, request):
+        if request.data is None:
+            return None, None
+        if request.content_type:
+            return request.data.encode(), request.content_type
+
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in request.data.items():
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; '
+                f'name="{name}"; filename="{value.name}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'.encode()
+                + value.read() + b'\r\n'
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    def __call__(self, request):
+        body, content_type = self._encode(request)
+        http_request = urllib.request.Request(
+            self.base_url + request.path,
+            data=body,
+            method=request.method.upper(),
+            headers={'Authorization': f'Token {self.token}'},
+        )
+        if content_type:
+            http_request.add_header('Content-Type', content_type)
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        return Sample(time.perf_counter() - start, status, None)
+
+
+def run_scenario(runner, build, ctx, requests, concurrency=1, warmup=0):
+    """Run one scenario and return its summary"""
+    for i in range(warmup):
+        runner(build(ctx, i))
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(
+                lambda i: runner(build(ctx, i)), range(requests)
+            ))
+    else:
+        samples = [runner(build(ctx, i)) for i in range(requests)]
+
+    return summarize(samples, time.perf_counter() - start)
+
+
+def best_of(func, repeat):
+    """Return the fastest of `repeat` timed calls of func in seconds"""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def git_revision():
+    """Return the current commit hash, if known"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """List the budget regressions of results against a baseline run
+
+    Latency may grow by `tolerance` (a fraction) over the baseline; the
+    number of queries per request may not grow at all.
+    """
+    regressions = []
+    for name, summary in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            limit = base[metric] * (1 + tolerance)
+            if summary[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {summary[metric]} > {limit:.3f}'
+                )
+
+        queries, base_queries = (
+            summary['queries_per_request'], base['queries_per_request']
+        )
+        if None not in (queries, base_queries) and queries > base_queries:
+            regressions.append(
+                f'{name}: queries_per_request {queries} > {base_queries}'
+            )
+
+    return regressions
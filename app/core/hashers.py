@@ -0,0 +1,160 @@
+"""Password hashers bounded to a few concurrent hashes per process
+
+Hashing a password is deliberately expensive. These hashers share one
+semaphore of PASSWORD_HASH_CONCURRENCY slots, so a burst of logins or
+signups can't take every worker thread and CPU away from the catalog
+endpoints. When every slot is taken a hash fails at once with
+HashingBusy, unless fewer than PASSWORD_HASH_MAX_WAITING threads are
+queued already; a queued hash waits up to PASSWORD_HASH_WAIT_TIMEOUT
+seconds. Keep the slots and the queue well below the threads of a worker,
+since a waiting thread serves nothing else.
+
+HashingBusy is a plain exception, since the hashers also run outside the
+API (admin login, management commands); HashingBusyMiddleware answers
+any request that raised it with a 503.
+
+Django rehashes a password on login whenever its stored hash isn't the
+preferred (first) hasher's or uses other parameters, so changing the
+cost settings or installing argon2-cffi upgrades hashes as users log in.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils.translation import ugettext_lazy as _
+
+
+_slots = None
+_slots_lock = threading.Lock()
+_waiting = 0
+_held = threading.local()
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up in time"""
+
+
+class HashingBusyMiddleware:
+    """Answer requests that found every hashing slot taken with a 503"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        return JsonResponse(
+            {'detail': _('Too many logins in progress, try again shortly.')},
+            status=503
+        )
+
+
+def _semaphore():
+    global _slots
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASH_CONCURRENCY
+                )
+    return _slots
+
+
+@receiver(setting_changed)
+def reset(**kwargs):
+    """Forget the semaphore, to resize it after the settings change"""
+    global _slots
+    if kwargs.get('setting', 'PASSWORD_HASH_CONCURRENCY') == (
+            'PASSWORD_HASH_CONCURRENCY'):
+        _slots = None
+
+
+def _queue_for(slots):
+    """Wait for a slot, unless the queue for them is full"""
+    global _waiting
+    with _slots_lock:
+        if _waiting >= settings.PASSWORD_HASH_MAX_WAITING:
+            raise HashingBusy()
+        _waiting += 1
+    try:
+        acquired = slots.acquire(timeout=settings.PASSWORD_HASH_WAIT_TIMEOUT)
+    finally:
+        with _slots_lock:
+            _waiting -= 1
+    if not acquired:
+        raise HashingBusy()
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the hashing slots of this process
+
+    Re-entrant, since verifying a password encodes it again.
+    """
+    if getattr(_held, 'slot', False):
+        yield
+        return
+
+    slots = _semaphore()
+    if not slots.acquire(blocking=False):
+        _queue_for(slots)
+    _held.slot = True
+    try:
+        yield
+    finally:
+        _held.slot = False
+        slots.release()
+
+
+class BoundedHasherMixin:
+
+    def encode(self, *args, **kwargs):
+        with hashing_slot():
+            return super().encode(*args, **kwargs)
+
+    def verify(self, password, encoded):
+        with hashing_slot():
+            return super().verify(password, encoded)
+
+
+class Argon2PasswordHasher(BoundedHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2 with its costs taken from the settings"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(
+        BoundedHasherMixin, hashers.BCryptSHA256PasswordHasher):
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_BCRYPT_ROUNDS
+
+
+class PBKDF2PasswordHasher(BoundedHasherMixin, hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class PBKDF2SHA1PasswordHasher(
+        BoundedHasherMixin, hashers.PBKDF2SHA1PasswordHasher):
+    pass
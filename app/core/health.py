@@ -0,0 +1,157 @@
+"""Liveness and readiness probes
+
+`/healthz` only says the process is serving requests. `/readyz` pings the
+database and every configured cache and checks that no migration is
+pending. The migration check compares a digest of the migration files
+with the one `migrate_if_needed` stamped into the database, and only
+builds Django's migration plan when they differ.
+"""
+import hashlib
+import importlib.util
+import os
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+from core.models import SchemaStamp
+
+
+_digest = None
+_migrated = False
+
+
+def migration_digest():
+    """Return a SHA-256 digest of every installed app's migration files
+
+    The files are read, not imported, so this is cheap enough to run on
+    every start; the result is kept for the life of the process.
+    """
+    global _digest
+    if _digest is not None:
+        return _digest
+
+    digest = hashlib.sha256()
+    for app_config in apps.get_app_configs():
+        module_name, _explicit = MigrationLoader.migrations_module(
+            app_config.label
+        )
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except ImportError:
+            spec = None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+
+        for directory in spec.submodule_search_locations:
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.py'):
+                    continue
+                digest.update(f'{app_config.label}/{name}\0'.encode())
+                with open(os.path.join(directory, name), 'rb') as source:
+                    digest.update(source.read())
+
+    _digest = digest.hexdigest()
+    return _digest
+
+
+def stamped_digest(using=DEFAULT_DB_ALIAS):
+    """Return the digest stamped by the last migrate_if_needed, if any"""
+    try:
+        return SchemaStamp.objects.using(using).values_list(
+            'digest', flat=True
+        ).order_by('-pk').first()
+    except DatabaseError:
+        # No stamp table before the first migration
+        return None
+
+
+def stamp(digest, using=DEFAULT_DB_ALIAS):
+    """Record the digest of the migrations just applied"""
+    SchemaStamp.objects.using(using).update_or_create(
+        pk=1, defaults={'digest': digest}
+    )
+
+
+def pending_migrations(using=DEFAULT_DB_ALIAS):
+    """Return the migrations Django would still apply"""
+    executor = MigrationExecutor(connections[using])
+    return [
+        migration for migration, backwards in executor.migration_plan(
+            executor.loader.graph.leaf_nodes()
+        )
+    ]
+
+
+def check_database():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_caches():
+    key = f'readyz:{uuid.uuid4().hex}'
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        cache.set(key, 1, 10)
+        if cache.get(key) != 1:
+            raise RuntimeError(f'cache {alias} lost a value')
+        cache.delete(key)
+
+
+def check_migrations():
+    # Migrations don't get unapplied under a running process
+    global _migrated
+    if _migrated:
+        return
+    if stamped_digest() != migration_digest() and pending_migrations():
+        raise RuntimeError('unapplied migrations')
+    _migrated = True
+
+
+CHECKS = (
+    ('database', check_database),
+    ('cache', check_caches),
+    ('migrations', check_migrations),
+)
+
+
+def run_checks():
+    """Run every readiness check and return their results by name"""
+    results = {}
+    for name, check in CHECKS:
+        start = time.perf_counter()
+        try:
+            check()
+        except Exception as exc:
+            result = {'ok': False, 'error': type(exc).__name__}
+        else:
+            result = {'ok': True}
+        result['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        results[name] = result
+
+    return results
+
+
+@never_cache
+def healthz(request):
+    """Report that the process is alive"""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+def readyz(request):
+    """Report whether the dependencies of the API are usable"""
+    checks = run_checks()
+    ready = all(result['ok'] for result in checks.values())
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503
+    )
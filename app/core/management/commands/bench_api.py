@@ -0,0 +1,133 @@
+import json
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import benchmark
+from core.management.commands.seed_catalog import bench_email
+from core.models import AuthToken, Product, Tag
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the product API endpoints"""
+    help = 'Measure latency, throughput and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios', default=','.join(benchmark.SCENARIOS),
+            help='Comma separated scenarios: '
+                 + ', '.join(benchmark.SCENARIOS)
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server; runs in-process if omitted'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Concurrent clients (HTTP mode only)'
+        )
+        parser.add_argument(
+            '--user', type=int, default=0,
+            help='Index of the seeded user to run as'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Disable the product response cache (in-process only)'
+        )
+        parser.add_argument('--output', help='Write JSON results here')
+        parser.add_argument(
+            '--baseline', help='JSON results of an earlier run to compare to'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Allowed latency growth over the baseline, as a fraction'
+        )
+
+    def handle(self, *args, **options):
+        names = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(names) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}')
+
+        ctx = self._context(options['user'])
+        if options['url']:
+            runner = benchmark.HttpRunner(options['url'], ctx.token)
+            concurrency = options['concurrency']
+        else:
+            runner = benchmark.InProcessRunner(ctx.token)
+            concurrency = 1
+
+        results = {
+            'meta': {
+                'revision': benchmark.git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'mode': 'http' if options['url'] else 'in-process',
+                'requests': options['requests'],
+                'concurrency': concurrency,
+            },
+            'scenarios': {},
+        }
+        with ExitStack() as stack:
+            if not options['url']:
+                # The test client's host is not in a production host list,
+                # and one user would soon run out of the write rates
+                stack.enter_context(override_settings(
+                    ALLOWED_HOSTS=['*'], API_THROTTLE=False
+                ))
+            if options['no_cache']:
+                stack.enter_context(override_settings(PRODUCT_CACHE_TIMEOUT=0))
+            for name in names:
+                summary = benchmark.run_scenario(
+                    runner, benchmark.SCENARIOS[name], ctx,
+                    options['requests'], concurrency, options['warmup']
+                )
+                results['scenarios'][name] = summary
+                self.stdout.write(self._format(name, summary))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = benchmark.compare(
+                    results, json.load(baseline), options['tolerance']
+                )
+            if regressions:
+                raise CommandError(
+                    'Budget regressions:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Within budget!'))
+
+    def _context(self, index):
+        user = get_user_model().objects.filter(
+            email=bench_email(index)
+        ).first()
+        if user is None:
+            raise CommandError('Run seed_catalog before benchmarking')
+
+        product_ids = list(Product.objects.filter(user=user).values_list(
+            'id', flat=True
+        )[:1000])
+        tag_ids = list(Tag.objects.filter(user=user).values_list(
+            'id', flat=True
+        ))
+        if not product_ids or not tag_ids:
+            raise CommandError('The seeded user needs products and tags')
+
+        return benchmark.BenchContext(
+            AuthToken.objects.current(user).key, product_ids, tag_ids
+        )
+
+    def _format(self, name, summary):
+        return (
+            f'{name:<8} p50={summary["p50_ms"]}ms p95={summary["p95_ms"]}ms '
+            f'p99={summary["p99_ms"]}ms rps={summary["throughput_rps"]} '
+            f'queries={summary["queries_per_request"]} '
+            f'errors={summary["errors"]}'
+        )
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+
+PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    """Django command to measure password checks per second"""
+    help = 'Time the password check of a login with each hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', action='append', dest='hashers',
+            help='Algorithm to time, e.g. argon2 (default: every hasher)'
+        )
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument(
+            '--threads', type=int, default=None,
+            help='Concurrent logins (default PASSWORD_HASH_CONCURRENCY)'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads'] or settings.PASSWORD_HASH_CONCURRENCY
+        cores = min(
+            threads, settings.PASSWORD_HASH_CONCURRENCY, os.cpu_count() or 1
+        )
+        algorithms = options['hashers'] or [
+            hasher.algorithm for hasher in get_hashers()
+        ]
+        for algorithm in algorithms:
+            try:
+                hasher = get_hasher(algorithm)
+            except ValueError as exc:
+                raise CommandError(exc)
+
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+            logins, elapsed = self.run(
+                hasher, encoded, threads, options['seconds']
+            )
+            rate = logins / elapsed
+            self.stdout.write(
+                f'{algorithm:<16} {rate:8.1f} logins/s '
+                f'{rate / cores:8.1f} per core '
+                f'{cores / rate * 1000:8.2f}ms each'
+            )
+
+    def run(self, hasher, encoded, threads, seconds):
+        """Verify the password on `threads` threads for `seconds`"""
+        counts = [0] * threads
+        rejected = []
+        deadline = time.perf_counter() + seconds
+
+        def login(index):
+            while time.perf_counter() < deadline:
+                if not hasher.verify(PASSWORD, encoded):
+                    rejected.append(index)
+                    return
+                counts[index] += 1
+
+        start = time.perf_counter()
+        workers = [
+            threading.Thread(target=login, args=(i,)) for i in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if rejected:
+            raise CommandError(f'{hasher.algorithm} rejected the password')
+        return max(sum(counts), 1), time.perf_counter() - start
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from core.management.commands.seed_catalog import bench_email
+from core.models import Product
+from product import search
+
+
+INDEX = 'product_search_vector_idx'
+QUERIES = ['product', 'prod', 'product 1', 'tag 2', 'attribute 3 prod']
+
+
+class Command(BaseCommand):
+    """Django command to time full-text product search on PostgreSQL"""
+    help = 'Time product search queries against the seeded catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries', nargs='*', default=QUERIES,
+            help='Search texts to time (default: word, prefix & multi-term)'
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument(
+            '--budget', type=float, default=0,
+            help='Fail if a query p95 exceeds this many milliseconds'
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError(
+                'Search vectors are PostgreSQL only; other databases use the '
+                'substring fallback'
+            )
+        user = get_user_model().objects.filter(email=bench_email(0)).first()
+        if user is None:
+            raise CommandError('Run seed_catalog before benchmarking')
+
+        products = Product.objects.filter(user=user)
+        missing = products.filter(search_vector=None).count()
+        if missing:
+            start = time.perf_counter()
+            search.refresh_search_vectors(user_id=user.pk)
+            self.stdout.write(
+                f'Refreshed {missing} search vectors in '
+                f'{time.perf_counter() - start:.1f}s'
+            )
+
+        slow = []
+        for text in options['queries']:
+            queryset = search.search_products(products, text)
+            queryset = queryset.values_list('id', flat=True)[:options['limit']]
+            plan = queryset.explain()
+
+            samples = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                rows = len(queryset.all())
+                samples.append(time.perf_counter() - start)
+            p95 = benchmark.percentile(samples, 0.95) * 1000
+            self.stdout.write(f'{text!r:<20} ' + ' '.join(
+                f'p{int(fraction * 100)}='
+                f'{benchmark.percentile(samples, fraction) * 1000:.3f}ms'
+                for fraction in (0.5, 0.95, 0.99)
+            ) + f' rows={rows} index={"yes" if INDEX in plan else "no"}')
+            if options['budget'] and p95 > options['budget']:
+                slow.append(f'{text!r} p95 {p95:.3f}ms')
+
+        if slow:
+            raise CommandError(
+                f'Over the {options["budget"]}ms budget: ' + ', '.join(slow)
+            )
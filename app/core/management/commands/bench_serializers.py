@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core import benchmark
+from core.management.commands.seed_catalog import bench_email
+from core.models import Attribute, Product, Tag
+from product import serializers
+
+
+PATHS = (
+    ('model', serializers.ProductSerializer),
+    ('values', serializers.ProductValuesSerializer),
+)
+
+
+class Command(BaseCommand):
+    """Django command to compare the product list serializer paths"""
+    help = 'Time fetching and rendering product rows, in ms per 1k rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--user', type=int, default=0,
+            help='Index of the seeded user to run as'
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(
+            email=bench_email(options['user'])
+        ).first()
+        if user is None:
+            raise CommandError('Run seed_catalog before benchmarking')
+
+        products = Product.objects.filter(user=user).order_by('-id')[
+            :options['rows']
+        ]
+        rows = products.count()
+        if not rows:
+            raise CommandError('The seeded user has no products')
+
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+        context = {'request': request}
+        renderer = JSONRenderer()
+        timings, bodies = {}, {}
+        for name, serializer_class in PATHS:
+            def fetch():
+                return list(self._queryset(products, serializer_class))
+
+            fetched = fetch()
+
+            def render():
+                return renderer.render(serializer_class(
+                    fetched, many=True, context=context
+                ).data)
+
+            bodies[name] = render()
+            timings[name] = {
+                phase: benchmark.best_of(func, options['repeat'])
+                * 1000 * 1000 / rows
+                for phase, func in (('fetch', fetch), ('render', render))
+            }
+            self.stdout.write(
+                f'{name:<7} fetch={timings[name]["fetch"]:.3f}ms '
+                f'render={timings[name]["render"]:.3f}ms per 1k rows'
+            )
+
+        if bodies['model'] != bodies['values']:
+            raise CommandError('The serializer outputs differ')
+
+        model, values = timings['model'], timings['values']
+        self.stdout.write(self.style.SUCCESS(
+            f'{rows} rows: render x{model["render"] / values["render"]:.2f}'
+            ', fetch + render x'
+            f'{sum(model.values()) / sum(values.values()):.2f} faster'
+        ))
+
+    def _queryset(self, products, serializer_class):
+        """Return the queryset ProductViewSet.list would read"""
+        if issubclass(serializer_class, serializers.ProductValuesSerializer):
+            return products.values(*serializer_class.value_fields())
+        return products.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch('attributes', queryset=Attribute.objects.only(
+                'id'
+            ).order_by('id')),
+        )
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.request import Request
+
+from core import benchmark, throttling
+
+
+class BenchView:
+    """Stand-in for a viewset in the middle of an action"""
+    throttle_scope = 'bench'
+    action = 'list'
+
+
+class Command(BaseCommand):
+    """Django command to time the throttle check of a request"""
+    help = 'Time BucketRateThrottle.allow_request per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument(
+            '--clients', type=int, default=1000,
+            help='Distinct client addresses the requests come from'
+        )
+        parser.add_argument(
+            '--alias',
+            help='Cache alias to keep the buckets in (default: in process)'
+        )
+        parser.add_argument(
+            '--budget', type=float, default=50,
+            help='Fail if the mean exceeds this many microseconds'
+        )
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = []
+        for index in range(options['clients']):
+            request = Request(factory.get(
+                '/', REMOTE_ADDR=f'10.{index >> 16 & 255}.'
+                f'{index >> 8 & 255}.{index & 255}'
+            ))
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        view = BenchView()
+        rates = {'bench.list': '1000000/min'}
+        with override_settings(
+                THROTTLE_CACHE_ALIAS=options['alias'], API_THROTTLE=True,
+                REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+            samples = []
+            rejected = 0
+            for index in range(options['requests']):
+                request = requests[index % len(requests)]
+                start = time.perf_counter()
+                allowed = throttling.BucketRateThrottle().allow_request(
+                    request, view
+                )
+                samples.append(time.perf_counter() - start)
+                rejected += not allowed
+
+        mean = sum(samples) / len(samples) * 1000000
+        self.stdout.write(
+            f'{options["alias"] or "local"} mean={mean:.2f}us ' + ' '.join(
+                f'p{int(fraction * 100)}='
+                f'{benchmark.percentile(samples, fraction) * 1000000:.2f}us'
+                for fraction in (0.5, 0.99)
+            ) + f' rejected={rejected}'
+        )
+        if mean > options['budget']:
+            raise CommandError(
+                f'Over the budget of {options["budget"]:.0f}us per request'
+            )
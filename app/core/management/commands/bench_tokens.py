@@ -0,0 +1,117 @@
+import datetime
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import benchmark
+from core.management.commands.seed_catalog import bench_email
+from core.models import AuthToken
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+PREFIX = 'bench-'
+
+
+def bench_key(index):
+    """Return the key of the index-th benchmark token"""
+    return f'{PREFIX}{index:034x}'
+
+
+class Command(BaseCommand):
+    """Django command to time auth token lookups in a large token table"""
+    help = 'Fill the token table to --tokens rows and time token lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=10000000)
+        parser.add_argument('--lookups', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the benchmark tokens afterwards'
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email=bench_email(0)).first()
+        if user is None:
+            raise CommandError('Run seed_catalog before benchmarking')
+
+        tokens = options['tokens']
+        existing = AuthToken.objects.filter(key__startswith=PREFIX).count()
+        if existing < tokens:
+            start = time.perf_counter()
+            self.fill(user, existing, tokens, options['batch_size'])
+            self.stdout.write(
+                f'Inserted {tokens - existing} tokens in '
+                f'{time.perf_counter() - start:.1f}s'
+            )
+
+        rng = random.Random(options['seed'])
+        keys = [
+            bench_key(rng.randrange(tokens))
+            for _ in range(options['lookups'])
+        ]
+        auth = CachedTokenAuthentication()
+        for name, cached in (('uncached', False), ('cached', True)):
+            samples = []
+            for key in keys:
+                if not cached:
+                    token_cache.delete(key)
+                start = time.perf_counter()
+                auth.authenticate_credentials(key)
+                samples.append(time.perf_counter() - start)
+            self.stdout.write(f'{name:<9} ' + ' '.join(
+                f'p{int(fraction * 100)}='
+                f'{benchmark.percentile(samples, fraction) * 1000:.3f}ms'
+                for fraction in (0.5, 0.95, 0.99)
+            ))
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_size_pretty(pg_indexes_size(%s))',
+                    [AuthToken._meta.db_table]
+                )
+                self.stdout.write(f'Token indexes: {cursor.fetchone()[0]}')
+
+        if options['clear']:
+            # One statement without loading millions of rows for signals
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {AuthToken._meta.db_table} '
+                    'WHERE key LIKE %s',
+                    [PREFIX + '%']
+                )
+
+    def fill(self, user, start, stop, batch_size):
+        """Insert benchmark tokens start..stop-1 for the user"""
+        expires_at = timezone.now() + datetime.timedelta(
+            seconds=settings.AUTH_TOKEN_TTL
+        )
+        for first in range(start, stop, batch_size):
+            last = min(first + batch_size, stop)
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    self._fill_postgresql(user, first, last, expires_at)
+                else:
+                    AuthToken.objects.bulk_create([
+                        AuthToken(
+                            key=bench_key(i), user=user, expires_at=expires_at
+                        )
+                        for i in range(first, last)
+                    ], batch_size=500)
+
+    def _fill_postgresql(self, user, first, last, expires_at):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {AuthToken._meta.db_table} '
+                '(key, user_id, created, expires_at) '
+                "SELECT %s || lpad(to_hex(i), 34, '0'), %s, now(), %s "
+                'FROM generate_series(%s, %s) AS i',
+                [PREFIX, user.pk, expires_at, first, last - 1]
+            )
@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core import health
+
+
+class Command(BaseCommand):
+    """Django command to migrate only when the migration files changed"""
+    help = (
+        'Run migrate unless the digest of the migration files matches the '
+        'one stamped by the last run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Migrate even if the digest is unchanged'
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        digest = health.migration_digest()
+        if not options['force'] and health.stamped_digest(using) == digest:
+            self.stdout.write('Migrations unchanged, skipping migrate')
+            return
+
+        call_command(
+            'migrate', database=using, interactive=False,
+            verbosity=options['verbosity']
+        )
+        health.stamp(digest, using)
+        self.stdout.write(self.style.SUCCESS('Migration stamp updated!'))
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    """Django command to hash partition the product table on user_id"""
+    help = 'Move the products into hash partitions without blocking writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions', type=int, default=settings.PRODUCT_PARTITIONS,
+            help='Number of partitions (default: PRODUCT_PARTITIONS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between batches'
+        )
+        parser.add_argument(
+            '--no-swap', action='store_true',
+            help='Stop once the rows are copied, leaving the copy mirrored'
+        )
+        parser.add_argument(
+            '--sql', action='store_true',
+            help='Print the statements instead of running them'
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported(connection):
+            raise CommandError('Partitioning needs PostgreSQL 11 or later')
+        table = partitioning.TABLE
+        shadow = partitioning.shadow_name(table)
+
+        with connection.cursor() as cursor:
+            if partitioning.is_partitioned(cursor, table):
+                self.stdout.write(f'{table} is already partitioned')
+                return
+            resumed = partitioning.table_exists(cursor, shadow)
+            if not resumed and options['partitions'] < 1:
+                raise CommandError(
+                    'Set --partitions or PRODUCT_PARTITIONS to at least 1'
+                )
+            if options['sql']:
+                self.print_sql(cursor, table, options['partitions'], resumed)
+                return
+
+        if resumed:
+            self.stdout.write(f'Resuming the copy into {shadow}')
+        else:
+            partitioning.prepare(connection, options['partitions'])
+            self.stdout.write(
+                f'Created {shadow} with {options["partitions"]} partitions'
+            )
+
+        for done, total in partitioning.copy_rows(
+                connection, options['batch_size'], options['sleep']):
+            self.stdout.write(f'Copied ids {done}/{total}')
+
+        if options['no_swap']:
+            self.stdout.write(
+                f'{shadow} is kept in sync; run again to swap it in'
+            )
+            return
+        try:
+            partitioning.swap(connection)
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f'Partitioned {table}'))
+
+    def print_sql(self, cursor, table, partitions, resumed):
+        layout = partitioning.describe(cursor, table)
+        statements = []
+        if not resumed:
+            statements += partitioning.create_sql(
+                table, partitions, layout['indexes'], layout['foreign_keys']
+            )
+            statements += partitioning.mirror_sql(table)
+        statements.append(partitioning.copy_sql(table) % (
+            '<start>', '<end>'
+        ))
+        statements += partitioning.swap_sql(
+            table, layout['indexes'], layout['foreign_keys'],
+            layout['references'], layout['sequence']
+        )
+        for statement in statements:
+            self.stdout.write(f'{statement};')
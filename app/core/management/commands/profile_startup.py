@@ -0,0 +1,68 @@
+import json
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    """Django command to measure how long the application takes to start"""
+    help = 'Time importing and loading the app in fresh interpreters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Fresh interpreters to start; the fastest run is reported'
+        )
+        parser.add_argument(
+            '--imports', type=int, default=0, metavar='N',
+            help='Also list the N slowest top-level imports'
+        )
+
+    def handle(self, *args, **options):
+        runs = []
+        for i in range(max(options['runs'], 1)):
+            runs.append(self._run(importtime=bool(options['imports'])))
+
+        wall, phases, stderr = min(runs, key=lambda run: run[0])
+        self.stdout.write(f'{"interpreter total":<18} {wall * 1000:9.1f}ms')
+        for name, seconds in phases:
+            self.stdout.write(f'{name:<18} {seconds * 1000:9.1f}ms')
+
+        if options['imports']:
+            self.stdout.write('Slowest imports (cumulative):')
+            for module, micros in self._slowest_imports(
+                    stderr, options['imports']):
+                self.stdout.write(f'  {module:<40} {micros / 1000:9.1f}ms')
+
+    def _run(self, importtime):
+        # -X importtime slows imports down, so it is only on when asked for
+        command = [sys.executable, '-m', 'core.startup']
+        if importtime:
+            command[1:1] = ['-X', 'importtime']
+        start = time.perf_counter()
+        process = subprocess.run(
+            command, cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True
+        )
+        wall = time.perf_counter() - start
+        if process.returncode:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+
+        return wall, json.loads(process.stdout), process.stderr
+
+    def _slowest_imports(self, stderr, count):
+        """Return the slowest top-level imports from -X importtime output"""
+        imports = []
+        for match in IMPORT_TIME.finditer(stderr):
+            cumulative, indent, module = match.group(2, 3, 4)
+            if len(indent) == 1:
+                imports.append((module, int(cumulative)))
+
+        return sorted(imports, key=lambda item: -item[1])[:count]
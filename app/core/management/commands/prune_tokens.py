@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired auth tokens"""
+    help = 'Delete expired auth tokens a chunk per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between chunks'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Each chunk deletes by primary key in its own short
+            # transaction, so no lock is held across the whole table
+            keys = list(AuthToken.objects.filter(
+                expires_at__lte=now
+            ).order_by('expires_at').values_list('key', flat=True)[
+                :options['chunk_size']
+            ])
+            if not keys:
+                break
+
+            count, _ = AuthToken.objects.filter(key__in=keys).delete()
+            deleted += count
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired tokens'
+        ))
@@ -0,0 +1,43 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Django command to delete tombstones older than SYNC_TOMBSTONE_TTL"""
+    help = 'Delete expired sync tombstones a chunk per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Seconds to pause between chunks'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(
+            seconds=settings.SYNC_TOMBSTONE_TTL
+        )
+        deleted = 0
+        while True:
+            ids = list(Tombstone.objects.filter(
+                deleted_at__lt=cutoff
+            ).order_by('deleted_at').values_list('id', flat=True)[
+                :options['chunk_size']
+            ])
+            if not ids:
+                break
+
+            count, _ = Tombstone.objects.filter(id__in=ids).delete()
+            deleted += count
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired tombstones'
+        ))
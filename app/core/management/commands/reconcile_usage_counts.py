@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from product import usage
+
+
+class Command(BaseCommand):
+    """Django command to repair drifted tag and attribute product counts"""
+    help = 'Recount the products of tags and attributes whose count is off'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Email of the only user to reconcile'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(
+                email=options['user']
+            ).first()
+            if user is None:
+                raise CommandError(f'No user {options["user"]}')
+
+        for model in usage.RELATIONS:
+            fixed = usage.reconcile(model, user)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {fixed} fixed'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Usage counts reconciled!'))
@@ -0,0 +1,116 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Attribute, AuthToken, Product, Tag
+from product.search import refresh_search_vectors
+from product.usage import refresh_usage_counts
+
+
+BENCH_DOMAIN = 'bench.local'
+BENCH_PASSWORD = 'benchpass123'
+
+
+def bench_email(index):
+    """Return the email of the seeded user with the given index"""
+    return f'user{index}@{BENCH_DOMAIN}'
+
+
+class Command(BaseCommand):
+    """Django command to seed benchmark users with a product catalog"""
+    help = 'Create N users with M products each, tagged and attributed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--attributes', type=int, default=20)
+        parser.add_argument(
+            '--links', type=int, default=3,
+            help='Tags and attributes linked to each product'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously seeded users first'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            get_user_model().objects.filter(
+                email__endswith=f'@{BENCH_DOMAIN}'
+            ).delete()
+
+        for index in range(options['users']):
+            with transaction.atomic():
+                user = self._seed_user(index, rng, options)
+            self.stdout.write(
+                f'Seeded {user.email} with {options["products"]} products'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Catalog seeded!'))
+
+    def _seed_user(self, index, rng, options):
+        batch_size = options['batch_size']
+        user = get_user_model().objects.create_user(
+            bench_email(index), BENCH_PASSWORD, name=f'Bench user {index}'
+        )
+        AuthToken.objects.issue(user)
+
+        Tag.objects.bulk_create([
+            Tag(user=user, name=f'Tag {i}') for i in range(options['tags'])
+        ], batch_size=batch_size)
+        Attribute.objects.bulk_create([
+            Attribute(user=user, name=f'Attribute {i}')
+            for i in range(options['attributes'])
+        ], batch_size=batch_size)
+        tag_ids = list(Tag.objects.filter(user=user).values_list(
+            'id', flat=True
+        ))
+        attribute_ids = list(Attribute.objects.filter(user=user).values_list(
+            'id', flat=True
+        ))
+
+        Product.objects.bulk_create([
+            Product(
+                user=user,
+                title=f'Product {i}',
+                time_minutes=rng.randint(1, 120),
+                price=f'{rng.uniform(1, 999):.2f}',
+            )
+            for i in range(options['products'])
+        ], batch_size=batch_size)
+        product_ids = Product.objects.filter(user=user).values_list(
+            'id', flat=True
+        )
+
+        links = options['links']
+        tag_rows = []
+        attribute_rows = []
+        for product_id in product_ids.iterator():
+            for tag_id in rng.sample(tag_ids, min(links, len(tag_ids))):
+                tag_rows.append(Product.tags.through(
+                    product_id=product_id, tag_id=tag_id
+                ))
+            for attribute_id in rng.sample(
+                attribute_ids, min(links, len(attribute_ids))
+            ):
+                attribute_rows.append(Product.attributes.through(
+                    product_id=product_id, attribute_id=attribute_id
+                ))
+        Product.tags.through.objects.bulk_create(
+            tag_rows, batch_size=batch_size
+        )
+        Product.attributes.through.objects.bulk_create(
+            attribute_rows, batch_size=batch_size
+        )
+        refresh_usage_counts(Tag, tag_ids)
+        refresh_usage_counts(Attribute, attribute_ids)
+        # bulk_create skips the signals that keep the vectors current
+        refresh_search_vectors(user_id=user.pk)
+
+        return user
@@ -1,21 +1,52 @@
 import time
-from django.db import connections
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to keep trying before giving up'
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Seconds to wait after the first failed attempt'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Upper bound of the doubling wait between attempts'
+        )
+
     def handle(self, *args, **options):
         # output a message to the screen
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = options['initial_delay']
+        while True:
             try:
-                db_conn = connections['default']
+                # Actually connect: looking the connection up doesn't
+                connection.ensure_connection()
+                break
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s'
+                    )
+                wait = min(delay, options['max_delay'], remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {wait:.1f} seconds...'
+                )
+                time.sleep(wait)
+                delay *= 2
 
+        # Don't hand a connection made here to whatever runs next
+        connection.close()
         self.stdout.write(self.style.SUCCESS('Database available!'))
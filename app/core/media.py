@@ -0,0 +1,169 @@
+"""Serving of uploaded media files
+
+Files are streamed with `FileResponse`, which WSGI servers that provide
+`wsgi.file_wrapper` (gunicorn) send with sendfile(), ranges included.
+Single byte ranges, If-Modified-Since, If-None-Match and If-Range are
+honoured. Content-addressed and uuid names never change content, so they
+are cached as immutable for a year; other files for MEDIA_CACHE_MAX_AGE.
+
+With MEDIA_OFFLOAD set to `x-accel-redirect` (nginx) or `x-sendfile`
+(Apache, lighttpd), the view only checks the file exists and leaves
+sending it to the fronting proxy.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, \
+    HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+
+IMMUTABLE_NAME = re.compile(
+    r'(^|/)([0-9a-f]{64}|[0-9a-f]{8}-([0-9a-f]{4}-){3}[0-9a-f]{12})\.\w+$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def parse_range(header, size):
+    """Return the (start, end) byte range asked for, inclusive
+
+    Returns None for a missing or invalid header, which means the whole
+    file, and raises ValueError for a range past the end of the file.
+    Several ranges in one header aren't supported and get the whole file.
+    """
+    match = RANGE.match(header.replace(' ', '')) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        if not int(last):
+            raise ValueError('empty suffix range')
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def _read_range(file, length, block_size):
+    while length > 0:
+        chunk = file.read(min(block_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def _cache_control(path):
+    if IMMUTABLE_NAME.search(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def _offload(path, full_path):
+    response = HttpResponse()
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + path
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    # Let the proxy set the type from the file it sends
+    del response['Content-Type']
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Serve a file from MEDIA_ROOT"""
+    # Hidden paths hold partial uploads, see product.uploads
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404('File not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('File not found')
+
+    size, mtime = stat_result.st_size, stat_result.st_mtime
+    etag = quote_etag(f'{size:x}-{stat_result.st_mtime_ns:x}')
+    last_modified = http_date(mtime)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        not_modified = etag in (
+            tag.strip() for tag in if_none_match.split(',')
+        ) or if_none_match.strip() == '*'
+    else:
+        not_modified = not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime, size
+        )
+
+    if not_modified:
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_OFFLOAD:
+        response = _offload(path, full_path)
+    else:
+        response = _file_response(request, full_path, size, etag,
+                                  last_modified)
+
+    response['Cache-Control'] = _cache_control(path)
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
+
+
+def _file_response(request, full_path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None or if_range in (etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(
+                status=416, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        file = open(full_path, 'rb')
+        response = FileResponse(file, content_type=content_type)
+        response.block_size = settings.MEDIA_BLOCK_SIZE
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            file.seek(start)
+            # The file wrapper sends Content-Length bytes from the file's
+            # offset; other servers iterate the limited content instead
+            response.streaming_content = _read_range(
+                file, length, response.block_size
+            )
+            response.file_to_stream = file
+            response._closable_objects.append(file)
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = length
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,234 @@
+"""In-process metrics in the Prometheus text format
+
+Each process aggregates its own counters and histograms; with several
+gunicorn workers every scrape of `/metrics` sees the worker that served
+it, so sum them per instance label on the Prometheus side. Gauges read
+the token cache and connection pool statistics when scraped.
+"""
+import bisect
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+
+LATENCY_BUCKETS = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(8))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values)
+    )
+    return '{%s}' % pairs
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labels, labels)} {value}'
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self._values.items()
+            )
+        lines = self.header()
+        bucket_labels = self.labels + ('le',)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(
+                    self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append('%s_bucket%s %d' % (
+                    self.name,
+                    _format_labels(
+                        bucket_labels, labels + (_format_value(bound),)
+                    ),
+                    cumulative,
+                ))
+            suffix = _format_labels(self.labels, labels)
+            lines.append(f'{self.name}_sum{suffix} {_format_value(total)}')
+            lines.append(f'{self.name}_count{suffix} {count}')
+        return lines
+
+
+class Gauge(Metric):
+    """A gauge whose samples are read from `func` at scrape time
+
+    `func` returns a mapping of label value tuples to numbers.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, func, labels=()):
+        super().__init__(name, documentation, labels)
+        self.func = func
+
+    def collect(self):
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labels, labels)} '
+            f'{_format_value(value)}'
+            for labels, value in sorted(self.func().items())
+        ]
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+def _token_cache_stats():
+    from user.authentication import token_cache
+
+    return {
+        (name,): value for name, value in token_cache.stats().items()
+    }
+
+
+def _pool_stats():
+    from core.backends.postgresql.base import pool_stats
+
+    return {
+        (alias, name): value
+        for alias, stats in pool_stats().items()
+        for name, value in stats.items()
+    }
+
+
+registry = Registry()
+VIEW_LABELS = ('view', 'method')
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total', 'Requests served.', VIEW_LABELS + ('status',)
+))
+DURATION = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time spent serving requests.',
+    VIEW_LABELS, LATENCY_BUCKETS
+))
+DB_DURATION = registry.register(Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries per sampled request.',
+    VIEW_LABELS, LATENCY_BUCKETS
+))
+QUERIES = registry.register(Histogram(
+    'http_request_queries', 'Database queries per sampled request.',
+    VIEW_LABELS, QUERY_BUCKETS
+))
+SERIALIZE_DURATION = registry.register(Histogram(
+    'http_request_serialize_duration_seconds',
+    'View time outside database queries per sampled request.',
+    VIEW_LABELS, LATENCY_BUCKETS
+))
+RENDER_DURATION = registry.register(Histogram(
+    'http_request_render_duration_seconds',
+    'Time spent rendering responses per sampled request.',
+    VIEW_LABELS, LATENCY_BUCKETS
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    'http_response_size_bytes', 'Size of non-streaming response bodies.',
+    VIEW_LABELS, SIZE_BUCKETS
+))
+DUPLICATE_QUERIES = registry.register(Counter(
+    'http_duplicate_queries_total',
+    'Sampled requests repeating one query past the N+1 threshold.',
+    VIEW_LABELS
+))
+registry.register(Gauge(
+    'token_cache', 'Token cache hits, misses and size.',
+    _token_cache_stats, ('stat',)
+))
+registry.register(Gauge(
+    'db_pool', 'Database connection pool statistics.',
+    _pool_stats, ('alias', 'stat')
+))
+
+
+@never_cache
+def metrics(request):
+    """Serve the metrics of this process in the Prometheus text format"""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
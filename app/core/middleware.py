@@ -0,0 +1,156 @@
+"""Request performance instrumentation
+
+Every request records its total time, status and response size. A
+sampled fraction (METRICS_SAMPLE_RATE) also wraps the database cursors
+to time queries, count them and spot one statement repeated enough times
+to look like an N+1 loop, and times the view outside its queries (mostly
+serializers) and the response rendering. The timings are aggregated in
+core.metrics and, with SERVER_TIMING on, sent back in a `Server-Timing`
+header.
+"""
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """Timings of one sampled request"""
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.view_start = None
+        self.view_time = None
+        self.render_start = None
+        self.render_time = None
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.statements[sql] += 1
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    def duplicates(self, threshold):
+        """Return the most repeated statement and its count, if over"""
+        if not self.statements:
+            return None, 0
+        sql, count = self.statements.most_common(1)[0]
+        if count < threshold:
+            return None, 0
+        return sql, count
+
+    def rendered(self, response):
+        self.render_time = time.perf_counter() - self.render_start
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+def _timing(name, seconds, description=None):
+    entry = '%s;dur=%.3f' % (name, seconds * 1000)
+    if description:
+        entry += ';desc="%s"' % description
+    return entry
+
+
+class PerformanceMiddleware:
+    """Record request timings in core.metrics"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.METRICS_SAMPLE_RATE
+        self.server_timing = settings.SERVER_TIMING
+        self.duplicate_threshold = settings.METRICS_DUPLICATE_QUERIES
+
+    def sampled(self):
+        return (
+            self.sample_rate >= 1 or
+            self.sample_rate > 0 and random.random() < self.sample_rate
+        )
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        if not self.sampled():
+            profile = None
+            response = self.get_response(request)
+        else:
+            profile = request._profile = RequestProfile()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        self.record(request, response, elapsed, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        profile = getattr(request, '_profile', None)
+        if profile is not None and profile.view_start is not None:
+            profile.render_start = time.perf_counter()
+            profile.view_time = profile.render_start - profile.view_start
+            response.add_post_render_callback(profile.rendered)
+        return response
+
+    def record(self, request, response, elapsed, profile):
+        labels = (_view_name(request), request.method)
+        metrics.REQUESTS.inc(*labels, str(response.status_code))
+        metrics.DURATION.observe(elapsed, *labels)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), *labels)
+
+        timings = [_timing('total', elapsed)]
+        if profile is not None:
+            queries = profile.queries
+            metrics.DB_DURATION.observe(profile.db_time, *labels)
+            metrics.QUERIES.observe(queries, *labels)
+            description = '%d queries' % queries
+
+            sql, count = profile.duplicates(self.duplicate_threshold)
+            if sql is not None:
+                metrics.DUPLICATE_QUERIES.inc(*labels)
+                logger.warning(
+                    '%s %s ran one query %d times, a likely N+1: %s',
+                    request.method, labels[0], count, sql[:500]
+                )
+                description += ', %d repeated' % count
+            timings.append(_timing('db', profile.db_time, description))
+
+            if profile.view_time is not None:
+                # Queries run by the view are already counted under db
+                serialize = max(profile.view_time - profile.db_time, 0)
+                metrics.SERIALIZE_DURATION.observe(serialize, *labels)
+                timings.append(_timing('serialize', serialize))
+            if profile.render_time is not None:
+                metrics.RENDER_DURATION.observe(profile.render_time, *labels)
+                timings.append(_timing('render', profile.render_time))
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join(timings)
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_product_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'id'], name='product_user_id_idx'),
+        ),
+        # The auto-created M2M tables only index (product_id, <fk>_id), so
+        # add the reverse composite to serve "products with these tags"
+        # semi-joins from the index alone.
+        migrations.RunSQL(
+            'CREATE INDEX product_tags_tag_product_idx '
+            'ON core_product_tags (tag_id, product_id)',
+            'DROP INDEX product_tags_tag_product_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX product_attributes_attr_product_idx '
+            'ON core_product_attributes (attribute_id, product_id)',
+            'DROP INDEX product_attributes_attr_product_idx',
+        ),
+    ]
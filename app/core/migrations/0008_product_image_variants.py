@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_product_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
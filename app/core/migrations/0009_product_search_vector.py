@@ -0,0 +1,57 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:31
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# The vector as defined when the search field was added
+REFRESH_SQL = '''
+    UPDATE core_product SET search_vector =
+        setweight(to_tsvector(%(config)s, core_product.title), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_tag t
+            JOIN core_product_tags pt ON pt.tag_id = t.id
+            WHERE pt.product_id = core_product.id
+        ), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(a.name, ' ') FROM core_attribute a
+            JOIN core_product_attributes pa ON pa.attribute_id = a.id
+            WHERE pa.product_id = core_product.id
+        ), '')), 'C')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    """Build the GIN index and the initial vectors on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        'CREATE INDEX product_search_vector_idx ON core_product '
+        'USING gin (search_vector)'
+    )
+    schema_editor.execute(REFRESH_SQL, {'config': settings.SEARCH_CONFIG})
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX product_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
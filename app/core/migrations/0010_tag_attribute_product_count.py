@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:45
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_products(apps, schema_editor):
+    """Fill in the product counts of the existing tags and attributes"""
+    Product = apps.get_model('core', 'Product')
+    for field, column in (('tags', 'tag_id'), ('attributes', 'attribute_id')):
+        relation = Product._meta.get_field(field)
+        through = relation.remote_field.through
+        counts = through.objects.filter(
+            **{column: OuterRef('pk')}
+        ).order_by().values(column).annotate(
+            count=Count('*')
+        ).values('count')
+        relation.related_model.objects.update(product_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()), 0
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attribute',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(condition=models.Q(product_count__gt=0), fields=['user', 'name'], name='attribute_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(condition=models.Q(product_count__gt=0), fields=['user', 'name'], name='tag_assigned_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:55
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def copy_tokens(apps, schema_editor):
+    """Carry the existing DRF tokens over, expiring a full TTL from now"""
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        'INSERT INTO %s (%s, %s, %s, %s) SELECT %s, %s, %s, %%s FROM %s' % (
+            quote(AuthToken._meta.db_table),
+            quote('key'), quote('user_id'), quote('created'),
+            quote('expires_at'),
+            quote('key'), quote('user_id'), quote('created'),
+            quote(Token._meta.db_table),
+        ),
+        [schema_editor.connection.ops.adapt_datetimefield_value(
+            timezone.now() + datetime.timedelta(
+                seconds=settings.AUTH_TOKEN_TTL
+            )
+        )]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_schemastamp'),
+        ('authtoken', '0002_auto_20160226_1747'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_tokens, migrations.RunPython.noop),
+    ]
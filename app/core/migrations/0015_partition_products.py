@@ -0,0 +1,15 @@
+# Generated by Django 2.2.28 on 2026-10-18 05:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_timestamps_tombstone'),
+    ]
+
+    # The product table is partitioned by the partition_products command
+    # (core.partitioning) rather than here, so the schema migrations build
+    # never depends on the settings they run with
+    operations = []
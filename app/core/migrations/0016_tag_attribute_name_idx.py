@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_partition_products'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['user', '-name', 'id'], name='attribute_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='tag_user_name_idx'),
+        ),
+    ]
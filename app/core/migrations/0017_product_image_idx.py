@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_tag_attribute_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(_negated=True, image=''), fields=['image'], name='product_image_idx'),
+        ),
+    ]
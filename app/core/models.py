@@ -3,14 +3,42 @@ from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+import binascii
+import datetime
+import hashlib
 import uuid
 import os
 
 
+def _content_digest(instance):
+    """Return the SHA-256 of the image being uploaded, or None"""
+    image = getattr(instance, 'image', None)
+    if not image or image._committed:
+        return None
+    try:
+        content = image.file
+        content.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: content.read(64 * 1024), b''):
+            digest.update(chunk)
+        content.seek(0)
+    except (OSError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
 def product_image_file_path(instance, filename):
-    """Generate file path for new product image"""
-    ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    """Generate file path for new product image
+
+    Named after a digest of the content, so identical uploads share one
+    file (see core.storage) and the name changes whenever the content
+    does; a random name is used when the content can't be read.
+    """
+    ext = filename.split('.')[-1].lower()
+    name = _content_digest(instance) or uuid.uuid4()
+    filename = f'{name}.{ext}'
 
     return os.path.join('uploads/product/', filename)
 
@@ -51,6 +79,52 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class AuthTokenManager(models.Manager):
+
+    def issue(self, user):
+        """Return a new token for the user"""
+        return self.create(user=user)
+
+    def current(self, user):
+        """Return the user's newest unexpired token, issuing one if none"""
+        token = self.filter(
+            user=user, expires_at__gt=timezone.now()
+        ).order_by('-expires_at').first()
+        return token or self.issue(user)
+
+
+class AuthToken(models.Model):
+    """API token that expires AUTH_TOKEN_TTL seconds after it is issued"""
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='auth_tokens',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    # Written in batches by user.authentication, so it may lag a little
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    objects = AuthTokenManager()
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = binascii.hexlify(os.urandom(20)).decode()
+        if not self.expires_at:
+            self.expires_at = timezone.now() + datetime.timedelta(
+                seconds=settings.AUTH_TOKEN_TTL
+            )
+        return super().save(*args, **kwargs)
+
+    @property
+    def expired(self):
+        return self.expires_at <= timezone.now()
+
+    def __str__(self):
+        return self.key
+
+
 class Tag(models.Model):
     """Tag to be used for a product"""
     name = models.CharField(max_length=255)
@@ -58,6 +132,26 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    # Number of products linked to it, kept up to date by product.usage
+    product_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='tag_assigned_idx',
+                condition=models.Q(product_count__gt=0),
+            ),
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='tag_user_updated_idx'
+            ),
+            # Keyset pages of product.pagination.AttributePagination
+            models.Index(
+                fields=['user', '-name', 'id'], name='tag_user_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,6 +164,26 @@ class Attribute(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of products linked to it, kept up to date by product.usage
+    product_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'], name='attribute_assigned_idx',
+                condition=models.Q(product_count__gt=0),
+            ),
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='attribute_user_updated_idx'
+            ),
+            # Keyset pages of product.pagination.AttributePagination
+            models.Index(
+                fields=['user', '-name', 'id'], name='attribute_user_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -88,6 +202,96 @@ class Product(models.Model):
     attributes = models.ManyToManyField('Attribute')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=product_image_file_path)
+    # JSON map of variant -> format -> storage name, filled in by the
+    # background image worker
+    image_variants = models.TextField(blank=True, default='')
+    # Maintained by product.search on PostgreSQL only; the GIN index on it
+    # is created in migration 0009 rather than declared in Meta because
+    # other databases cannot build it
+    search_vector = SearchVectorField(null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every write, including the queryset updates and bulk
+    # writes that bypass save(); product.sync pages changes on it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='product_user_id_idx'),
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='product_user_updated_idx'
+            ),
+            # Finds the other holders of a shared image, see
+            # product.images.delete_variants
+            models.Index(
+                fields=['image'], name='product_image_idx',
+                condition=~models.Q(image=''),
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        # Ids alone can't be pruned to a partition of a partitioned table
+        # (see core.partitioning), so the owner's partition is tried
+        # first; a product that changed owner is still found by id
+        return super()._do_update(
+            base_qs.filter(user_id=self.user_id), using, pk_val, values,
+            update_fields, forced_update
+        ) or super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+
+
+class Tombstone(models.Model):
+    """Record of a deleted product, tag or attribute, see product.sync"""
+    # No constraint, so the tombstones written while a user is deleted
+    # don't block it; they are pruned with the rest
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    model = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'model', 'deleted_at', 'id'],
+                name='tombstone_user_deleted_idx'
+            ),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
+
+
+class ImageUpload(models.Model):
+    """Resumable upload of a product image, see product.uploads"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # Bytes the client declared it will send
+    size = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.id)
+
+
+class SchemaStamp(models.Model):
+    """Digest of the migration files last applied to the database"""
+    digest = models.CharField(max_length=64)
+    applied_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.digest
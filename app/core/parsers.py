@@ -0,0 +1,53 @@
+"""JSON parsing backed by orjson when it is installed"""
+import codecs
+import re
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# 19 digits may already overflow a signed 64-bit integer
+_LONG_NUMBER = re.compile(rb'[0-9]{19}')
+
+
+def loads(content, strict=None):
+    """Decode UTF-8 JSON bytes or text like the stdlib json module
+
+    orjson rejects a few documents the stdlib accepts (escaped lone
+    surrogates) and words its errors differently, so anything it fails on
+    is parsed again by the stdlib. Documents with long digit runs go to the
+    stdlib directly: orjson turns integers beyond 64 bits into floats.
+    """
+    if strict is None:
+        strict = api_settings.STRICT_JSON
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if orjson is not None and not _LONG_NUMBER.search(content):
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    parse_constant = json.strict_constant if strict else None
+    return json.loads(content.decode('utf-8'), parse_constant=parse_constant)
+
+
+class FastJSONParser(parsers.JSONParser):
+    """DRF's JSONParser, decoding UTF-8 bodies through orjson"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return loads(stream.read(), self.strict)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
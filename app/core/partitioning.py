@@ -0,0 +1,348 @@
+"""Hash partitioning of the product table on user_id (PostgreSQL only)
+
+Every product query is scoped to one user, so with the table split into
+hash partitions on user_id the planner prunes it to the partition of
+that user: vacuum, index depth and the cached pages all scale with a
+partition instead of the whole catalog. Product saves look in the
+owner's partition too (see Product._do_update); deletes go by id, which
+costs one primary key probe per partition.
+
+A partitioned table's unique constraints have to include the partition
+key, so the primary key becomes (id, user_id); ids stay unique through
+the table's sequence. A foreign key has to reference a unique key, so
+the join tables and image uploads can't reference products by id alone
+any more: their foreign keys are replaced by deferred constraint
+triggers under the same names, which check the same thing at commit.
+
+The join tables of tags and attributes are not partitioned. They have no
+user_id to partition on, and adding one means replacing Django's
+auto-created through models and passing the user to every add() and
+set(). Their rows are a few integers looked up by product or tag id, so
+their indexes stay small next to the products'.
+
+An existing table is converted online:
+
+1. `prepare` creates the partitioned copy of the table next to it, with
+   a trigger that mirrors every write to the table into the copy;
+2. `copy_rows` copies the rows over in batches of ids, each batch in its
+   own transaction that locks just the rows it copies;
+3. `swap` checks that both hold the same rows and puts the copy in the
+   table's place under a brief exclusive lock.
+
+The partition_products command runs these steps, for an empty table as
+well as a full one. No migration partitions the table, so the schema
+migrations build doesn't depend on the settings they run with. Hash
+partitions, triggers on partitioned tables and `EXECUTE FUNCTION` need
+PostgreSQL 11 or later.
+"""
+import re
+import time
+
+from django.db import transaction
+
+
+TABLE = 'core_product'
+# Oldest server version (`connection.pg_version`) with hash partitioning
+MIN_VERSION = 110000
+# Suffix of the names in the partitioned copy until the swap
+NEW = '_new'
+
+INDEX_DEF = re.compile(r'^CREATE (UNIQUE )?INDEX (\S+) ON (\S+) (.+)$')
+
+
+def shadow_name(table):
+    """Return the name of the partitioned copy of a table"""
+    return f'{table}_partitioned'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass',
+                   [table])
+    return cursor.fetchone()[0] == 'p'
+
+
+def table_exists(cursor, table):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [table])
+    return cursor.fetchone()[0]
+
+
+def describe(cursor, table):
+    """Return what of a table has to be recreated on its partitioned copy"""
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes '
+        'WHERE tablename = %s ORDER BY indexname', [table]
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, conrelid::regclass::text, attname "
+        "FROM pg_constraint JOIN pg_attribute ON attrelid = conrelid "
+        "AND attnum = conkey[1] "
+        "WHERE confrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+        [table]
+    )
+    references = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+
+    return {
+        'indexes': [
+            (name, definition) for name, definition in indexes
+            if name != f'{table}_pkey'
+        ],
+        'foreign_keys': foreign_keys,
+        'references': references,
+        'sequence': sequence,
+    }
+
+
+def create_sql(table, partitions, indexes, foreign_keys):
+    """Return the statements creating the partitioned copy of a table"""
+    shadow = shadow_name(table)
+    statements = [
+        f'CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS '
+        'INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY HASH (user_id)',
+        f'ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey '
+        'PRIMARY KEY (id, user_id)',
+    ]
+    statements.extend(
+        f'CREATE TABLE {table}_p{remainder} PARTITION OF {shadow} '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    )
+    for name, definition in indexes:
+        unique, _, _, rest = INDEX_DEF.match(definition).groups()
+        if unique:
+            raise ValueError(
+                f'Unique index {name} would have to include user_id'
+            )
+        statements.append(f'CREATE INDEX {name}{NEW} ON {shadow} {rest}')
+    statements.extend(
+        f'ALTER TABLE {shadow} ADD CONSTRAINT {name}{NEW} {definition}'
+        for name, definition in foreign_keys
+    )
+    return statements
+
+
+def mirror_sql(table):
+    """Return the statements mirroring writes to a table into its copy"""
+    shadow = shadow_name(table)
+    return [
+        f'''CREATE FUNCTION {table}_mirror() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {shadow} WHERE id = OLD.id AND user_id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {shadow} SELECT (NEW).*;
+    END IF;
+    RETURN NULL;
+END
+$$''',
+        f'CREATE TRIGGER {table}_mirror AFTER INSERT OR UPDATE OR DELETE '
+        f'ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_mirror()',
+    ]
+
+
+def reference_sql(table, references):
+    """Return the statements checking references to a table by trigger
+
+    Each foreign key referencing the table, dropped beforehand, becomes a
+    pair of deferred constraint triggers named after it: one on the
+    referencing table that refuses ids missing from the table, one on the
+    table that refuses deleting or renumbering rows still referenced.
+    """
+    statements = [
+        f'''CREATE OR REPLACE FUNCTION {table}_referenced() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    referenced bigint;
+BEGIN
+    EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) INTO referenced USING NEW;
+    IF referenced IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM {table} WHERE id = referenced) THEN
+        RAISE foreign_key_violation USING MESSAGE = format(
+            'insert or update on table "%s" violates foreign key '
+            'constraint "%s"', TG_TABLE_NAME, TG_NAME
+        ), DETAIL = format(
+            'Key (%s)=(%s) is not present in table "{table}".',
+            TG_ARGV[0], referenced
+        );
+    END IF;
+    RETURN NULL;
+END
+$$''',
+        f'''CREATE OR REPLACE FUNCTION {table}_referencing() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    referenced boolean;
+BEGIN
+    IF EXISTS (SELECT 1 FROM {table} WHERE id = OLD.id) THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format(
+        'SELECT EXISTS (SELECT 1 FROM %I WHERE %I = $1)',
+        TG_ARGV[0], TG_ARGV[1]
+    ) INTO referenced USING OLD.id;
+    IF referenced THEN
+        RAISE foreign_key_violation USING MESSAGE = format(
+            'update or delete on table "{table}" violates foreign key '
+            'constraint "%s" on table "%s"', TG_NAME, TG_ARGV[0]
+        ), DETAIL = format(
+            'Key (id)=(%s) is still referenced from table "%s".',
+            OLD.id, TG_ARGV[0]
+        );
+    END IF;
+    RETURN NULL;
+END
+$$''',
+    ]
+    for name, referencing, column in references:
+        statements += [
+            f'CREATE CONSTRAINT TRIGGER {name} AFTER INSERT OR UPDATE OF '
+            f'{column} ON {referencing} DEFERRABLE INITIALLY DEFERRED '
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_referenced('{column}')",
+            f'CREATE CONSTRAINT TRIGGER {name} AFTER DELETE OR UPDATE OF id '
+            f'ON {table} DEFERRABLE INITIALLY DEFERRED FOR EACH ROW '
+            f"EXECUTE FUNCTION {table}_referencing('{referencing}', "
+            f"'{column}')",
+        ]
+    return statements
+
+
+def copy_sql(table):
+    """Return the statement copying the rows of an id range to the copy
+
+    The rows are share-locked until the batch commits, so a concurrent
+    update or delete waits and is then mirrored onto the copied row.
+    Rows the trigger already mirrored are newer and kept.
+    """
+    return (
+        f'INSERT INTO {shadow_name(table)} SELECT * FROM {table} '
+        'WHERE id >= %s AND id < %s ORDER BY id FOR SHARE '
+        'ON CONFLICT DO NOTHING'
+    )
+
+
+def swap_sql(table, indexes, foreign_keys, references, sequence):
+    """Return the statements replacing a table by its partitioned copy"""
+    shadow = shadow_name(table)
+    statements = [
+        f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE',
+        f'DROP TRIGGER {table}_mirror ON {table}',
+        f'DROP FUNCTION {table}_mirror()',
+    ]
+    statements.extend(
+        f'ALTER TABLE {referencing} DROP CONSTRAINT {name}'
+        for name, referencing, _ in references
+    )
+    if sequence:
+        statements.append(f'ALTER SEQUENCE {sequence} OWNED BY {shadow}.id')
+    statements += [
+        f'DROP TABLE {table}',
+        f'ALTER TABLE {shadow} RENAME TO {table}',
+        f'ALTER TABLE {table} RENAME CONSTRAINT {shadow}_pkey '
+        f'TO {table}_pkey',
+    ]
+    statements.extend(
+        f'ALTER INDEX {name}{NEW} RENAME TO {name}' for name, _ in indexes
+    )
+    statements.extend(
+        f'ALTER TABLE {table} RENAME CONSTRAINT {name}{NEW} TO {name}'
+        for name, _ in foreign_keys
+    )
+    if references:
+        statements += reference_sql(table, references)
+    return statements
+
+
+def prepare(connection, partitions, table=TABLE):
+    """Create the partitioned copy of a table, mirroring its writes"""
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        layout = describe(cursor, table)
+        statements = create_sql(
+            table, partitions, layout['indexes'], layout['foreign_keys']
+        ) + mirror_sql(table)
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def is_supported(connection):
+    """Return whether the database can hash partition tables"""
+    return (connection.vendor == 'postgresql' and
+            connection.pg_version >= MIN_VERSION)
+
+
+def resume_from(cursor, table):
+    """Return the first id of a table still missing from its copy
+
+    Batches commit in id order, so every row before it was copied. Rows
+    the trigger mirrored can have any id, so the copy's highest one
+    doesn't tell how far the copy got.
+    """
+    cursor.execute(
+        f'SELECT id FROM {table} WHERE NOT EXISTS (SELECT 1 FROM '
+        f'{shadow_name(table)} copied WHERE copied.id = {table}.id AND '
+        f'copied.user_id = {table}.user_id) ORDER BY id LIMIT 1'
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def copy_rows(connection, batch_size, sleep=0, table=TABLE):
+    """Copy the rows of a table to its copy, yielding the ids done
+
+    An interrupted copy resumes at the first row not copied yet.
+    """
+    with connection.cursor() as cursor:
+        resume = resume_from(cursor, table)
+        if resume is None:
+            return
+        cursor.execute(f'SELECT min(id), max(id) FROM {table}')
+        first, last = cursor.fetchone()
+
+    for start in range(resume, last + 1, batch_size):
+        with transaction.atomic(using=connection.alias), \
+                connection.cursor() as cursor:
+            cursor.execute(copy_sql(table), [start, start + batch_size])
+        yield min(start + batch_size, last + 1) - first, last + 1 - first
+        if sleep:
+            time.sleep(sleep)
+
+
+def swap(connection, table=TABLE):
+    """Replace a table by its copy once both hold the same rows
+
+    The rows are counted before the table is locked, since the trigger
+    keeps both equal from then on, so the exclusive lock is only held to
+    drop the trigger and rename the copy into place.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT count(*) FROM {table}), '
+            f'(SELECT count(*) FROM {shadow_name(table)})'
+        )
+        rows, copied = cursor.fetchone()
+    if rows != copied:
+        raise ValueError(
+            f'{table} has {rows} rows but its copy {copied}; copy the '
+            'rows again'
+        )
+
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        layout = describe(cursor, table)
+        # Tables with deferred constraint checks still pending from this
+        # transaction can't be altered; run the checks now
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for statement in swap_sql(
+                table, layout['indexes'], layout['foreign_keys'],
+                layout['references'], layout['sequence']):
+            cursor.execute(statement)
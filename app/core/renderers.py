@@ -0,0 +1,91 @@
+"""JSON rendering backed by orjson when it is installed
+
+FastJSONRenderer renders the same bytes as DRF's JSONRenderer under the
+default settings (compact, unicode, strict): dates and times keep DRF's
+millisecond precision and `Z` suffix, Decimals become floats, UUIDs
+strings, and U+2028/U+2029 stay escaped. Other settings, an `indent`
+media type parameter, values orjson cannot encode (integers beyond 64
+bits, say) and a missing orjson all fall back to the stdlib path.
+
+Known differences under orjson: NaN and infinities render as null
+instead of failing, and floats use the shortest representation without
+a `+` in the exponent (1e16 rather than 1e+16).
+"""
+from rest_framework import renderers
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _escape_line_separators(content):
+    # Same as DRF: they are valid JSON but not valid JavaScript
+    if b'\xe2\x80' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+    return content
+
+
+def _stdlib_dumps(data):
+    content = json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False,
+        allow_nan=not api_settings.STRICT_JSON, separators=(',', ':')
+    )
+    return _escape_line_separators(content.encode())
+
+
+def dumps(data):
+    """Encode data like FastJSONRenderer does, as compact UTF-8 bytes"""
+    if orjson is not None:
+        try:
+            return _escape_line_separators(orjson.dumps(
+                data, default=_encoder.default, option=ORJSON_OPTIONS
+            ))
+        except orjson.JSONEncodeError:
+            pass
+    return _stdlib_dumps(data)
+
+
+def iter_json_array(items, batch_size=100):
+    """Yield a JSON array of items in chunks of `batch_size` encoded items
+
+    Lets a StreamingHttpResponse send arrays too large to build at once.
+    """
+    yield b'['
+    separator = b''
+    batch = []
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= batch_size:
+            yield separator + b','.join(batch)
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + b','.join(batch)
+    yield b']'
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, encoding through orjson when possible"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or \
+                not self.compact or \
+                self.encoder_class is not encoders.JSONEncoder:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
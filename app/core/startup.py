@@ -0,0 +1,64 @@
+"""Time the phases of starting the application in a fresh interpreter
+
+Run as `python -m core.startup`; prints the seconds each phase took as
+JSON. The `profile_startup` command drives it and reports the results.
+"""
+import json
+import os
+import sys
+import time
+
+
+def _timed(phases, name, func):
+    start = time.perf_counter()
+    result = func()
+    phases.append((name, time.perf_counter() - start))
+    return result
+
+
+def _import_settings():
+    from django.conf import settings
+
+    settings.INSTALLED_APPS
+
+
+def _setup_apps():
+    import django
+
+    django.setup(set_prefix=False)
+
+
+def _load_urls():
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+
+def _load_wsgi():
+    from django.core.wsgi import get_wsgi_application
+
+    return get_wsgi_application()
+
+
+def _first_request():
+    # The liveness probe touches neither the database nor the cache
+    from django.test import Client
+
+    Client(HTTP_HOST='localhost').get('/healthz')
+
+
+def profile():
+    """Return (phase, seconds) pairs of starting the application"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    phases = []
+    _timed(phases, 'import django', lambda: __import__('django'))
+    _timed(phases, 'settings', _import_settings)
+    _timed(phases, 'app registry', _setup_apps)
+    _timed(phases, 'url conf', _load_urls)
+    _timed(phases, 'wsgi handler', _load_wsgi)
+    _timed(phases, 'first request', _first_request)
+    return phases
+
+
+if __name__ == '__main__':
+    json.dump(profile(), sys.stdout)
@@ -0,0 +1,49 @@
+"""Media storage that keeps one copy of content-addressed files"""
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+# Names made by core.models.product_image_file_path from a SHA-256 digest
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{64}\.\w+$')
+# Variants of those, made by product.images.variant_name
+CONTENT_ADDRESSED_VARIANT = re.compile(
+    r'(^|/)variants/[0-9a-f]{64}/\w+\.\w+$'
+)
+
+
+def is_content_addressed(name):
+    """Return whether a name always stands for the same content"""
+    return bool(
+        CONTENT_ADDRESSED.search(name) or
+        CONTENT_ADDRESSED_VARIANT.search(name)
+    )
+
+
+class MediaStorage(FileSystemStorage):
+    """File system storage that stores identical uploads once
+
+    A content-addressed name that already exists holds the same bytes, so
+    saving it again keeps the existing file instead of writing a renamed
+    copy. That includes the variants of a content-addressed image. Other
+    names are stored as usual.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not is_content_addressed(name):
+            return super()._save(name, content)
+        if self.exists(name):
+            return name
+
+        # Write under a temporary name and move it in place, so a
+        # concurrent upload of the same file never sees it half written
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
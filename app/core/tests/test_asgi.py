@@ -0,0 +1,158 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.asgi import ASGIHandler
+from core.models import AuthToken
+from core.tests.utils import detail_url, sample_product, sample_tag
+
+
+PRODUCTS_URL = reverse('product:product-list')
+TAGS_URL = reverse('product:tag-list')
+EXPORT_URL = reverse('product:product-export')
+
+
+# Compare freshly rendered responses, not a cached copy of the first one
+@override_settings(PRODUCT_CACHE_TIMEOUT=0)
+class ASGIHandlerTests(TransactionTestCase):
+    """Test serving the API through the ASGI handler"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.token = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        product = sample_product(user=self.user, title='Desk')
+        product.tags.add(sample_tag(user=self.user))
+        sample_product(user=self.user, title='Chair')
+        # One thread, so its database connection can be closed afterwards
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.handler = ASGIHandler(executor=self.executor)
+
+    def tearDown(self):
+        self.executor.submit(connections.close_all).result()
+        self.executor.shutdown()
+
+    def request(self, path, query_string=b'', method='GET', body=b'',
+                chunked=False):
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query_string,
+            'http_version': '1.1',
+            'scheme': 'http',
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', b'Token ' + self.token.key.encode()),
+                (b'content-type', b'application/json'),
+            ],
+        }
+        if chunked:
+            half = len(body) // 2
+            inbound = [
+                {'type': 'http.request', 'body': body[:half],
+                 'more_body': True},
+                {'type': 'http.request', 'body': body[half:]},
+            ]
+        else:
+            scope['headers'].append(
+                (b'content-length', str(len(body)).encode())
+            )
+            inbound = [{'type': 'http.request', 'body': body}]
+        sent = []
+
+        async def receive():
+            return inbound.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        status = sent[0]['status']
+        headers = dict(sent[0]['headers'])
+        content = b''.join(message.get('body', b'') for message in sent[1:])
+        return status, headers, content
+
+    def test_list_matches_wsgi(self):
+        """Test the product list is the same as under WSGI"""
+        status, headers, content = self.request(
+            PRODUCTS_URL, b'limit=1'
+        )
+
+        res = self.client.get(PRODUCTS_URL, {'limit': 1})
+        self.assertEqual(status, 200)
+        self.assertEqual(content, res.content)
+        self.assertEqual(headers[b'link'].decode(), res['Link'])
+
+    def test_retrieve_and_tags_match_wsgi(self):
+        """Test product details and tags are the same as under WSGI"""
+        product = self.user.product_set.get(title='Desk')
+        for path in (detail_url(product.id), TAGS_URL):
+            status, headers, content = self.request(path)
+
+            self.assertEqual(status, 200)
+            self.assertEqual(content, self.client.get(path).content)
+
+    def test_post_body(self):
+        """Test request bodies reach the view"""
+        status, headers, content = self.request(
+            PRODUCTS_URL, method='POST', body=json.dumps({
+                'title': 'Lamp', 'time_minutes': 5, 'price': '3.00',
+                'tags': [], 'attributes': [],
+            }).encode()
+        )
+
+        self.assertEqual(status, 201, content)
+        self.assertEqual(json.loads(content.decode())['title'], 'Lamp')
+
+    def test_chunked_body(self):
+        """Test bodies sent without a content length reach the view"""
+        status, headers, content = self.request(
+            PRODUCTS_URL, method='POST', chunked=True, body=json.dumps({
+                'title': 'Lamp', 'time_minutes': 5, 'price': '3.00',
+                'tags': [], 'attributes': [],
+            }).encode()
+        )
+
+        self.assertEqual(status, 201, content)
+        self.assertEqual(json.loads(content.decode())['title'], 'Lamp')
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_body_too_large(self):
+        """Test bodies over the limit are refused by length or as read"""
+        for chunked in (False, True):
+            status, headers, content = self.request(
+                PRODUCTS_URL, method='POST', chunked=chunked,
+                body=json.dumps({'title': 'Lamp'}).encode()
+            )
+
+            self.assertEqual(status, 413)
+            self.assertIn('detail', json.loads(content.decode()))
+
+    def test_streaming_response(self):
+        """Test a streamed export arrives in full"""
+        status, headers, content = self.request(EXPORT_URL)
+
+        self.assertEqual(status, 200)
+        titles = [json.loads(line)['title'] for line in content.splitlines()]
+        self.assertEqual(titles, ['Desk', 'Chair'])
+
+    def test_unauthenticated(self):
+        """Test authentication still applies"""
+        AuthToken.objects.filter(user=self.user).delete()
+
+        status, headers, content = self.request(PRODUCTS_URL)
+
+        self.assertEqual(status, 401)
@@ -0,0 +1,181 @@
+import io
+import json
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core import benchmark
+from core.models import AuthToken, Product
+
+
+class BenchmarkTests(TestCase):
+    """Test the benchmark helpers"""
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile"""
+        values = list(range(1, 101))
+
+        self.assertEqual(benchmark.percentile(values, 0.50), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([3], 0.95), 3)
+
+    def test_compare_flags_regressions(self):
+        """Test that slower latency and extra queries are regressions"""
+        base = {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30,
+                'queries_per_request': 3}
+        baseline = {'scenarios': {'list': base}}
+        results = {'scenarios': {'list': dict(
+            base, p95_ms=23, queries_per_request=4
+        )}}
+
+        regressions = benchmark.compare(results, baseline, tolerance=0.1)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('list: p95_ms'))
+        self.assertEqual(benchmark.compare(results, baseline, 0.2)[0],
+                         'list: queries_per_request 4 > 3')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PROCESSING_ASYNC=False)
+class BenchmarkCommandTests(TestCase):
+    """Test the seed_catalog and bench_api commands"""
+
+    def setUp(self):
+        call_command(
+            'seed_catalog', users=2, products=5, tags=3, attributes=3,
+            links=2, stdout=open(os.devnull, 'w')
+        )
+        self.output = tempfile.NamedTemporaryFile(suffix='.json')
+
+    def tearDown(self):
+        self.output.close()
+
+    def _bench(self, **options):
+        call_command(
+            'bench_api', requests=3, warmup=1, output=self.output.name,
+            stdout=open(os.devnull, 'w'), **options
+        )
+        with open(self.output.name) as output:
+            return json.load(output)
+
+    def test_seed_catalog(self):
+        """Test seeding users with linked products"""
+        user = get_user_model().objects.get(email='user1@bench.local')
+        products = Product.objects.filter(user=user)
+
+        self.assertEqual(products.count(), 5)
+        self.assertEqual(products.first().tags.count(), 2)
+        self.assertEqual(products.first().attributes.count(), 2)
+        self.assertTrue(user.auth_tokens.exists())
+        if connection.vendor == 'postgresql':
+            self.assertFalse(products.filter(search_vector=None).exists())
+
+    def test_bench_api_in_process(self):
+        """Test that every scenario is measured and written out"""
+        results = self._bench()
+
+        self.assertEqual(results['meta']['mode'], 'in-process')
+        self.assertEqual(
+            set(results['scenarios']), set(benchmark.SCENARIOS)
+        )
+        for name, summary in results['scenarios'].items():
+            self.assertEqual(summary['errors'], 0, name)
+            self.assertEqual(summary['requests'], 3)
+            self.assertIsNotNone(summary['queries_per_request'])
+
+    def test_bench_api_fails_on_regression(self):
+        """Test that exceeding the baseline budget fails the command"""
+        results = self._bench(scenarios='list', no_cache=True)
+        results['scenarios']['list']['queries_per_request'] -= 1
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline:
+            json.dump(results, baseline)
+            baseline.flush()
+
+            with self.assertRaises(CommandError):
+                self._bench(
+                    scenarios='list', no_cache=True,
+                    baseline=baseline.name, tolerance=100
+                )
+
+    def test_bench_serializers(self):
+        """Test the serializer paths are timed and render the same bytes"""
+        out = io.StringIO()
+
+        call_command('bench_serializers', repeat=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('model '))
+        self.assertTrue(lines[1].startswith('values '))
+        self.assertIn('5 rows', lines[2])
+
+    def test_bench_tokens(self):
+        """Test token lookups are timed against a filled token table"""
+        out = io.StringIO()
+
+        call_command(
+            'bench_tokens', tokens=20, lookups=5, batch_size=8, clear=True,
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0][:len('Inserted 20 tokens')],
+                         'Inserted 20 tokens')
+        self.assertTrue(lines[1].startswith('uncached  p50='))
+        self.assertTrue(lines[2].startswith('cached    p50='))
+        self.assertFalse(
+            AuthToken.objects.filter(key__startswith='bench-').exists()
+        )
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_bench_login(self):
+        """Test password checks per second are reported per hasher"""
+        out = io.StringIO()
+
+        call_command(
+            'bench_login', hashers=['pbkdf2_sha256'], seconds=0.05,
+            threads=2, stdout=out
+        )
+
+        line, = out.getvalue().splitlines()
+        self.assertTrue(line.startswith('pbkdf2_sha256 '))
+        self.assertIn('logins/s', line)
+
+    def test_bench_throttle(self):
+        """Test the throttle check is timed against its budget"""
+        out = io.StringIO()
+
+        call_command('bench_throttle', requests=200, clients=10, stdout=out)
+        call_command(
+            'bench_throttle', requests=200, clients=10, alias='default',
+            stdout=out
+        )
+
+        local, shared = out.getvalue().splitlines()
+        self.assertTrue(local.startswith('local mean='))
+        self.assertTrue(shared.startswith('default mean='))
+        self.assertTrue(local.endswith('rejected=0'))
+        with self.assertRaises(CommandError):
+            call_command('bench_throttle', requests=10, budget=0,
+                         stdout=io.StringIO())
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_bench_search(self):
+        """Test search queries are timed with their plan on PostgreSQL"""
+        out = io.StringIO()
+
+        call_command('bench_search', 'product', 'tag 1', repeat=2, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[-2].startswith("'product' "))
+        self.assertIn('rows=5', lines[-2])
+        self.assertTrue(lines[-1].startswith("'tag 1' "))
+        self.assertIn(' index=', lines[-1])
+        with self.assertRaises(CommandError):
+            call_command('bench_search', 'product', repeat=2, budget=1e-9,
+                         stdout=io.StringIO())
@@ -1,5 +1,6 @@
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -9,15 +10,31 @@ class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(
+                gi.return_value.ensure_connection.call_count, 1
+            )
+            gi.return_value.close.assert_called_once_with()
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         """Test waiting for db"""
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
             # insert a side effect to the call
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            ensure_connection = gi.return_value.ensure_connection
+            ensure_connection.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', max_delay=1)
+            self.assertEqual(ensure_connection.call_count, 6)
+            # The wait doubles from the initial delay up to the maximum
+            self.assertEqual(
+                [call[0][0] for call in ts.call_args_list],
+                [0.1, 0.2, 0.4, 0.8, 1]
+            )
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """Test giving up once the timeout has passed"""
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.ensure_connection.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0)
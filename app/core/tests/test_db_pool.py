@@ -0,0 +1,155 @@
+import threading
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.backends.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+        self.usable = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.created = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.created.append(conn)
+        return conn
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('check', lambda conn: conn.usable)
+        return ConnectionPool(self.connect, clock=self.clock, **kwargs)
+
+    def test_reuses_returned_connections(self):
+        """Test a returned connection is handed out again"""
+        pool = self.make_pool(max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['size'], 1)
+
+    def test_times_out_when_exhausted(self):
+        """Test checking out of a full pool fails after the wait timeout"""
+        pool = self.make_pool(max_size=1, wait_timeout=0)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        """Test a blocked checkout resumes when a connection comes back"""
+        pool = ConnectionPool(self.connect, max_size=1, wait_timeout=5)
+        conn = pool.getconn()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+        waiter.start()
+        while not pool.stats()['waits']:
+            pass
+        pool.putconn(conn)
+        waiter.join(5)
+
+        self.assertEqual(got, [conn])
+        self.assertEqual(pool.stats()['timeouts'], 0)
+
+    def test_idle_timeout_closes_connections(self):
+        """Test connections idle past the timeout are not reused"""
+        pool = self.make_pool(idle_timeout=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.clock.now = 61
+
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_health_check_after_idle(self):
+        """Test a connection that fails its ping is replaced"""
+        pool = self.make_pool(health_check_interval=10)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.usable = False
+
+        self.clock.now = 5
+        self.assertIs(pool.getconn(), conn)
+        pool.putconn(conn)
+
+        self.clock.now = 20
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertTrue(conn.closed)
+
+    def test_discard_frees_a_slot(self):
+        """Test discarding a connection lets a new one be created"""
+        pool = self.make_pool(max_size=1, wait_timeout=0)
+        pool.putconn(pool.getconn(), discard=True)
+
+        pool.getconn()
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def test_failed_connect_frees_a_slot(self):
+        """Test a failed connect doesn't leak pool capacity"""
+        def connect():
+            raise IOError('refused')
+        pool = ConnectionPool(connect, max_size=1, wait_timeout=0)
+
+        for attempt in range(2):
+            with self.assertRaises(IOError):
+                pool.getconn()
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+class PooledBackendTests(TestCase):
+
+    def test_close_returns_connection_to_pool(self):
+        """Test the pooled backend reuses the server connection"""
+        from core.backends.postgresql.base import DatabaseWrapper, get_pool
+
+        settings_dict = dict(
+            connection.settings_dict,
+            POOL={'MAX_SIZE': 1},
+        )
+        wrapper = DatabaseWrapper(settings_dict, alias='pool_test')
+        try:
+            wrapper.ensure_connection()
+            first = wrapper.connection
+            wrapper.close()
+            wrapper.ensure_connection()
+
+            self.assertIs(wrapper.connection, first)
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.assertEqual(cursor.fetchone(), (1,))
+            stats = get_pool('pool_test').stats()
+            self.assertEqual(stats['created'], 1)
+            self.assertEqual(stats['checkouts'], 2)
+        finally:
+            wrapper.close()
+            get_pool('pool_test').close()
@@ -0,0 +1,86 @@
+import io
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health
+from core.models import SchemaStamp
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthTests(TestCase):
+    """Test the liveness and readiness probes"""
+
+    def setUp(self):
+        patcher = patch.object(health, '_migrated', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_healthz(self):
+        """Test the liveness probe needs no dependency"""
+        with patch.object(health, 'check_database') as check_database:
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+        check_database.assert_not_called()
+
+    def test_readyz(self):
+        """Test the readiness probe checks the database, cache, migrations"""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        body = res.json()
+        self.assertEqual(body['status'], 'ok')
+        self.assertEqual(
+            set(body['checks']), {'database', 'cache', 'migrations'}
+        )
+        self.assertIn('no-cache', res['Cache-Control'])
+
+    def test_readyz_unavailable(self):
+        """Test a failing check makes the probe fail"""
+        with patch.object(health, 'pending_migrations', return_value=['x']):
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        migrations = res.json()['checks']['migrations']
+        self.assertEqual(migrations['ok'], False)
+        self.assertEqual(migrations['error'], 'RuntimeError')
+
+    def test_readyz_trusts_matching_stamp(self):
+        """Test the migration plan is skipped when the stamp matches"""
+        health.stamp(health.migration_digest())
+
+        with patch.object(health, 'pending_migrations') as pending:
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        pending.assert_not_called()
+
+    def test_migrate_if_needed(self):
+        """Test migrate runs once per migration digest"""
+        out = io.StringIO()
+        with patch('core.management.commands.migrate_if_needed.'
+                   'call_command') as migrate:
+            call_command('migrate_if_needed', stdout=out)
+            call_command('migrate_if_needed', stdout=out)
+
+        self.assertEqual(migrate.call_count, 1)
+        self.assertEqual(
+            SchemaStamp.objects.get().digest, health.migration_digest()
+        )
+        self.assertIn('skipping migrate', out.getvalue())
+
+    def test_profile_startup(self):
+        """Test the startup phases are timed in a fresh interpreter"""
+        out = io.StringIO()
+
+        call_command('profile_startup', runs=1, stdout=out)
+
+        for phase in ('interpreter total', 'app registry', 'url conf'):
+            self.assertIn(phase, out.getvalue())
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from core import media
+
+
+CONTENT = bytes(range(256)) * 4
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+class ParseRangeTests(SimpleTestCase):
+    """Test parsing Range headers"""
+
+    def test_ranges(self):
+        """Test single byte ranges are clamped to the file"""
+        self.assertEqual(media.parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(media.parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(media.parse_range('bytes=-200', 100), (0, 99))
+
+    def test_ignored(self):
+        """Test missing, invalid and multiple ranges mean the whole file"""
+        for header in (None, '', 'bytes=5-1', 'bytes=0-1,5-9', 'lines=1-2'):
+            self.assertIsNone(media.parse_range(header, 100))
+
+    def test_unsatisfiable(self):
+        """Test a range past the end of the file raises"""
+        for header in ('bytes=100-', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                media.parse_range(header, 100)
+
+
+class MediaServeTests(SimpleTestCase):
+    """Test serving media files"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        os.makedirs(os.path.join(self.root.name, 'uploads/product'))
+        self.path = f'uploads/product/{DIGEST}.jpg'
+        with open(os.path.join(self.root.name, self.path), 'wb') as file:
+            file.write(CONTENT)
+
+    def test_full_file(self):
+        """Test a file is streamed with long-lived immutable caching"""
+        res = self.client.get(media_url(self.path))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('Last-Modified', res)
+
+    @override_settings(MEDIA_CACHE_MAX_AGE=60)
+    def test_mutable_name(self):
+        """Test files not named by content get the shorter max age"""
+        path = 'uploads/product/variants/x/thumb.jpg'
+        os.makedirs(os.path.join(self.root.name, os.path.dirname(path)))
+        with open(os.path.join(self.root.name, path), 'wb') as file:
+            file.write(b'thumb')
+
+        res = self.client.get(media_url(path))
+
+        self.assertEqual(res['Cache-Control'], 'public, max-age=60')
+
+    def test_range(self):
+        """Test a byte range is answered with partial content"""
+        res = self.client.get(media_url(self.path), HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_range_unsatisfiable(self):
+        """Test a range past the end is refused"""
+        res = self.client.get(media_url(self.path), HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_if_range_stale(self):
+        """Test a stale If-Range validator gets the whole file"""
+        res = self.client.get(
+            media_url(self.path), HTTP_RANGE='bytes=0-1',
+            HTTP_IF_RANGE='"stale"'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_not_modified(self):
+        """Test conditional requests for an unchanged file get a 304"""
+        first = self.client.get(media_url(self.path))
+
+        by_date = self.client.get(
+            media_url(self.path),
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                os.path.getmtime(os.path.join(self.root.name, self.path))
+            )
+        )
+        by_etag = self.client.get(
+            media_url(self.path), HTTP_IF_NONE_MATCH=first['ETag']
+        )
+
+        self.assertEqual(by_date.status_code, 304)
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertIn('immutable', by_etag['Cache-Control'])
+
+    def test_missing_and_traversal(self):
+        """Test missing files and paths outside MEDIA_ROOT are not found"""
+        for path in ('uploads/product/none.jpg', '../etc/passwd', 'uploads'):
+            res = self.client.get(media_url(path))
+            self.assertEqual(res.status_code, 404)
+
+    def test_head(self):
+        """Test HEAD requests get the headers only"""
+        res = self.client.head(media_url(self.path))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+
+    @override_settings(
+        MEDIA_OFFLOAD='x-accel-redirect', MEDIA_ACCEL_PREFIX='/internal/'
+    )
+    def test_x_accel_redirect(self):
+        """Test the file can be left to nginx to send"""
+        res = self.client.get(media_url(self.path))
+
+        self.assertEqual(res['X-Accel-Redirect'], f'/internal/{self.path}')
+        self.assertEqual(res.content, b'')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    @override_settings(MEDIA_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        """Test the file can be left to the proxy by path"""
+        res = self.client.get(media_url(self.path))
+
+        self.assertEqual(
+            res['X-Sendfile'], os.path.join(self.root.name, self.path)
+        )
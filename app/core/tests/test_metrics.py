@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.middleware import PerformanceMiddleware
+from core.models import Tag
+
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('product:tag-list')
+
+
+class MetricTests(SimpleTestCase):
+    """Test the Prometheus text rendering of the metrics"""
+
+    def test_histogram(self):
+        """Test histogram buckets are cumulative and end with +Inf"""
+        histogram = metrics.Histogram(
+            'latency', 'Latency.', ('view',), (0.1, 1)
+        )
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, 'list')
+
+        self.assertEqual(histogram.collect(), [
+            '# HELP latency Latency.',
+            '# TYPE latency histogram',
+            'latency_bucket{view="list",le="0.1"} 1',
+            'latency_bucket{view="list",le="1"} 3',
+            'latency_bucket{view="list",le="+Inf"} 4',
+            'latency_sum{view="list"} 4.25',
+            'latency_count{view="list"} 4',
+        ])
+
+    def test_counter_escapes_labels(self):
+        """Test label values are escaped"""
+        counter = metrics.Counter('hits', 'Hits.', ('view',))
+        counter.inc('a"b')
+        counter.inc('a"b', amount=2)
+
+        self.assertEqual(counter.collect()[-1], r'hits{view="a\"b"} 3')
+
+
+@override_settings(
+    METRICS_SAMPLE_RATE=1, SERVER_TIMING=True, PRODUCT_CACHE_TIMEOUT=0
+)
+class PerformanceMiddlewareTests(TestCase):
+    """Test the request instrumentation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        """Test sampled API responses carry their timing breakdown"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        names = [
+            entry.split(';')[0] for entry in res['Server-Timing'].split(', ')
+        ]
+        self.assertEqual(names, ['total', 'db', 'serialize', 'render'])
+        self.assertRegex(res['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ q')
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled(self):
+        """Test unsampled requests only report their total time"""
+        res = self.client.get(TAGS_URL)
+
+        self.assertRegex(res['Server-Timing'], r'^total;dur=[\d.]+$')
+
+    def test_metrics_endpoint(self):
+        """Test /metrics exposes the recorded requests and gauges"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        body = res.content.decode()
+        self.assertIn(
+            'http_requests_total{view="product:tag-list",method="GET",'
+            'status="200"}', body
+        )
+        self.assertIn('http_request_queries_bucket{view="product:tag-list"',
+                      body)
+        self.assertIn('token_cache{stat="hits"}', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test /metrics requires the configured bearer token"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_DUPLICATE_QUERIES=3)
+    def test_duplicate_queries(self):
+        """Test a query repeated past the threshold is flagged"""
+        def view(request):
+            for _ in range(3):
+                list(Tag.objects.filter(user=self.user))
+            return HttpResponse()
+
+        before = metrics.DUPLICATE_QUERIES._values.get(
+            ('unmatched', 'GET'), 0
+        )
+        middleware = PerformanceMiddleware(view)
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            res = middleware(RequestFactory().get('/'))
+
+        self.assertIn('3 repeated', res['Server-Timing'])
+        self.assertIn('ran one query 3 times', logs.output[0])
+        self.assertEqual(
+            metrics.DUPLICATE_QUERIES._values[('unmatched', 'GET')],
+            before + 1
+        )
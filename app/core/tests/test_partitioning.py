@@ -0,0 +1,253 @@
+import re
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import partitioning
+from core.models import Product, Tag
+from core.tests.utils import sample_product
+
+
+INDEXES = [
+    ('product_user_id_idx',
+     'CREATE INDEX product_user_id_idx ON public.core_product '
+     'USING btree (user_id, id)'),
+]
+FOREIGN_KEYS = [
+    ('core_product_user_id_fk',
+     'FOREIGN KEY (user_id) REFERENCES core_user(id) '
+     'DEFERRABLE INITIALLY DEFERRED'),
+]
+
+
+class PartitioningSqlTests(SimpleTestCase):
+    """Test the statements converting a table into partitions"""
+
+    def test_create(self):
+        """Test the copy is hash partitioned with indexes under new names"""
+        statements = partitioning.create_sql(
+            'core_product', 4, INDEXES, FOREIGN_KEYS
+        )
+
+        self.assertIn('PARTITION BY HASH (user_id)', statements[0])
+        self.assertIn('PRIMARY KEY (id, user_id)', statements[1])
+        self.assertEqual(
+            [s for s in statements if 'PARTITION OF' in s][-1],
+            'CREATE TABLE core_product_p3 PARTITION OF '
+            'core_product_partitioned FOR VALUES WITH (MODULUS 4, '
+            'REMAINDER 3)'
+        )
+        self.assertIn(
+            'CREATE INDEX product_user_id_idx_new ON '
+            'core_product_partitioned USING btree (user_id, id)', statements
+        )
+        self.assertTrue(statements[-1].startswith(
+            'ALTER TABLE core_product_partitioned ADD CONSTRAINT '
+            'core_product_user_id_fk_new FOREIGN KEY'
+        ))
+
+    def test_unique_index_refused(self):
+        """Test unique indexes without the partition key are refused"""
+        with self.assertRaises(ValueError):
+            partitioning.create_sql('core_product', 4, [
+                ('product_slug', 'CREATE UNIQUE INDEX product_slug ON '
+                 'public.core_product USING btree (slug)'),
+            ], [])
+
+    def test_swap(self):
+        """Test the swap locks first and renames everything back"""
+        statements = partitioning.swap_sql(
+            'core_product', INDEXES, FOREIGN_KEYS,
+            [('core_product_tags_fk', 'core_product_tags', 'product_id')],
+            'public.core_product_id_seq'
+        )
+
+        self.assertEqual(statements[:2], [
+            'LOCK TABLE core_product IN ACCESS EXCLUSIVE MODE',
+            'DROP TRIGGER core_product_mirror ON core_product',
+        ])
+        self.assertLess(
+            statements.index('ALTER TABLE core_product_tags DROP CONSTRAINT '
+                             'core_product_tags_fk'),
+            statements.index('DROP TABLE core_product')
+        )
+        self.assertLess(
+            statements.index('ALTER INDEX product_user_id_idx_new RENAME '
+                             'TO product_user_id_idx'),
+            statements.index('ALTER TABLE core_product RENAME CONSTRAINT '
+                             'core_product_user_id_fk_new TO '
+                             'core_product_user_id_fk')
+        )
+        self.assertEqual(statements[-2:], [
+            'CREATE CONSTRAINT TRIGGER core_product_tags_fk AFTER INSERT OR '
+            'UPDATE OF product_id ON core_product_tags DEFERRABLE INITIALLY '
+            "DEFERRED FOR EACH ROW EXECUTE FUNCTION "
+            "core_product_referenced('product_id')",
+            'CREATE CONSTRAINT TRIGGER core_product_tags_fk AFTER DELETE OR '
+            'UPDATE OF id ON core_product DEFERRABLE INITIALLY DEFERRED FOR '
+            'EACH ROW EXECUTE FUNCTION '
+            "core_product_referencing('core_product_tags', 'product_id')",
+        ])
+
+
+class ProductSaveTests(TestCase):
+    """Test product saves are pruned to the owner's partition"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'testpass'
+        )
+
+    def test_update_filtered_by_user(self):
+        """Test the update of a saved product is filtered by its user"""
+        product = sample_product(self.user)
+        product.title = 'Renamed'
+
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+
+        update = queries[0]['sql']
+        self.assertTrue(update.startswith('UPDATE "core_product"'))
+        self.assertIn('"core_product"."user_id" = ', update)
+        self.assertEqual(Product.objects.get().title, 'Renamed')
+
+    def test_update_owner_changed(self):
+        """Test a product moved to another user is updated, not copied"""
+        product = sample_product(self.user)
+        product.user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'testpass'
+        )
+
+        product.save()
+
+        self.assertEqual(Product.objects.get().user, product.user)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+class PartitionProductsTests(TestCase):
+    """Test converting the product table (rolled back with the test)"""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(f'user{index}', 'testpass')
+            for index in range(3)
+        ]
+        self.tag = Tag.objects.create(user=self.users[0], name='Vegan')
+        self.products = [
+            sample_product(user) for user in self.users for _ in range(3)
+        ]
+        self.products[0].tags.add(self.tag)
+
+    def partition(self, **options):
+        call_command('partition_products', partitions=4, batch_size=2,
+                     stdout=StringIO(), **options)
+
+    def test_partition(self):
+        """Test the rows, relations and sequence survive the conversion"""
+        self.partition()
+
+        with connection.cursor() as cursor:
+            self.assertTrue(
+                partitioning.is_partitioned(cursor, 'core_product')
+            )
+            self.assertFalse(partitioning.table_exists(
+                cursor, 'core_product_partitioned'
+            ))
+        self.assertEqual(
+            sorted(Product.objects.values_list('id', flat=True)),
+            [product.id for product in self.products]
+        )
+        self.assertEqual(
+            list(self.tag.product_set.values_list('id', flat=True)),
+            [self.products[0].id]
+        )
+        product = sample_product(self.users[0])
+        self.assertGreater(product.id, self.products[-1].id)
+        product.delete()
+
+    def test_writes_mirrored(self):
+        """Test writes between the copy and the swap reach the partitions"""
+        self.partition(no_swap=True)
+        Product.objects.filter(id=self.products[0].id).update(title='New')
+        self.products[1].delete()
+        added = sample_product(self.users[1])
+
+        self.partition()
+
+        self.assertEqual(
+            Product.objects.get(id=self.products[0].id).title, 'New'
+        )
+        self.assertFalse(
+            Product.objects.filter(id=self.products[1].id).exists()
+        )
+        self.assertTrue(Product.objects.filter(id=added.id).exists())
+
+    def test_references_checked(self):
+        """Test the triggers replacing foreign keys keep links consistent"""
+        self.partition()
+
+        with connection.cursor() as cursor:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                cursor.execute(
+                    'INSERT INTO core_product_tags (product_id, tag_id) '
+                    'VALUES (0, %s)', [self.tag.id]
+                )
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                cursor.execute('DELETE FROM core_product WHERE id = %s',
+                               [self.products[0].id])
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+            self.products[0].delete()
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+        self.assertFalse(self.tag.product_set.exists())
+
+    def test_copy_resumed(self):
+        """Test an interrupted copy resumes after the rows it copied"""
+        partitioning.prepare(connection, 4)
+        next(partitioning.copy_rows(connection, 2))
+        added = sample_product(self.users[1])
+
+        progress = list(partitioning.copy_rows(connection, 2))
+
+        self.assertEqual(progress[0][0], 4)
+        partitioning.swap(connection)
+        self.assertEqual(
+            sorted(Product.objects.values_list('id', flat=True)),
+            [product.id for product in self.products] + [added.id]
+        )
+
+    def test_old_server_refused(self):
+        """Test servers without hash partitioning are refused up front"""
+        with patch.object(connection, 'pg_version', 100014):
+            with self.assertRaises(CommandError):
+                self.partition()
+
+        with connection.cursor() as cursor:
+            self.assertFalse(partitioning.table_exists(
+                cursor, 'core_product_partitioned'
+            ))
+
+    def test_pruned(self):
+        """Test a user's queries only scan that user's partition"""
+        self.partition()
+
+        queryset = Product.objects.filter(user=self.users[0]).order_by('id')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + str(queryset.query))
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        self.assertEqual(len(re.findall(r' on core_product_p\d+ ', plan)), 1)
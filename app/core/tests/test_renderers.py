@@ -0,0 +1,125 @@
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, iter_json_array
+
+
+SAMPLE = OrderedDict([
+    ('id', 7),
+    ('title', 'Über lamp ☃     "quoted"\n'),
+    ('price', Decimal('12.50')),
+    ('ratio', 0.1),
+    ('created', datetime.datetime(
+        2020, 5, 17, 10, 20, 30, 123456, tzinfo=timezone.utc
+    )),
+    ('naive', datetime.datetime(2020, 5, 17, 10, 20, 30)),
+    ('day', datetime.date(2020, 5, 17)),
+    ('at', datetime.time(10, 20, 30, 999999)),
+    ('duration', datetime.timedelta(minutes=90)),
+    ('image', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('label', gettext_lazy('This field is required.')),
+    ('tags', [1, 2, 3]),
+    ('pairs', (1, 'a')),
+    ('nested', {'ok': True, 'none': None, 3: 'int key'}),
+    ('huge', 2 ** 70),
+])
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer renders what DRF's renderer does"""
+
+    def assertSameAsDRF(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type), expected
+        )
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(
+                FastJSONRenderer().render(data, accepted_media_type),
+                expected
+            )
+
+    def test_same_bytes(self):
+        """Test dates, decimals, UUIDs and separators match"""
+        self.assertSameAsDRF(SAMPLE)
+        self.assertSameAsDRF([SAMPLE, {}, []])
+
+    def test_without_big_integer(self):
+        """Test a document orjson can encode on its own matches"""
+        data = OrderedDict(SAMPLE)
+        del data['huge']
+        self.assertSameAsDRF(data)
+
+    def test_indent(self):
+        """Test an indent media type parameter is honoured"""
+        self.assertSameAsDRF(SAMPLE, 'application/json; indent=4')
+
+    def test_none(self):
+        """Test None renders an empty body"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_unsupported_type(self):
+        """Test an unencodable value fails like the stdlib encoder"""
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'value': object()})
+
+    def test_iter_json_array(self):
+        """Test streaming an array in batches"""
+        chunks = list(iter_json_array(
+            ({'id': i, 'at': SAMPLE['created']} for i in range(5)),
+            batch_size=2
+        ))
+
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(
+            b''.join(chunks),
+            JSONRenderer().render(
+                [{'id': i, 'at': SAMPLE['created']} for i in range(5)]
+            )
+        )
+        self.assertEqual(b''.join(iter_json_array([])), b'[]')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the orjson parser parses what DRF's parser does"""
+
+    def parse(self, parser, content, encoding='utf-8'):
+        return parser.parse(
+            io.BytesIO(content), parser_context={'encoding': encoding}
+        )
+
+    def assertSameAsDRF(self, content, encoding='utf-8'):
+        self.assertEqual(
+            self.parse(FastJSONParser(), content, encoding),
+            self.parse(JSONParser(), content, encoding)
+        )
+
+    def test_same_data(self):
+        """Test parsed documents match"""
+        self.assertSameAsDRF(
+            '{"title": "Über ☃", "price": "1.50", "tags": [1, 2],'
+            ' "big": 123456789012345678901234567890, "ratio": 1.5e3,'
+            ' "escaped": "\\ud83d\\ude00", "none": null}'.encode()
+        )
+        self.assertSameAsDRF('[1, 2]'.encode('utf-16'), 'utf-16')
+
+    def test_errors(self):
+        """Test invalid documents fail with DRF's error messages"""
+        for content in (b'', b'{"a": }', b'[NaN]', b'{"a": 1'):
+            with self.assertRaises(ParseError) as fast:
+                self.parse(FastJSONParser(), content)
+            with self.assertRaises(ParseError) as drf:
+                self.parse(JSONParser(), content)
+            self.assertEqual(str(fast.exception), str(drf.exception))
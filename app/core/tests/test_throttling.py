@@ -0,0 +1,157 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from core import throttling
+
+
+PRODUCTS_URL = reverse('product:product-list')
+RATES = {
+    'api': '5/min',
+    'api:staff': '50/min',
+    'products.create': '2/min',
+    'products.create:staff': '3/min',
+}
+
+
+class Clock:
+    """Time that only moves when told to"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class BucketTests(SimpleTestCase):
+    """Test the token bucket stores"""
+
+    def setUp(self):
+        self.clock = Clock()
+        for name in ('monotonic', 'time'):
+            patcher = patch(f'core.throttling.time.{name}', self.clock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def assertBucket(self, buckets):
+        """Assert a bucket of 3 refilling a token a second"""
+        waits = [buckets.take('key', 3, 1.0) for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 1.0)
+
+        self.clock.now += 0.5
+        self.assertAlmostEqual(buckets.take('key', 3, 1.0), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(buckets.take('key', 3, 1.0), 0)
+        self.assertGreater(buckets.take('key', 3, 1.0), 0)
+        # Other clients have buckets of their own
+        self.assertEqual(buckets.take('other', 3, 1.0), 0)
+
+        # An idle bucket fills up to its size only
+        self.clock.now += 60
+        waits = [buckets.take('key', 3, 1.0) for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 0)
+
+    def test_parse_rate(self):
+        """Test rates become a bucket size and seconds per token"""
+        self.assertEqual(throttling.parse_rate('10/s'), (10, 0.1))
+        self.assertEqual(throttling.parse_rate('120/min'), (120, 0.5))
+        self.assertEqual(throttling.parse_rate('24/day'), (24, 3600))
+
+    def test_local_buckets(self):
+        """Test the in-process buckets"""
+        self.assertBucket(throttling.LocalBuckets(max_size=10))
+
+    def test_local_buckets_bounded(self):
+        """Test the least recently used bucket is dropped over the size"""
+        buckets = throttling.LocalBuckets(max_size=2)
+        for key in ('a', 'b', 'c'):
+            buckets.take(key, 3, 1.0)
+
+        self.assertEqual(list(buckets._full_at), ['b', 'c'])
+
+    def test_cache_buckets(self):
+        """Test the buckets shared through a cache"""
+        self.assertBucket(throttling.CacheBuckets('default'))
+
+    @override_settings(THROTTLE_CACHE_ALIAS='default')
+    def test_store_from_settings(self):
+        """Test THROTTLE_CACHE_ALIAS picks the shared buckets"""
+        self.assertIsInstance(
+            throttling.get_buckets(), throttling.CacheBuckets
+        )
+
+
+@override_settings(REST_FRAMEWORK=dict(
+    api_settings.user_settings, DEFAULT_THROTTLE_RATES=RATES
+))
+class ThrottleApiTests(TestCase):
+    """Test rate limits of the API by action and tier"""
+
+    def setUp(self):
+        throttling.reset()
+        self.addCleanup(throttling.reset)
+        self.user = get_user_model().objects.create_user('user', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self):
+        return self.client.post(PRODUCTS_URL, {
+            'title': 'Chair', 'time_minutes': 5, 'price': '10.00'
+        })
+
+    def test_action_rate(self):
+        """Test an action with a rate of its own is limited by it"""
+        codes = [self.create().status_code for _ in range(3)]
+
+        self.assertEqual(codes, [201, 201, 429])
+        self.assertEqual(self.create()['Retry-After'], '30')
+        # Other actions fall back to the scope's rate
+        self.assertEqual(
+            self.client.get(PRODUCTS_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_default_rate(self):
+        """Test views without rates of their own share the `api` rate"""
+        codes = [
+            self.client.get(PRODUCTS_URL).status_code for _ in range(6)
+        ]
+
+        self.assertEqual(codes, [200] * 5 + [429])
+
+    def test_staff_tier(self):
+        """Test staff users get the rates of their tier"""
+        self.user.is_staff = True
+        self.user.save()
+
+        codes = [self.create().status_code for _ in range(4)]
+        reads = [self.client.get(PRODUCTS_URL).status_code for _ in range(6)]
+
+        self.assertEqual(codes, [201] * 3 + [429])
+        self.assertEqual(reads, [200] * 6)
+
+    def test_per_user(self):
+        """Test each user has buckets of their own"""
+        for _ in range(3):
+            self.create()
+        other = get_user_model().objects.create_user('other', 'testpass')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.create().status_code, status.HTTP_201_CREATED)
+
+    @override_settings(API_THROTTLE=False)
+    def test_disabled(self):
+        """Test API_THROTTLE lifts the limits"""
+        codes = [self.create().status_code for _ in range(3)]
+
+        self.assertEqual(codes, [201] * 3)
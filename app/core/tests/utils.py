@@ -0,0 +1,71 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Attribute, Product, Tag
+
+
+PRODUCT_URL = reverse('product:product-list')
+
+
+def image_upload_url(product_id):
+    """Return URL for product image upload"""
+    return reverse('product:product-upload-image', args=[product_id])
+
+
+def next_page_url(res):
+    """Return the next page URL advertised in a response Link header"""
+    match = re.search(r'<([^>]+)>; rel="next"', res.get('Link', ''))
+    return match.group(1) if match else None
+
+
+def sample_tag(user, name='Outdoors'):
+    """Create and return a sample tag"""
+    return Tag.objects.create(user=user, name=name)
+
+
+def sample_attribute(user, name='Green'):
+    """Create and return a sample attribute"""
+    return Attribute.objects.create(user=user, name=name)
+
+
+def detail_url(product_id):
+    """Return product detail URL"""
+    return reverse('product:product-detail', args=[product_id])
+
+
+def sample_product(user, **params):
+    """Create and return a sample product"""
+    defaults = {
+        'title': 'Sample product',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+
+    return Product.objects.create(user=user, **defaults)
+
+
+class QueryCountMixin:
+    """Assertions about the number of queries a code path runs"""
+
+    def assertConstantQueries(self, func, grow):
+        """Assert func runs as many queries after grow() as before it
+
+        Use it to catch N+1 patterns: `func` exercises the code path and
+        `grow` adds more rows for it to return.
+        """
+        with CaptureQueriesContext(connection) as before:
+            func()
+        grow()
+        with CaptureQueriesContext(connection) as after:
+            func()
+
+        self.assertEqual(
+            len(before), len(after),
+            'Query count grew with the number of rows:\n' + '\n'.join(
+                query['sql'] for query in after.captured_queries
+            )
+        )
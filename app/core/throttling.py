@@ -0,0 +1,202 @@
+"""Token bucket request throttling
+
+Each client gets a bucket per rate. A `<count>/<period>` rate is a bucket
+of `count` requests refilled at `count` per period, so a client can burst
+the whole count and then keep up the average rate. Buckets follow GCRA:
+all a bucket stores is the time at which it will be full again, and
+taking a token moves that time one interval forward, in O(1).
+
+Buckets live in THROTTLE_CACHE_ALIAS, which defaults to the default
+cache when that is shared by the workers (memcached, redis), and in
+process memory behind a lock otherwise. In a shared cache the time
+is an integer of microseconds that requests move with the cache's
+atomic `incr`, so two workers can't both spend the last token. Only a
+bucket that has been full for a while is reset from the current time
+with a plain `set`; requests racing that reset are all let through,
+which a full bucket would have done anyway.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. The most
+specific of `<scope>.<action>:<tier>`, `<scope>.<action>`,
+`<scope>:<tier>`, `<scope>`, `api:<tier>` and `api` applies, where the
+scope is the view's `throttle_scope`, the action is the viewset action
+and the tier is `staff` for staff users or `anon` for anonymous clients.
+Authenticated clients are limited per user, others per address.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Return the bucket size and seconds per token of a rate"""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, PERIODS[period[0]] / count
+
+
+class LocalBuckets:
+    """Buckets in process memory, least recently used dropped first"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._full_at = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, size, interval):
+        """Take a token and return 0, or the seconds until one is free"""
+        now = time.monotonic()
+        with self._lock:
+            full_at = max(self._full_at.get(key, now), now) + interval
+            wait = full_at - now - size * interval
+            if wait > 0:
+                return wait
+            self._full_at[key] = full_at
+            self._full_at.move_to_end(key)
+            if len(self._full_at) > self.max_size:
+                self._full_at.popitem(last=False)
+        return 0
+
+
+class CacheBuckets:
+    """Buckets in a Django cache shared by every worker"""
+    timeout = 24 * 60 * 60
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, size, interval):
+        """Take a token and return 0, or the seconds until one is free"""
+        cache = caches[self.alias]
+        now = int(time.time() * 1000000)
+        step = max(int(interval * 1000000), 1)
+        try:
+            full_at = cache.incr(key, step)
+        except ValueError:
+            full_at = None
+        if full_at is None or full_at < now + step:
+            # New, or full since before now
+            cache.set(key, now + step, self.timeout)
+            return 0
+
+        wait = full_at - now - size * step
+        if wait > 0:
+            cache.decr(key, step)
+            return wait / 1000000
+        return 0
+
+
+def get_buckets(alias=None):
+    """Return the buckets of a cache alias, or those set up by the settings"""
+    global _buckets
+    if alias:
+        return CacheBuckets(alias)
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                if settings.THROTTLE_CACHE_ALIAS:
+                    _buckets = CacheBuckets(settings.THROTTLE_CACHE_ALIAS)
+                else:
+                    _buckets = LocalBuckets(settings.THROTTLE_MAX_KEYS)
+    return _buckets
+
+
+@receiver(setting_changed)
+def reset(**kwargs):
+    """Start from empty buckets, in a store matching the settings"""
+    global _buckets
+    if kwargs.get('setting', 'THROTTLE_CACHE_ALIAS') in (
+            'THROTTLE_CACHE_ALIAS', 'THROTTLE_MAX_KEYS'):
+        _buckets = None
+
+
+class BucketRateThrottle(BaseThrottle):
+    """Throttle with token buckets per scope, action and user tier
+
+    Subclasses can pin a `scope`, which is then looked up alone, a `rate`,
+    which overrides the settings, or a `cache_alias` to keep their buckets
+    in regardless of THROTTLE_CACHE_ALIAS.
+    """
+    scope = None
+    rate = None
+    cache_alias = None
+    default_scope = 'api'
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_tier(self, request):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anon'
+        if user.is_staff:
+            return 'staff'
+        return None
+
+    def get_rate(self, request, view):
+        """Return the name and rate of the most specific rate set"""
+        if self.scope is not None:
+            return self.scope, self.rate or \
+                api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+        scope = getattr(view, 'throttle_scope', None) or self.default_scope
+        action = getattr(view, 'action', None)
+        tier = self.get_tier(request)
+        names = []
+        if action:
+            if tier:
+                names.append(f'{scope}.{action}:{tier}')
+            names.append(f'{scope}.{action}')
+        for name in dict.fromkeys((scope, self.default_scope)):
+            if tier:
+                names.append(f'{name}:{tier}')
+            names.append(name)
+
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        for name in names:
+            if rates.get(name):
+                return name, rates[name]
+        return None, None
+
+    def get_ident(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'user:{user.pk}'
+        return super().get_ident(request)
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.rate_name,
+            'ident': self.get_ident(request),
+        }
+
+    def allow_request(self, request, view):
+        self.delay = 0
+        if not settings.API_THROTTLE:
+            return True
+        self.rate_name, rate = self.get_rate(request, view)
+        if rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        self.delay = get_buckets(self.cache_alias).take(
+            key, *parse_rate(rate)
+        )
+        return not self.delay
+
+    def wait(self):
+        return self.delay
@@ -0,0 +1,68 @@
+"""Gunicorn configuration for serving the API in production
+
+Every setting can be overridden from the environment. Reload the workers
+gracefully with `kill -HUP <master pid>`; because the app is preloaded in
+the master, deploy new code with `kill -USR2` (binary upgrade) or a
+restart instead.
+"""
+import gc
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Threaded workers overlap database waits; (2 x cores) + 1 processes
+# keeps every core busy while some workers are blocked on I/O
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = _env_int('GUNICORN_WORKERS', cpus * 2 + 1)
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# Keep-alive lets clients reuse connections across requests
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Recycle workers now and then to cap the effect of any memory leak
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 5000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 500)
+
+# Code reloading for development; it cannot be combined with preloading
+reload = bool(_env_int('GUNICORN_RELOAD', 0))
+
+# Import the app once in the master so the workers share its memory
+# copy-on-write instead of each importing Django on its own
+preload_app = not reload
+
+# The heartbeat file lives in memory rather than on the container's disk
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def when_ready(server):
+    """Move the preloaded objects out of the garbage collector's reach
+
+    Collections in the workers would otherwise touch every object the
+    master imported and copy the pages they live on. gc.freeze() is new
+    in Python 3.7.
+    """
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Drop any database connection inherited from the master"""
+    from django.db import connections
+
+    from core.backends.postgresql.base import reset_pools
+
+    connections.close_all()
+    reset_pools(close=False)
@@ -0,0 +1,132 @@
+"""Read-through response cache for the product endpoints
+
+Cached responses are keyed on a per-user generation counter. Any write to
+a user's catalog bumps the counter, which orphans every response cached
+for the old generation at once; the orphans then age out through the
+cache's TTL and LRU eviction instead of being deleted one by one.
+
+The counters must live in a cache every worker shares, so responses are
+only cached when PRODUCT_CACHE_TIMEOUT is set, by default only with a
+shared cache.
+"""
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_cache():
+    """Return the cache backend used for product responses"""
+    return caches[settings.PRODUCT_CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f'product:generation:{user_id}'
+
+
+def reset_generation(user_id):
+    """Start the user's cache namespace from a fresh random generation
+
+    A random starting point means that losing the counter (eviction,
+    restart of a shared cache) can never roll it back onto a generation
+    that still has responses cached under it.
+    """
+    generation = random.getrandbits(48)
+    get_cache().set(_generation_key(user_id), generation, timeout=None)
+    return generation
+
+
+def get_generation(user_id):
+    """Return the current cache generation for the user"""
+    generation = get_cache().get(_generation_key(user_id))
+    if generation is None:
+        generation = reset_generation(user_id)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached product response for the user"""
+    try:
+        get_cache().incr(_generation_key(user_id))
+    except ValueError:
+        reset_generation(user_id)
+
+
+def response_cache_key(request, action, pk=None):
+    """Build the cache key for a request to a product endpoint"""
+    params = sorted(
+        (name, values) for name, values in request.query_params.lists()
+    )
+    digest = hashlib.md5(
+        repr((request.get_host(), params)).encode()
+    ).hexdigest()
+    generation = get_generation(request.user.pk)
+
+    return f'product:response:{request.user.pk}:{generation}:' \
+        f'{action}:{pk}:{digest}'
+
+
+class CachedResponseMixin:
+    """Serve list and retrieve from the response cache
+
+    Saves, deletes and link changes through the ORM invalidate the cache
+    from product.signals; views using this mixin must call
+    `invalidate_cache` after writes that bypass the signals, such as
+    bulk_create and queryset updates.
+    """
+    cached_headers = ('Link',)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return the cached response for the request or build it"""
+        if not settings.PRODUCT_CACHE_TIMEOUT:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache_key(
+            request, self.action, kwargs.get(self.lookup_field)
+        )
+        etag = quote_etag(hashlib.md5(
+            f'{key}:{request.accepted_renderer.format}'.encode()
+        ).hexdigest())
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            headers = {
+                name: response[name]
+                for name in self.cached_headers if response.has_header(name)
+            }
+            cache.set(
+                key, (response.data, headers),
+                timeout=settings.PRODUCT_CACHE_TIMEOUT
+            )
+        else:
+            data, headers = cached
+            response = Response(data, headers=headers)
+
+        response['ETag'] = etag
+        return response
+
+    def invalidate_cache(self):
+        """Drop the cached responses of the requesting user"""
+        bump_generation(self.request.user.pk)
@@ -0,0 +1,111 @@
+"""Streaming export of a user's product catalog"""
+import csv
+import json
+from itertools import islice
+
+from core.models import Product
+from core.renderers import iter_json_array
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+RELATED_FIELDS = (
+    ('tags', Product.tags.through, 'tag__name'),
+    ('attributes', Product.attributes.through, 'attribute__name'),
+)
+
+
+def accepts_gzip(accept_encoding):
+    """Return whether an Accept-Encoding header allows a gzipped body
+
+    `gzip;q=0` refuses it; an unlisted gzip takes the quality of `*`.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def _related_names(through, name_field, product_ids):
+    """Map each product ID to the sorted names linked to it"""
+    names = {}
+    rows = through.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', name_field).order_by(name_field)
+    for product_id, name in rows:
+        names.setdefault(product_id, []).append(name)
+
+    return names
+
+
+def iter_products(queryset, chunk_size):
+    """Yield product rows with their tag and attribute names
+
+    Products are read through a server-side cursor and the names are
+    fetched once per chunk, so memory use depends on the chunk size only.
+    """
+    rows = queryset.values(*EXPORT_FIELDS).order_by('id').iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        product_ids = [row['id'] for row in chunk]
+        related = [
+            (field, _related_names(through, name_field, product_ids))
+            for field, through, name_field in RELATED_FIELDS
+        ]
+        for row in chunk:
+            row['price'] = str(row['price'])
+            for field, names in related:
+                row[field] = names.get(row['id'], [])
+            yield row
+
+
+def render_ndjson(rows):
+    """Render rows as newline delimited JSON"""
+    for row in rows:
+        yield json.dumps(row, separators=(',', ':')).encode() + b'\n'
+
+
+def render_json(rows):
+    """Render rows as one JSON array, streamed in batches"""
+    return iter_json_array(rows)
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    """Render rows as CSV with `;` separated tag and attribute names"""
+    writer = csv.writer(_Echo())
+    header = EXPORT_FIELDS + tuple(field for field, *_ in RELATED_FIELDS)
+    yield writer.writerow(header).encode()
+    for row in rows:
+        yield writer.writerow([
+            ';'.join(row[field]) if isinstance(row[field], list)
+            else row[field]
+            for field in header
+        ]).encode()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', render_ndjson),
+    'csv': ('text/csv', render_csv),
+    'json': ('application/json', render_json),
+}
@@ -0,0 +1,151 @@
+"""Background processing of uploaded product images
+
+Uploads are stored as sent and handed to a thread pool once the request's
+transaction commits. The worker decodes the original once and writes a
+resized copy per variant in the original's format family plus WebP and
+AVIF when Pillow supports them, without the original's metadata.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import Product
+from core.storage import is_content_addressed
+from product.cache import bump_generation
+
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> bounding box the image is shrunk to fit in
+VARIANTS = (
+    ('thumb', (200, 200)),
+    ('medium', (800, 800)),
+)
+OPTIONAL_FORMATS = ('WEBP', 'AVIF')
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='product-image'
+)
+
+
+def variant_name(image_name, variant, extension):
+    """Return the storage name of an image variant"""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', stem, f'{variant}.{extension}')
+
+
+def output_formats(image):
+    """Return the formats to encode the variants of an image in"""
+    Image.init()
+    base = 'PNG' if image.mode in ('RGBA', 'LA', 'P') else 'JPEG'
+    return [base] + [fmt for fmt in OPTIONAL_FORMATS if fmt in Image.SAVE]
+
+
+def _encode(image, fmt):
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    # Saving without `exif`/`icc_profile` drops the original metadata
+    image.save(buffer, format=fmt, quality=settings.IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def build_variants(image_name):
+    """Write the variants of a stored image and return their names
+
+    The variants of a content-addressed image are shared by every product
+    holding it, so existing ones are reused rather than rewritten under
+    their readers; they keep the quality they were first encoded with.
+    """
+    with default_storage.open(image_name) as image_file:
+        original = Image.open(image_file)
+        original.load()
+    # Apply the EXIF orientation now that the tag itself is discarded
+    original = ImageOps.exif_transpose(original)
+    formats = output_formats(original)
+
+    variants = {}
+    for variant, size in VARIANTS:
+        resized = original.copy()
+        resized.thumbnail(size)
+        names = variants[variant] = {}
+        for fmt in formats:
+            extension = fmt.lower().replace('jpeg', 'jpg')
+            name = variant_name(image_name, variant, extension)
+            if default_storage.exists(name):
+                if is_content_addressed(name):
+                    names[extension] = name
+                    continue
+                default_storage.delete(name)
+            names[extension] = default_storage.save(
+                name, ContentFile(_encode(resized, fmt))
+            )
+
+    return variants
+
+
+def process_product_image(product_id, user_id, image_name):
+    """Build the variants of a product image and record them
+
+    The product is only updated if it still holds the same image, so a
+    slow job cannot overwrite the variants of a newer upload.
+    """
+    variants = build_variants(image_name)
+    updated = Product.objects.filter(
+        id=product_id, user_id=user_id, image=image_name
+    ).update(
+        image_variants=json.dumps(variants), updated_at=timezone.now()
+    )
+
+    if updated:
+        bump_generation(user_id)
+
+
+def _run(product_id, user_id, image_name):
+    try:
+        process_product_image(product_id, user_id, image_name)
+    except Exception:
+        logger.exception('Processing image %s failed', image_name)
+    finally:
+        # Worker threads get their own connections; don't leak them
+        connections.close_all()
+
+
+def enqueue_product_image(product):
+    """Schedule variant generation for a product's current image"""
+    product_id, user_id = product.id, product.user_id
+    image_name = product.image.name
+    if not settings.IMAGE_PROCESSING_ASYNC:
+        process_product_image(product_id, user_id, image_name)
+        return
+
+    transaction.on_commit(
+        lambda: _executor.submit(_run, product_id, user_id, image_name)
+    )
+
+
+def delete_variants(product):
+    """Delete the variant files of a product image no other product holds
+
+    Identical uploads share one image and its variants, so the files are
+    kept as long as another product still has the same image.
+    """
+    image = product.image.name
+    if not image or Product.objects.filter(image=image).exclude(
+            id=product.id).exists():
+        return
+    variants = json.loads(product.image_variants or '{}')
+    for names in variants.values():
+        for name in names.values():
+            default_storage.delete(name)
@@ -0,0 +1,133 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque cursor pagination over an indexed ordering
+
+    Every page is fetched with a `WHERE <key> < <cursor>` filter instead of
+    an OFFSET, so page N costs the same as page 1. The page body stays a
+    plain list and the neighbouring pages are advertised in a `Link` header.
+    """
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        links = []
+        for rel, url in (('next', self.get_next_link()),
+                         ('prev', self.get_previous_link())):
+            if url:
+                links.append(f'<{url}>; rel="{rel}"')
+
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+
+class ProductPagination(KeysetPagination):
+    """Paginate products newest first on the primary key"""
+    ordering = ('-id',)
+
+
+class CompositeKeysetPagination(KeysetPagination):
+    """Keyset pagination on every field of a unique ordering
+
+    DRF's cursor filters on the first field of the ordering only and skips
+    the rows tied with it by OFFSET. Here the cursor holds the whole key,
+    so a page is one index range scan however many rows share a value.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (
+            (self.cursor.reverse, self.cursor.position)
+            if self.cursor else (False, None)
+        )
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.after(ordering, self.load_position(
+                    position, queryset.model
+                ))
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.next_position, self.previous_position = position, following
+        else:
+            self.next_position, self.previous_position = following, position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def after(self, ordering, values):
+        """Filter the rows following a key in the given ordering"""
+        condition, equal = Q(), {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def load_position(self, position, model):
+        """Return the key of a cursor as values of the ordering's fields"""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            values = [None]
+        # The keys are never null, and a null can't be compared against
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            instance[field.lstrip('-')] if isinstance(instance, dict)
+            else getattr(instance, field.lstrip('-'))
+            for field in ordering
+        ])
+
+
+class AttributePagination(CompositeKeysetPagination):
+    """Paginate tags and attributes by name, tie-broken on the primary key"""
+    ordering = ('-name', 'id')
@@ -0,0 +1,124 @@
+"""Full-text product search
+
+On PostgreSQL every product keeps a weighted tsvector of its title (A),
+tag names (B) and attribute names (C) in `Product.search_vector`, served
+by a GIN index. The vector is refreshed from signals whenever one of
+those changes. Other databases fall back to a deterministic substring
+match so the API behaves the same in development and tests.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+
+from core.models import Product
+
+
+REFRESH_SQL = '''
+    UPDATE core_product SET search_vector =
+        setweight(to_tsvector(%(config)s, core_product.title), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(t.name, ' ') FROM core_tag t
+            JOIN core_product_tags pt ON pt.tag_id = t.id
+            WHERE pt.product_id = core_product.id
+        ), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(a.name, ' ') FROM core_attribute a
+            JOIN core_product_attributes pa ON pa.attribute_id = a.id
+            WHERE pa.product_id = core_product.id
+        ), '')), 'C')
+'''
+
+
+def is_supported():
+    """Return whether the database maintains search vectors"""
+    return connection.vendor == 'postgresql'
+
+
+def refresh_search_vectors(product_ids=None, tag_id=None, attribute_id=None,
+                           user_id=None):
+    """Recompute the search vectors of the given products
+
+    Products can be picked by ID, or as every product linked to a tag or
+    attribute that was renamed. With no arguments all products are
+    refreshed. Passing the owner's `user_id` keeps the update to their
+    partition of a partitioned product table.
+    """
+    if not is_supported():
+        return
+
+    params = {'config': settings.SEARCH_CONFIG}
+    conditions = []
+    if product_ids is not None:
+        conditions.append('core_product.id = ANY(%(ids)s)')
+        params['ids'] = list(product_ids)
+    elif tag_id is not None:
+        conditions.append(
+            'core_product.id IN (SELECT product_id FROM '
+            'core_product_tags WHERE tag_id = %(id)s)'
+        )
+        params['id'] = tag_id
+    elif attribute_id is not None:
+        conditions.append(
+            'core_product.id IN (SELECT product_id FROM '
+            'core_product_attributes WHERE attribute_id = %(id)s)'
+        )
+        params['id'] = attribute_id
+    if user_id is not None:
+        conditions.append('core_product.user_id = %(user_id)s')
+        params['user_id'] = user_id
+    where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_SQL + where, params)
+
+
+def search_terms(text):
+    """Split search text into lower case word tokens"""
+    return re.findall(r'\w+', text.lower())
+
+
+def prefix_tsquery(terms):
+    """Build a raw tsquery matching all terms, the last one as a prefix"""
+    return ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+
+
+def search_products(queryset, text):
+    """Filter and order products by how well they match the search text
+
+    Every term must match and the last one may be a word prefix, so
+    results keep narrowing as the user types.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+
+    if not is_supported():
+        return _fallback_search(queryset, terms)
+
+    query = SearchQuery(
+        prefix_tsquery(terms),
+        search_type='raw',
+        config=settings.SEARCH_CONFIG
+    )
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
+
+
+def _fallback_search(queryset, terms):
+    """Match every term as a substring of the title, tags or attributes"""
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) |
+            Q(id__in=Product.tags.through.objects.filter(
+                tag__name__icontains=term
+            ).values('product_id')) |
+            Q(id__in=Product.attributes.through.objects.filter(
+                attribute__name__icontains=term
+            ).values('product_id'))
+        )
+
+    return queryset.order_by('-id')
@@ -1,6 +1,16 @@
+import json
+from decimal import Decimal, getcontext
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from core.models import Tag, Attribute, Product
+from product.usage import refresh_usage_counts
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -8,8 +18,8 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
-        read_only_Fields = ('id',)
+        fields = ('id', 'name', 'product_count')
+        read_only_fields = ('id', 'product_count')
 
 
 class AttributeSerializer(serializers.ModelSerializer):
@@ -17,8 +27,31 @@ class AttributeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Attribute
-        fields = ('id', 'name')
-        read_only_fields = ('id',)
+        fields = ('id', 'name', 'product_count')
+        read_only_fields = ('id', 'product_count')
+
+
+class ImageVariantsField(serializers.Field):
+    """Render the stored image variant names as URLs"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return {}
+
+        request = self.context.get('request')
+        variants = json.loads(value)
+        for names in variants.values():
+            for extension, name in names.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                names[extension] = url
+
+        return variants
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -31,14 +64,15 @@ class ProductSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all()
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
         fields = (
             'id', 'title', 'attributes', 'tags', 'time_minutes',
-            'price', 'link',
+            'price', 'link', 'image', 'image_variants',
         )
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'image')
 
 
 class ProductDetailSerializer(ProductSerializer):
@@ -46,10 +80,374 @@ class ProductDetailSerializer(ProductSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class ProductValuesListSerializer(serializers.ListSerializer):
+    """Render many `.values()` product rows at once
+
+    The related IDs (or nested objects) of the whole page are read with one
+    query per relation instead of a prefetch into model instances.
+    """
+
+    def to_representation(self, data):
+        rows = list(data)
+        related = self.child.related_values([row['id'] for row in rows])
+        render = self.child.compile()
+        return [render(row, related) for row in rows]
+
+
+class ProductValuesSerializer(serializers.BaseSerializer):
+    """Read-only fast path rendering exactly what `reference` renders
+
+    It takes rows of `queryset.values(*serializer.value_fields())` instead
+    of model instances and builds plain dicts through accessors compiled
+    once per response from the reference serializer's fields.
+    """
+    reference = ProductSerializer
+    related_fields = (('tags', 'tag'), ('attributes', 'attribute'))
+    nested = False
+
+    class Meta:
+        list_serializer_class = ProductValuesListSerializer
+
+    @classmethod
+    def value_fields(cls):
+        """Return the columns to select for the rows"""
+        return tuple(
+            name for name in cls.reference.Meta.fields
+            if name not in dict(cls.related_fields)
+        )
+
+    def to_representation(self, instance):
+        related = self.related_values([instance['id']])
+        return self.compile()(instance, related)
+
+    def related_values(self, product_ids):
+        """Map each relation to product ID -> rendered related values"""
+        related = {}
+        for field, target in self.related_fields:
+            through = getattr(Product, field).through
+            key = target + '_id'
+            names = self._nested_names(field) if self.nested else ('id',)
+            columns = ('product_id', key) + tuple(
+                f'{target}__{name}' for name in names[1:]
+            )
+            rows = through.objects.filter(
+                product_id__in=product_ids
+            ).order_by(key).values_list(*columns)
+
+            values = related[field] = {}
+            for row in rows:
+                value = dict(zip(names, row[1:])) if self.nested else row[1]
+                values.setdefault(row[0], []).append(value)
+
+        return related
+
+    def _nested_names(self, field):
+        """Return the field names the nested serializer renders, id first"""
+        nested = self.reference._declared_fields[field].child
+        names = tuple(nested.Meta.fields)
+        assert names[0] == 'id', 'Nested serializers must render id first'
+        return names
+
+    def compile(self):
+        """Return a function rendering one row like the reference would"""
+        fields = self.reference(context=self.context).fields
+        accessors = []
+        for name, field in fields.items():
+            if name in dict(self.related_fields):
+                accessors.append((name, None))
+            else:
+                accessors.append((name, self._accessor(field)))
+
+        def render(row, related):
+            data = {}
+            for name, accessor in accessors:
+                if accessor is None:
+                    data[name] = related[name].get(row['id'], [])
+                else:
+                    value = row[name]
+                    data[name] = None if value is None else accessor(value)
+            return data
+
+        return render
+
+    def _accessor(self, field):
+        """Return a converter from a column value to the field's output"""
+        if isinstance(field, (serializers.IntegerField,
+                              serializers.CharField)):
+            # Database values of these columns are already int / str
+            return lambda value: value
+        if isinstance(field, serializers.DecimalField):
+            return self._decimal_accessor(field)
+        if isinstance(field, serializers.FileField):
+            return self._file_accessor(field)
+        return field.to_representation
+
+    def _decimal_accessor(self, field):
+        to_representation = field.to_representation
+        if not getattr(field, 'coerce_to_string',
+                       api_settings.COERCE_DECIMAL_TO_STRING) or \
+                field.localize or field.decimal_places is None:
+            return to_representation
+
+        exponent = Decimal('.1') ** field.decimal_places
+        context = getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def accessor(value):
+            if not isinstance(value, Decimal):
+                return to_representation(value)
+            return '{:f}'.format(value.quantize(
+                exponent, rounding=field.rounding, context=context
+            ))
+
+        return accessor
+
+    def _file_accessor(self, field):
+        # The column holds the file name, which is what the field renders
+        # unless it renders URLs
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lambda name: name or None
+        storage = Product._meta.get_field(field.source).storage
+        request = self.context.get('request')
+
+        def accessor(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+
+        return accessor
+
+
+class ProductDetailValuesSerializer(ProductValuesSerializer):
+    """Fast path of the product detail serializer"""
+    reference = ProductDetailSerializer
+    nested = True
+
+
+class ProductBulkListSerializer(serializers.ListSerializer):
+    """Validate and write a batch of products
+
+    Items that fail validation are set aside in `item_errors`, keyed by
+    their index in the payload, so one bad item does not reject the whole
+    batch. `validated_data` holds (index, data) pairs for the rest. Pass the
+    user's product queryset as `instance` to update instead of create.
+    """
+    default_error_messages = {
+        'too_many': _('Ensure this list has at most {max_items} items.'),
+        'not_found': _('Not found.'),
+        'duplicate': _('Already listed at index {index}.'),
+        'does_not_exist': _('Invalid pk "{pk_value}" - object does not '
+                            'exist.'),
+    }
+    related_fields = (
+        ('tags', Tag, Product.tags.through, 'tag_id'),
+        ('attributes', Attribute, Product.attributes.through, 'attribute_id'),
+    )
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(
+                input_type=type(data).__name__
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='not_a_list')
+
+        if len(data) > settings.BULK_MAX_ITEMS:
+            message = self.error_messages['too_many'].format(
+                max_items=settings.BULK_MAX_ITEMS
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [message]
+            }, code='too_many')
+
+        self.item_errors = {}
+        valid = []
+        for index, item in enumerate(data):
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+
+        if self.instance is not None:
+            valid = self._resolve_products(valid)
+
+        return self._check_related(valid)
+
+    def _reject(self, index, field, message):
+        self.item_errors.setdefault(index, {}).setdefault(field, []).append(
+            message
+        )
+
+    def _resolve_products(self, valid):
+        """Look up the products to update in a single query"""
+        self.products = self.instance.in_bulk(
+            [attrs['id'] for index, attrs in valid if 'id' in attrs]
+        )
+        resolved, listed = [], {}
+        for index, attrs in valid:
+            if 'id' not in attrs:
+                self._reject(
+                    index, 'id',
+                    self.child.fields['id'].error_messages['required']
+                )
+            elif attrs['id'] not in self.products:
+                self._reject(index, 'id', self.error_messages['not_found'])
+            elif attrs['id'] in listed:
+                # Two writes to one product would link its tags twice
+                message = self.error_messages['duplicate'].format(
+                    index=listed[attrs['id']]
+                )
+                self._reject(index, 'id', message)
+            else:
+                listed[attrs['id']] = index
+                resolved.append((index, attrs))
+
+        return resolved
+
+    def _check_related(self, valid):
+        """Check every referenced tag and attribute with one query each"""
+        user = self.context['request'].user
+        for field, model, *rest in self.related_fields:
+            requested = {
+                pk for index, attrs in valid for pk in attrs.get(field, ())
+            }
+            existing = set(model.objects.filter(
+                user=user, id__in=requested
+            ).values_list('id', flat=True))
+            for index, attrs in valid:
+                for pk in attrs.get(field, ()):
+                    if pk not in existing:
+                        self._reject(
+                            index, field,
+                            self.error_messages['does_not_exist'].format(
+                                pk_value=pk
+                            )
+                        )
+
+        return [pair for pair in valid if pair[0] not in self.item_errors]
+
+    def save(self, **kwargs):
+        validated_data = [
+            (index, dict(attrs, **kwargs))
+            for index, attrs in self.validated_data
+        ]
+        if self.instance is not None:
+            return self.update(self.instance, validated_data)
+
+        return self.create(validated_data)
+
+    def create(self, validated_data):
+        """Insert the products, then their tags and attributes"""
+        products = [
+            Product(**self._model_fields(attrs))
+            for index, attrs in validated_data
+        ]
+        if connection.features.can_return_ids_from_bulk_insert:
+            Product.objects.bulk_create(
+                products, batch_size=settings.BULK_BATCH_SIZE
+            )
+        else:
+            # The primary keys are needed for the join table rows
+            for product in products:
+                product.save()
+
+        saved = [
+            (index, product, attrs)
+            for (index, attrs), product in zip(validated_data, products)
+        ]
+        self._write_related(saved, replace=False)
+
+        return [(index, product) for index, product, attrs in saved]
+
+    def update(self, instance, validated_data):
+        """Update the products, then replace any tags and attributes sent"""
+        saved = []
+        # bulk_update skips auto_now, and tag changes alone count too
+        fields = {'updated_at'}
+        now = timezone.now()
+        for index, attrs in validated_data:
+            product = self.products[attrs['id']]
+            product.updated_at = now
+            for name, value in self._model_fields(attrs).items():
+                setattr(product, name, value)
+                fields.add(name)
+            saved.append((index, product, attrs))
+
+        Product.objects.bulk_update(
+            [product for index, product, attrs in saved], fields,
+            batch_size=settings.BULK_BATCH_SIZE
+        )
+        self._write_related(saved, replace=True)
+
+        return [(index, product) for index, product, attrs in saved]
+
+    def _model_fields(self, attrs):
+        excluded = {'id'} | {field for field, *rest in self.related_fields}
+        return {
+            name: value for name, value in attrs.items()
+            if name not in excluded
+        }
+
+    def _write_related(self, saved, replace):
+        """Bulk insert the join table rows for the saved products
+
+        The product counts of every tag and attribute linked before or
+        after the write are recounted afterwards.
+        """
+        for field, model, through, column in self.related_fields:
+            touched = []
+            rows = []
+            linked = set()
+            for index, product, attrs in saved:
+                if field not in attrs:
+                    continue
+                touched.append(product.id)
+                linked.update(attrs[field])
+                rows.extend(
+                    through(product_id=product.id, **{column: pk})
+                    for pk in set(attrs[field])
+                )
+
+            if replace and touched:
+                replaced = through.objects.filter(product_id__in=touched)
+                linked.update(replaced.values_list(column, flat=True))
+                replaced.delete()
+            through.objects.bulk_create(
+                rows, batch_size=settings.BULK_BATCH_SIZE
+            )
+            refresh_usage_counts(model, linked)
+
+
+class ProductBulkSerializer(ProductSerializer):
+    """Serialize a product in a bulk write
+
+    Tags and attributes are plain ID lists here; the list serializer checks
+    them for the whole batch at once rather than one query per ID.
+    """
+    id = serializers.IntegerField(required=False)
+    attributes = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta(ProductSerializer.Meta):
+        list_serializer_class = ProductBulkListSerializer
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to product"""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_variants')
         read_only_fields = ('id',)
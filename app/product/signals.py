@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Attribute, Product, Tag
+from product.cache import bump_generation, reset_generation
+from product.search import refresh_search_vectors
+from product.sync import record_deletion
+from product.usage import in_batch, linked_ids, model_for_through, \
+    refresh_linked, refresh_usage_counts
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_user_cache(sender, instance, created, **kwargs):
+    """Give new users an empty response cache namespace"""
+    if created:
+        reset_generation(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search(sender, instance, **kwargs):
+    """Re-index a product when it is saved"""
+    refresh_search_vectors([instance.pk], user_id=instance.user_id)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+@receiver(m2m_changed, sender=Product.attributes.through)
+def refresh_linked_search(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Re-index products whose tags or attributes changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_search_vectors([instance.pk], user_id=instance.user_id)
+    elif action == 'pre_clear':
+        # Remember the products before their join table rows are gone
+        column = f'{instance._meta.model_name}_id'
+        instance._search_cleared = list(
+            sender.objects.filter(**{column: instance.pk}).values_list(
+                'product_id', flat=True
+            )
+        )
+    elif action == 'post_clear':
+        refresh_search_vectors(
+            instance.__dict__.pop('_search_cleared', []),
+            user_id=instance.user_id
+        )
+    elif action in ('post_add', 'post_remove'):
+        refresh_search_vectors(pk_set, user_id=instance.user_id)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+@receiver(m2m_changed, sender=Product.attributes.through)
+def refresh_usage(sender, instance, action, reverse, pk_set, **kwargs):
+    """Recount the tags or attributes whose products changed"""
+    model = model_for_through(sender)
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_usage_counts(model, [instance.pk])
+    elif action == 'pre_clear':
+        column = f'{model._meta.model_name}_id'
+        instance._usage_cleared = list(
+            sender.objects.filter(product_id=instance.pk).values_list(
+                column, flat=True
+            )
+        )
+    elif action == 'post_clear':
+        refresh_usage_counts(
+            model, instance.__dict__.pop('_usage_cleared', [])
+        )
+    elif action in ('post_add', 'post_remove'):
+        refresh_usage_counts(model, pk_set)
+
+
+@receiver(pre_delete, sender=Product)
+def remember_usage(sender, instance, **kwargs):
+    """Remember the tags and attributes of a product being deleted"""
+    if not in_batch():
+        instance._usage_deleted = linked_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def refresh_deleted_usage(sender, instance, **kwargs):
+    """Recount the tags and attributes a deleted product was linked to"""
+    refresh_linked(instance.__dict__.pop('_usage_deleted', {}))
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tag_search(sender, instance, created, **kwargs):
+    """Re-index the products of a renamed tag"""
+    if not created:
+        refresh_search_vectors(tag_id=instance.pk, user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Attribute)
+def refresh_attribute_search(sender, instance, created, **kwargs):
+    """Re-index the products of a renamed attribute"""
+    if not created:
+        refresh_search_vectors(
+            attribute_id=instance.pk, user_id=instance.user_id
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Attribute)
+def invalidate_product_responses(sender, instance, **kwargs):
+    """Drop the owner's cached products, whose details nest the names"""
+    bump_generation(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+@receiver(m2m_changed, sender=Product.attributes.through)
+def invalidate_linked_responses(sender, instance, action, **kwargs):
+    """Drop the owner's cached products when their links change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation(instance.user_id)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Attribute)
+def touch_linked_products(sender, instance, **kwargs):
+    """Mark the products losing a tag or attribute as changed"""
+    field = 'tags' if sender is Tag else 'attributes'
+    Product.objects.filter(
+        user_id=instance.user_id, **{field: instance}
+    ).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Attribute)
+def write_tombstone(sender, instance, **kwargs):
+    """Record a deletion for clients syncing changes"""
+    record_deletion(instance)
@@ -0,0 +1,136 @@
+"""Delta sync of a user's products, tags and attributes
+
+`GET .../changes/?since=<cursor>` returns the rows changed and the IDs
+deleted since the cursor, oldest first, with the cursor to pass next
+time. Changes are paged on the indexed (updated_at, id) of the rows and
+deletions on the (deleted_at, id) of their tombstones, so an idle catalog
+costs two index probes that find nothing.
+
+Timestamps are taken when a write happens but become visible when its
+transaction commits, so a slow writer can commit a row older than the
+cursor. The cursor never moves past SYNC_SETTLE_TIME ago: rows that
+recent are sent again on the next sync, and clients apply changes as
+upserts. Tombstones are kept for SYNC_TOMBSTONE_TTL seconds; a cursor
+older than that gets a 410 and the client downloads everything again.
+"""
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core.models import Tombstone
+
+
+class CursorExpired(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _('The sync cursor has expired, sync everything again.')
+    default_code = 'cursor_expired'
+
+
+def record_deletion(instance):
+    """Write the tombstone of a deleted product, tag or attribute"""
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        model=instance._meta.model_name,
+        object_id=instance.pk
+    )
+
+
+def encode_cursor(changed, deleted):
+    """Encode the (timestamp, id) positions of both streams"""
+    data = json.dumps([
+        [position[0].isoformat(), position[1]]
+        for position in (changed, deleted)
+    ])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(value):
+    """Return the positions encoded by `encode_cursor`"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(value.encode()))
+        changed, deleted = (
+            (parse_datetime(timestamp), int(pk)) for timestamp, pk in data
+        )
+    except (TypeError, ValueError):
+        changed = deleted = (None, None)
+    if not all(timestamp and timezone.is_aware(timestamp)
+               for timestamp in (changed[0], deleted[0])):
+        raise exceptions.ValidationError({'since': [_('Invalid cursor.')]})
+    return changed, deleted
+
+
+def after(position, timestamp_field):
+    """Filter the rows after a (timestamp, id) position"""
+    timestamp, pk = position
+    return Q(**{f'{timestamp_field}__gt': timestamp}) | Q(
+        **{timestamp_field: timestamp, 'id__gt': pk}
+    )
+
+
+def read_page(queryset, position, timestamp_field, limit, settled):
+    """Return the rows after a position, the next one and if more follow"""
+    if position is not None:
+        queryset = queryset.filter(after(position, timestamp_field))
+    rows = list(queryset.order_by(timestamp_field, 'id')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if rows:
+        last = rows[-1]
+        position = (getattr(last, timestamp_field), last.id)
+    if not more:
+        # Everything up to now was read: move an idle cursor on so it
+        # never expires, but hold it back for writes still committing
+        position = settled
+    return rows, position, more
+
+
+class SyncMixin:
+    """Add a `changes` delta sync action to a user-owned model viewset"""
+
+    @action(methods=['GET'], detail=False)
+    def changes(self, request):
+        """Return what changed since the `since` cursor, everything first"""
+        now = timezone.now()
+        settled = (now - datetime.timedelta(
+            seconds=settings.SYNC_SETTLE_TIME
+        ), 0)
+        since = request.query_params.get('since')
+        if since:
+            changed, deleted = decode_cursor(since)
+            expired = now - datetime.timedelta(
+                seconds=settings.SYNC_TOMBSTONE_TTL
+            )
+            if deleted[0] < expired:
+                raise CursorExpired()
+        else:
+            # A full download needs no deletions before it starts
+            changed, deleted = None, settled
+
+        limit = self.paginator.get_page_size(request)
+        rows, changed, more_changed = read_page(
+            self.get_queryset(), changed, 'updated_at', limit, settled
+        )
+        tombstones, deleted, more_deleted = read_page(
+            Tombstone.objects.filter(
+                user=request.user, model=self.queryset.model._meta.model_name
+            ).only('object_id', 'deleted_at'),
+            deleted, 'deleted_at', limit, settled
+        )
+
+        serializer = self.get_serializer(rows, many=True)
+        return Response({
+            'changed': serializer.data,
+            'deleted': [tombstone.object_id for tombstone in tombstones],
+            'since': encode_cursor(changed, deleted),
+            'more': more_changed or more_deleted,
+        })
@@ -0,0 +1,200 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product
+from core.tests.utils import sample_attribute, sample_product, sample_tag
+
+
+BULK_URL = reverse('product:product-bulk')
+
+
+class PublicBulkApiTests(TestCase):
+    """Test unauthenticated bulk API access"""
+
+    def test_required_auth(self):
+        """Test that authentication is required"""
+        res = APIClient().post(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTests(TestCase):
+    """Test the bulk product API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.attribute = sample_attribute(user=self.user)
+
+    def test_bulk_create(self):
+        """Test creating products with tags and attributes in one batch"""
+        payload = [
+            {
+                'title': f'Product {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [self.tag.id],
+                'attributes': [self.attribute.id],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['errors'], [])
+        self.assertEqual([r['index'] for r in res.data['results']], [0, 1, 2])
+        products = Product.objects.filter(user=self.user)
+        self.assertEqual(products.count(), 3)
+        for product in products:
+            self.assertEqual(list(product.tags.all()), [self.tag])
+            self.assertEqual(list(product.attributes.all()), [self.attribute])
+
+    def test_bulk_create_ndjson(self):
+        """Test that the batch can be sent as newline delimited JSON"""
+        lines = [
+            {'title': 'Desk', 'time_minutes': 5, 'price': '9.99'},
+            {'title': 'Chair', 'time_minutes': 5, 'price': '4.99'},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n'
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(Product.objects.values_list('title', flat=True)),
+            {'Desk', 'Chair'}
+        )
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test that invalid items are reported and the rest are saved"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Testpass123'
+        )
+        other_tag = sample_tag(user=other_user)
+        payload = [
+            {'title': 'Desk', 'time_minutes': 5, 'price': '9.99'},
+            {'title': 'Chair', 'time_minutes': 5},
+            {'title': 'Lamp', 'time_minutes': 5, 'price': '1.00',
+             'tags': [other_tag.id]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['index'] for r in res.data['results']], [0])
+        errors = {e['index']: e['errors'] for e in res.data['errors']}
+        self.assertIn('price', errors[1])
+        self.assertIn('tags', errors[2])
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_bulk_create_atomic(self):
+        """Test that an atomic batch with an invalid item writes nothing"""
+        payload = [
+            {'title': 'Desk', 'time_minutes': 5, 'price': '9.99'},
+            {'title': 'Chair', 'time_minutes': 5},
+        ]
+
+        res = self.client.post(
+            BULK_URL + '?atomic=true', payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Product.objects.count(), 0)
+
+    def test_bulk_update(self):
+        """Test updating fields and replacing tags for several products"""
+        product1 = sample_product(user=self.user, title='Desk')
+        product2 = sample_product(user=self.user, title='Chair')
+        product1.tags.add(sample_tag(user=self.user, name='Old'))
+        payload = [
+            {'id': product1.id, 'title': 'Standing desk',
+             'tags': [self.tag.id]},
+            {'id': product2.id, 'price': '7.50'},
+            {'id': 0, 'title': 'Missing'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['errors'][0]['index'], 2)
+        product1.refresh_from_db()
+        product2.refresh_from_db()
+        self.assertEqual(product1.title, 'Standing desk')
+        self.assertEqual(list(product1.tags.all()), [self.tag])
+        self.assertEqual(str(product2.price), '7.50')
+
+    def test_bulk_update_other_user_product(self):
+        """Test that products of other users cannot be updated"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Testpass123'
+        )
+        product = sample_product(user=other_user, title='Desk')
+
+        res = self.client.patch(
+            BULK_URL, [{'id': product.id, 'title': 'Mine'}], format='json'
+        )
+
+        self.assertEqual(res.data['results'], [])
+        product.refresh_from_db()
+        self.assertEqual(product.title, 'Desk')
+
+    def test_bulk_delete(self):
+        """Test deleting products by ID"""
+        product1 = sample_product(user=self.user)
+        product2 = sample_product(user=self.user)
+
+        res = self.client.delete(
+            BULK_URL, [product1.id, 0], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'], [{'index': 0, 'id': product1.id}]
+        )
+        self.assertEqual(res.data['errors'][0]['index'], 1)
+        self.assertEqual(list(Product.objects.all()), [product2])
+
+    def test_bulk_repeated_ids(self):
+        """Test a product listed twice is written and reported once"""
+        product = sample_product(user=self.user, title='Desk')
+
+        res = self.client.patch(BULK_URL, [
+            {'id': product.id, 'tags': [self.tag.id]},
+            {'id': product.id, 'tags': [self.tag.id], 'title': 'Chair'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'index': 0, 'id': product.id}])
+        self.assertEqual(res.data['errors'][0]['index'], 1)
+        product.refresh_from_db()
+        self.assertEqual(product.title, 'Desk')
+        self.assertEqual(list(product.tags.all()), [self.tag])
+
+        res = self.client.delete(
+            BULK_URL, [product.id, product.id], format='json'
+        )
+
+        self.assertEqual(res.data['results'], [{'index': 0, 'id': product.id}])
+        self.assertEqual(res.data['errors'][0]['index'], 1)
+        self.assertFalse(Product.objects.exists())
+
+    def test_bulk_rejects_non_list(self):
+        """Test that the payload must be a list"""
+        res = self.client.post(BULK_URL, {'title': 'Desk'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
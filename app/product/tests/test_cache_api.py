@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, Tag
+from core.tests.utils import detail_url, sample_product
+
+
+PRODUCT_URL = reverse('product:product-list')
+TAGS_URL = reverse('product:tag-list')
+
+
+@override_settings(PRODUCT_CACHE_TIMEOUT=300)
+class ProductCacheApiTests(TestCase):
+    """Test the product response cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test that repeated list requests skip the database"""
+        sample_product(user=self.user)
+        self.client.get(PRODUCT_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_query_params_normalized(self):
+        """Test that parameter order does not split the cache"""
+        self.client.get(PRODUCT_URL, {'limit': 5, 'match': 'all'})
+
+        with self.assertNumQueries(0):
+            self.client.get(PRODUCT_URL + '?match=all&limit=5')
+
+    def test_write_invalidates_cache(self):
+        """Test that writing through the API drops cached responses"""
+        self.client.get(PRODUCT_URL)
+
+        self.client.post(PRODUCT_URL, {
+            'title': 'Desk',
+            'time_minutes': 10,
+            'price': 20.00,
+        })
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual([p['title'] for p in res.data], ['Desk'])
+
+    def test_tag_change_invalidates_detail(self):
+        """Test that creating a tag drops cached product details"""
+        product = sample_product(user=self.user)
+        self.client.get(detail_url(product.id))
+        product.tags.add(Tag.objects.create(user=self.user, name='Old'))
+
+        self.client.post(TAGS_URL, {'name': 'New'})
+        res = self.client.get(detail_url(product.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Old')
+
+    def test_tag_rename_invalidates_detail(self):
+        """Test renaming or deleting a tag outside the API drops details"""
+        product = sample_product(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Old')
+        product.tags.add(tag)
+        self.client.get(detail_url(product.id))
+
+        tag.name = 'New'
+        tag.save()
+        res = self.client.get(detail_url(product.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'New')
+
+        tag.delete()
+        res = self.client.get(detail_url(product.id))
+
+        self.assertEqual(res.data['tags'], [])
+
+    def test_orm_writes_invalidate_cache(self):
+        """Test product writes outside the API, as the admin's, drop lists"""
+        product = sample_product(user=self.user, title='Desk')
+        self.client.get(PRODUCT_URL)
+
+        product.title = 'Chair'
+        product.save()
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual(res.data[0]['title'], 'Chair')
+
+        product.tags.add(Tag.objects.create(user=self.user, name='Wood'))
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual(res.data[0]['tags'], [Tag.objects.get().id])
+
+        product.delete()
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual(res.data, [])
+
+    @override_settings(PRODUCT_CACHE_TIMEOUT=0)
+    def test_cache_off(self):
+        """Test a zero timeout serves every request fresh without ETags"""
+        sample_product(user=self.user)
+        self.client.get(PRODUCT_URL)
+
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertFalse(res.has_header('ETag'))
+
+    def test_cache_separated_per_user(self):
+        """Test that users never see each other's cached responses"""
+        sample_product(user=self.user)
+        self.client.get(PRODUCT_URL)
+        user2 = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(user2)
+
+        res = self.client.get(PRODUCT_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_conditional_get(self):
+        """Test that a matching If-None-Match returns 304"""
+        product = sample_product(user=self.user)
+        res = self.client.get(detail_url(product.id))
+        etag = res['ETag']
+
+        res = self.client.get(
+            detail_url(product.id), HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+        self.client.patch(detail_url(product.id), {'title': 'Renamed'})
+        res = self.client.get(
+            detail_url(product.id), HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(Product.objects.get().title, 'Renamed')
@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests.utils import sample_attribute, sample_product, sample_tag
+
+
+EXPORT_URL = reverse('product:product-export')
+
+
+class PrivateExportApiTests(TestCase):
+    """Test the catalog export API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.product = sample_product(user=self.user, title='Desk')
+        self.product.tags.add(
+            sample_tag(user=self.user, name='Wood'),
+            sample_tag(user=self.user, name='Office'),
+        )
+        self.product.attributes.add(sample_attribute(user=self.user))
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Testpass123'
+        )
+        sample_product(user=other_user, title='Hidden')
+
+    def _content(self, res):
+        return b''.join(res.streaming_content)
+
+    def test_export_ndjson(self):
+        """Test exporting the user's products as NDJSON"""
+        sample_product(user=self.user, title='Chair')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._content(res).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Desk', 'Chair'])
+        self.assertEqual(rows[0]['tags'], ['Office', 'Wood'])
+        self.assertEqual(rows[0]['attributes'], ['Green'])
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(rows[1]['tags'], [])
+
+    def test_export_csv(self):
+        """Test exporting the user's products as CSV"""
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        rows = list(csv.DictReader(io.StringIO(self._content(res).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Desk')
+        self.assertEqual(rows[0]['tags'], 'Office;Wood')
+
+    def test_export_json(self):
+        """Test exporting the user's products as one JSON array"""
+        sample_product(user=self.user, title='Chair')
+
+        res = self.client.get(EXPORT_URL, {'output': 'json'})
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        rows = json.loads(self._content(res).decode())
+        self.assertEqual([row['title'] for row in rows], ['Desk', 'Chair'])
+        self.assertEqual(rows[0]['tags'], ['Office', 'Wood'])
+
+    def test_export_gzip(self):
+        """Test that the export is gzipped when the client accepts it"""
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        row = json.loads(gzip.decompress(self._content(res)))
+        self.assertEqual(row['id'], self.product.id)
+
+    def test_export_gzip_refused(self):
+        """Test a zero quality for gzip gets the plain export"""
+        for header in ('gzip;q=0', 'deflate, gzip; q=0.0', '*;q=0', 'br'):
+            res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING=header)
+
+            self.assertFalse(res.has_header('Content-Encoding'), header)
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='br, *;q=0.5')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_export_invalid_output(self):
+        """Test that unknown output formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
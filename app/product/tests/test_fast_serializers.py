@@ -0,0 +1,107 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.tests.utils import PRODUCT_URL, QueryCountMixin, detail_url, \
+    sample_attribute, sample_product, sample_tag
+from product.serializers import ProductSerializer, ProductValuesSerializer
+
+
+@override_settings(PRODUCT_CACHE_TIMEOUT=0)
+class FastSerializerTests(QueryCountMixin, TestCase):
+    """Test the `.values()` serializers render what the model ones do"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        first, second = sample_tag(self.user, 'Wood'), sample_tag(
+            self.user, 'Office'
+        )
+        self.product = sample_product(
+            user=self.user, title='Desk', price='12.5', link='http://x.io',
+            image='uploads/product/desk.jpg',
+            image_variants=json.dumps({
+                'thumb': {'jpg': 'uploads/product/variants/desk/thumb.jpg'},
+            }),
+        )
+        self.product.tags.add(second, first)
+        self.product.attributes.add(sample_attribute(self.user))
+        sample_product(user=self.user, title='Chair', price='0.1')
+        sample_product(user=self.user, title='Über lamp ☃', price=7)
+
+    def get_both(self, url, params=None):
+        """Return the response bodies with and without the fast path"""
+        bodies = []
+        for fast in (True, False):
+            with self.settings(API_FAST_SERIALIZERS=fast):
+                res = self.client.get(url, params)
+                self.assertEqual(res.status_code, 200)
+                bodies.append(res.content)
+        return bodies
+
+    def test_list_identical(self):
+        """Test the product list bytes match the model serializer's"""
+        fast, slow = self.get_both(PRODUCT_URL)
+
+        self.assertEqual(fast, slow)
+        data = json.loads(fast.decode())
+        self.assertEqual(
+            [row['price'] for row in data], ['7.00', '0.10', '12.50']
+        )
+        self.assertTrue(data[2]['image'].startswith('http://testserver/'))
+
+    def test_list_pages_identical(self):
+        """Test paginated list bytes and links match"""
+        with self.settings(API_FAST_SERIALIZERS=True):
+            fast = self.client.get(PRODUCT_URL, {'limit': 2})
+        with self.settings(API_FAST_SERIALIZERS=False):
+            slow = self.client.get(PRODUCT_URL, {'limit': 2})
+
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(fast['Link'], slow['Link'])
+
+    def test_detail_identical(self):
+        """Test product detail bytes match the model serializer's"""
+        fast, slow = self.get_both(detail_url(self.product.id))
+
+        self.assertEqual(fast, slow)
+        data = json.loads(fast.decode())
+        self.assertEqual(
+            [tag['name'] for tag in data['tags']], ['Wood', 'Office']
+        )
+
+    def test_filtered_list_identical(self):
+        """Test a filtered list matches"""
+        tag = self.product.tags.first()
+        fast, slow = self.get_both(PRODUCT_URL, {'tags': tag.id})
+
+        self.assertEqual(fast, slow)
+
+    def test_without_request(self):
+        """Test rendering without a request in the context"""
+        rows = self.user.product_set.order_by('id').values(
+            *ProductValuesSerializer.value_fields()
+        )
+        products = self.user.product_set.order_by('id')
+
+        self.assertEqual(
+            ProductValuesSerializer(rows, many=True).data,
+            [dict(row) for row in ProductSerializer(products, many=True).data]
+        )
+
+    def test_list_queries_constant(self):
+        """Test the fast list doesn't query per product"""
+        def grow():
+            for i in range(3):
+                product = sample_product(user=self.user)
+                product.tags.add(sample_tag(self.user, f'Tag {i}'))
+
+        self.assertConstantQueries(
+            lambda: self.client.get(PRODUCT_URL), grow
+        )
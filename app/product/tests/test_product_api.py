@@ -1,50 +1,22 @@
+import hashlib
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.test import APIClient
-
-from core.models import Product, Tag, Attribute
-
-from product.serializers import ProductSerializer
-import tempfile
-import os
 from PIL import Image
 
-
-PRODUCT_URL = reverse('product:product-list')
-
-
-def image_upload_url(product_id):
-    """Return URL for product image upload"""
-    return reverse('product:product-upload-image', args=[product_id])
-
-
-def sample_tag(user, name='Outdoors'):
-    """Create and return a sample tag"""
-    return Tag.objects.create(user=user, name=name)
-
-
-def sample_attribute(user, name='Green'):
-    """Create and return a sample attribute"""
-    return Attribute.objects.create(user=user, name=name)
-
-
-def detail_url(product_id):
-    """Return product detail URL"""
-    return reverse('product:product-list', args=[product_id])
-
-
-def sample_product(user, **params):
-    """Create and return a sample product"""
-    defaults = {
-        'title': 'Sample product',
-        'time_minutes': 10,
-        'price': 5.00,
-    }
-    defaults.update(params)
-
-    return Product.objects.create(user=user, **defaults)
+from core.models import Product
+from core.tests.utils import PRODUCT_URL, QueryCountMixin, detail_url, \
+    image_upload_url, next_page_url, sample_attribute, sample_product, \
+    sample_tag
+from product.images import build_variants, delete_variants
+from product.serializers import ProductSerializer
 
 
 class PublicProductApiTests(TestCase):
@@ -60,7 +32,7 @@ class PublicProductApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateProductApiTests(TestCase):
+class PrivateProductApiTests(QueryCountMixin, TestCase):
     """Test authenticated product API access"""
 
     def setUp(self):
@@ -100,6 +72,118 @@ class PrivateProductApiTests(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data, serializer.data)
 
+    def test_products_paginated_by_cursor(self):
+        """Test the product list is paged with a cursor in the Link header"""
+        products = [sample_product(user=self.user) for _ in range(5)]
+        expected = [product.id for product in reversed(products)]
+
+        res = self.client.get(PRODUCT_URL, {'limit': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in res.data], expected[:2])
+        self.assertIn('rel="next"', res['Link'])
+
+        seen = []
+        url = PRODUCT_URL + '?limit=2'
+        while url:
+            res = self.client.get(url)
+            seen.extend(p['id'] for p in res.data)
+            url = next_page_url(res)
+
+        self.assertEqual(seen, expected)
+
+    def test_products_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        res = self.client.get(PRODUCT_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_products_by_tags(self):
+        """Test returning products with any of the given tags"""
+        product1 = sample_product(user=self.user, title='Desk')
+        product2 = sample_product(user=self.user, title='Chair')
+        product3 = sample_product(user=self.user, title='Lamp')
+        tag1 = sample_tag(user=self.user, name='Office')
+        tag2 = sample_tag(user=self.user, name='Wood')
+        product1.tags.add(tag1, tag2)
+        product2.tags.add(tag2)
+
+        res = self.client.get(PRODUCT_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        ids = [p['id'] for p in res.data]
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ids, [product2.id, product1.id])
+        self.assertNotIn(product3.id, ids)
+
+    def test_filter_products_matching_all_tags(self):
+        """Test returning products carrying every one of the given tags"""
+        product1 = sample_product(user=self.user, title='Desk')
+        product2 = sample_product(user=self.user, title='Chair')
+        tag1 = sample_tag(user=self.user, name='Office')
+        tag2 = sample_tag(user=self.user, name='Wood')
+        product1.tags.add(tag1, tag2)
+        product2.tags.add(tag2)
+
+        res = self.client.get(
+            PRODUCT_URL,
+            {'tags': f'{tag1.id},{tag2.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual([p['id'] for p in res.data], [product1.id])
+
+    def test_filter_products_by_tags_and_attributes(self):
+        """Test that tag and attribute filters are combined"""
+        product1 = sample_product(user=self.user, title='Desk')
+        product2 = sample_product(user=self.user, title='Chair')
+        tag = sample_tag(user=self.user)
+        attribute = sample_attribute(user=self.user)
+        product1.tags.add(tag)
+        product1.attributes.add(attribute)
+        product2.tags.add(tag)
+
+        res = self.client.get(
+            PRODUCT_URL,
+            {'tags': tag.id, 'attributes': attribute.id}
+        )
+
+        self.assertEqual([p['id'] for p in res.data], [product1.id])
+
+    def test_filter_products_invalid_ids(self):
+        """Test that non numeric filter IDs are rejected"""
+        res = self.client.get(PRODUCT_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _add_tagged_products(self, count):
+        """Create products that each carry a tag and an attribute"""
+        for i in range(count):
+            product = sample_product(user=self.user, title=f'Product {i}')
+            product.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            product.attributes.add(
+                sample_attribute(user=self.user, name=f'Attribute {i}')
+            )
+
+    @override_settings(PRODUCT_CACHE_TIMEOUT=0)
+    def test_list_products_constant_queries(self):
+        """Test that listing products does not query per product"""
+        self._add_tagged_products(2)
+
+        self.assertConstantQueries(
+            lambda: self.client.get(PRODUCT_URL),
+            lambda: self._add_tagged_products(10),
+        )
+
+    def test_retrieve_product_prefetches_relations(self):
+        """Test the detail view nests tags and attributes in 3 queries"""
+        self._add_tagged_products(1)
+        product = Product.objects.get()
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(product.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Tag 0')
+        self.assertEqual(res.data['attributes'][0]['name'], 'Attribute 0')
+
     def test_view_recipe_detail(self):
         """Test viewing a product detail"""
         product = sample_product(user=self.user)
@@ -168,8 +252,19 @@ class ProductImageUploadTests(TestCase):
         self.product = sample_product(user=self.user)
 
     def tearDown(self):
+        self.product.refresh_from_db()
+        delete_variants(self.product)
         self.product.image.delete()
 
+    def _upload(self, size=(10, 10), **save_kwargs):
+        """Upload a generated JPEG to the product"""
+        url = image_upload_url(self.product.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', size)
+            img.save(ntf, format='JPEG', **save_kwargs)
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
     def test_upload_image_to_product(self):
         """Test uploading an image to product"""
         url = image_upload_url(self.product.id)
@@ -184,6 +279,118 @@ class ProductImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.product.image.path))
 
+    def test_upload_image_touches_product(self):
+        """Test an upload marks the product changed for syncing clients"""
+        before = self.product.updated_at
+
+        self._upload()
+
+        self.product.refresh_from_db()
+        self.assertGreater(self.product.updated_at, before)
+
+    def test_upload_image_content_addressed(self):
+        """Test identical uploads are named by content and stored once"""
+        self._upload()
+        other = sample_product(user=self.user)
+        with tempfile.NamedTemporaryFile(suffix='.JPG') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            digest = hashlib.sha256(ntf.read()).hexdigest()
+            ntf.seek(0)
+            self.client.post(
+                image_upload_url(other.id), {'image': ntf},
+                format='multipart'
+            )
+
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(
+            self.product.image.name, f'uploads/product/{digest}.jpg'
+        )
+        self.assertEqual(other.image.name, self.product.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.product.image.path)).count(
+                f'{digest}.jpg'
+            ), 1
+        )
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_upload_image_builds_variants(self):
+        """Test that resized variants are generated for an upload"""
+        exif = Image.Exif()
+        exif[0x010f] = 'Camera maker'
+        res = self._upload(size=(1600, 1200), exif=exif)
+
+        self.product.refresh_from_db()
+        variants = json.loads(self.product.image_variants)
+        self.assertEqual(set(variants), {'thumb', 'medium'})
+        self.assertIn('webp', variants['thumb'])
+        with default_storage.open(variants['thumb']['jpg']) as thumb_file:
+            thumb = Image.open(thumb_file)
+            self.assertEqual(thumb.size, (200, 150))
+            self.assertFalse(thumb.getexif())
+        with default_storage.open(variants['medium']['webp']) as medium_file:
+            self.assertEqual(Image.open(medium_file).size, (800, 600))
+
+        res = self.client.get(detail_url(self.product.id))
+        self.assertTrue(
+            res.data['image_variants']['thumb']['jpg'].startswith('http')
+        )
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_shared_variants_reused(self):
+        """Test an identical upload reuses the variants already written"""
+        self._upload()
+        self.product.refresh_from_db()
+        variants = json.loads(self.product.image_variants)
+        directory = os.path.dirname(
+            default_storage.path(variants['thumb']['jpg'])
+        )
+        files = sorted(os.listdir(directory))
+
+        with patch('product.images._encode') as encode:
+            self.assertEqual(
+                build_variants(self.product.image.name), variants
+            )
+
+        encode.assert_not_called()
+        self.assertEqual(sorted(os.listdir(directory)), files)
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    @patch('product.views.transaction.on_commit', lambda func: func())
+    def test_replaced_image_variants_deleted(self):
+        """Test replacing an image drops variants no product shares"""
+        other = sample_product(user=self.user)
+
+        def upload(product, color):
+            with tempfile.NamedTemporaryFile(suffix='.png') as ntf:
+                Image.new('RGB', (300, 300), color).save(ntf, format='PNG')
+                ntf.seek(0)
+                self.client.post(image_upload_url(product.id),
+                                 {'image': ntf}, format='multipart')
+            product.refresh_from_db()
+            return json.loads(product.image_variants)['thumb']['jpg']
+
+        old = upload(self.product, 'red')
+        upload(other, 'red')
+        upload(self.product, 'blue')
+
+        self.assertTrue(default_storage.exists(old))
+
+        upload(other, 'blue')
+
+        self.assertFalse(default_storage.exists(old))
+        other.delete()
+
+    @patch('product.images.transaction.on_commit')
+    def test_upload_image_processed_after_commit(self, on_commit):
+        """Test that variants are built in the background after commit"""
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_variants'], {})
+        on_commit.assert_called_once()
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
         url = image_upload_url(self.product.id)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.tests.utils import sample_attribute, sample_product, sample_tag
+from product.search import prefix_tsquery, search_terms
+
+
+SEARCH_URL = reverse('product:product-search')
+
+
+class SearchTermsTests(TestCase):
+    """Test building search queries"""
+
+    def test_search_terms(self):
+        """Test that punctuation cannot reach the raw tsquery"""
+        self.assertEqual(
+            search_terms("Desk & (chair)|:* o'clock"),
+            ['desk', 'chair', 'o', 'clock']
+        )
+
+    def test_prefix_tsquery(self):
+        """Test that only the last term is matched as a prefix"""
+        self.assertEqual(prefix_tsquery(['oak', 'des']), 'oak & des:*')
+
+
+class PrivateSearchApiTests(TestCase):
+    """Test the product search API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.desk = sample_product(user=self.user, title='Oak desk')
+        self.chair = sample_product(user=self.user, title='Office chair')
+        self.chair.tags.add(sample_tag(user=self.user, name='Ergonomic'))
+        self.chair.attributes.add(sample_attribute(user=self.user))
+
+    def _search(self, text, **params):
+        res = self.client.get(SEARCH_URL, dict(params, q=text))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [product['id'] for product in res.data]
+
+    def test_search_title(self):
+        """Test matching products by title and title prefix"""
+        self.assertEqual(self._search('desk'), [self.desk.id])
+        self.assertEqual(self._search('oak de'), [self.desk.id])
+
+    def test_search_tags_and_attributes(self):
+        """Test matching products by tag and attribute names"""
+        self.assertEqual(self._search('ergonomic'), [self.chair.id])
+        self.assertEqual(self._search('green'), [self.chair.id])
+
+    def test_search_requires_every_term(self):
+        """Test that all terms have to match"""
+        self.assertEqual(self._search('office green'), [self.chair.id])
+        self.assertEqual(self._search('oak green'), [])
+
+    def test_search_limited_to_user(self):
+        """Test that other users' products are not searched"""
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Testpass123'
+        )
+        sample_product(user=other_user, title='Oak desk')
+
+        self.assertEqual(self._search('desk'), [self.desk.id])
+
+    def test_search_empty(self):
+        """Test that empty search text matches nothing"""
+        self.assertEqual(self._search(' '), [])
+
+    def test_search_limit(self):
+        """Test that the number of results can be limited"""
+        sample_product(user=self.user, title='Pine desk')
+
+        self.assertEqual(len(self._search('desk', limit=1)), 1)
@@ -0,0 +1,192 @@
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Attribute, Product, Tag, Tombstone
+from product import sync
+
+
+PRODUCT_CHANGES_URL = reverse('product:product-changes')
+TAG_CHANGES_URL = reverse('product:tag-changes')
+BULK_URL = reverse('product:product-bulk')
+
+
+def sample_product(user, **params):
+    defaults = {'title': 'Sample product', 'time_minutes': 10, 'price': 5}
+    defaults.update(params)
+    return Product.objects.create(user=user, **defaults)
+
+
+@override_settings(SYNC_SETTLE_TIME=0)
+class SyncApiTests(TestCase):
+    """Test the delta sync endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None, url=PRODUCT_CHANGES_URL, **params):
+        if since is not None:
+            params['since'] = since
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_then_empty(self):
+        """Test the first sync returns everything and the next nothing"""
+        products = [sample_product(self.user) for _ in range(3)]
+        sample_product(
+            get_user_model().objects.create_user('other', 'testpass')
+        )
+
+        first = self.sync()
+        second = self.sync(first['since'])
+
+        self.assertEqual(
+            [row['id'] for row in first['changed']],
+            [product.id for product in products]
+        )
+        self.assertFalse(first['more'])
+        self.assertEqual(second['changed'], [])
+        self.assertEqual(second['deleted'], [])
+
+    def test_changed_and_deleted(self):
+        """Test updates and deletions since the cursor are returned"""
+        kept, changed, deleted = [sample_product(self.user) for _ in range(3)]
+        since = self.sync()['since']
+
+        self.client.patch(
+            reverse('product:product-detail', args=[changed.id]),
+            {'title': 'Renamed'}
+        )
+        self.client.delete(
+            reverse('product:product-detail', args=[deleted.id])
+        )
+        data = self.sync(since)
+
+        self.assertEqual([row['id'] for row in data['changed']], [changed.id])
+        self.assertEqual(data['changed'][0]['title'], 'Renamed')
+        self.assertEqual(data['deleted'], [deleted.id])
+
+    def test_bulk_writes_tracked(self):
+        """Test bulk updates and deletes show up as changes"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        updated, deleted = sample_product(self.user), sample_product(self.user)
+        since = self.sync()['since']
+
+        self.client.patch(BULK_URL, [{'id': updated.id, 'tags': [tag.id]}],
+                          format='json')
+        self.client.delete(BULK_URL, [deleted.id], format='json')
+        data = self.sync(since)
+
+        self.assertEqual([row['id'] for row in data['changed']], [updated.id])
+        self.assertEqual(data['deleted'], [deleted.id])
+        # The tag's product count changed too
+        tags = self.sync(since, url=TAG_CHANGES_URL)
+        self.assertEqual([row['id'] for row in tags['changed']], [tag.id])
+
+    def test_tag_deletion_touches_products(self):
+        """Test products change when one of their tags is deleted"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        product = sample_product(self.user)
+        product.tags.add(tag)
+        since = self.sync()['since']
+        tag_id = tag.id
+
+        tag.delete()
+
+        self.assertEqual(
+            [row['id'] for row in self.sync(since)['changed']], [product.id]
+        )
+        self.assertEqual(
+            self.sync(since, url=TAG_CHANGES_URL)['deleted'], [tag_id]
+        )
+
+    def test_pages(self):
+        """Test changes are paged by the cursor until no more follow"""
+        products = [sample_product(self.user) for _ in range(5)]
+
+        seen, since, more = [], None, True
+        while more:
+            data = self.sync(since, limit=2)
+            seen.extend(row['id'] for row in data['changed'])
+            since, more = data['since'], data['more']
+
+        self.assertEqual(seen, [product.id for product in products])
+
+    @override_settings(SYNC_SETTLE_TIME=60)
+    def test_recent_changes_sent_again(self):
+        """Test the cursor stays behind changes that may still commit"""
+        product = sample_product(self.user)
+
+        first = self.sync()
+        second = self.sync(first['since'])
+
+        self.assertEqual([row['id'] for row in second['changed']],
+                         [product.id])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        naive = sync.encode_cursor(
+            (datetime.datetime(2020, 1, 1), 0),
+            (datetime.datetime(2020, 1, 1), 0)
+        )
+        for since in ('nonsense', naive):
+            res = self.client.get(PRODUCT_CHANGES_URL, {'since': since})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_cursor(self):
+        """Test a cursor older than the tombstones kept must resync"""
+        old = timezone.now() - datetime.timedelta(days=365)
+        since = sync.encode_cursor((old, 0), (old, 0))
+
+        res = self.client.get(PRODUCT_CHANGES_URL, {'since': since})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    @override_settings(SYNC_TOMBSTONE_TTL=3600)
+    def test_idle_cursor_kept_fresh(self):
+        """Test syncing an idle catalog past the TTL never expires"""
+        sample_product(self.user)
+        since = self.sync()['since']
+        start = timezone.now()
+
+        for step in range(1, 5):
+            later = start + datetime.timedelta(minutes=50 * step)
+            with patch('product.sync.timezone.now', return_value=later):
+                data = self.sync(since)
+            since = data['since']
+            self.assertEqual(data['changed'], [])
+
+    def test_prune_tombstones(self):
+        """Test the command deletes tombstones past their TTL only"""
+        old, recent = [sample_product(self.user).id for _ in range(2)]
+        Product.objects.filter(id__in=[old, recent]).delete()
+        Tombstone.objects.filter(object_id=old).update(
+            deleted_at=timezone.now() - datetime.timedelta(days=365)
+        )
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [recent]
+        )
+
+    def test_user_deletion(self):
+        """Test deleting a user with products isn't blocked by tombstones"""
+        sample_product(self.user)
+        Attribute.objects.create(user=self.user, name='Spicy')
+
+        self.user.delete()
+
+        self.assertFalse(Product.objects.exists())
@@ -1,3 +1,7 @@
+import base64
+import json
+import re
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -6,6 +10,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag, Product
+from core.tests.utils import next_page_url
 
 from product.serializers import TagSerializer
 
@@ -64,6 +69,54 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['name'], tag.name)
 
+    def test_tags_paginated_by_name(self):
+        """Test that tags are paged by name and the limit is capped"""
+        for name in ('Alpha', 'Bravo', 'Bravo', 'Charlie'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'limit': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data], ['Charlie', 'Bravo'])
+
+        res = self.client.get(next_page_url(res))
+
+        self.assertEqual([t['name'] for t in res.data], ['Bravo', 'Alpha'])
+        self.assertIsNone(next_page_url(res))
+
+    def test_tags_paged_through_ties(self):
+        """Test pages keyed on (name, id) visit tags sharing a name once"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Bravo'] * 5 + ['Alpha'] * 2
+        ]
+
+        pages, url = [], f'{TAGS_URL}?limit=2'
+        while url:
+            res = self.client.get(url)
+            pages.append([t['id'] for t in res.data])
+            url = next_page_url(res)
+        previous = re.search(r'<([^>]+)>; rel="prev"', res['Link']).group(1)
+
+        self.assertEqual(
+            [pk for page in pages for pk in page], [t.id for t in tags]
+        )
+        self.assertEqual(
+            [t['id'] for t in self.client.get(previous).data], pages[-2]
+        )
+
+    def test_tampered_cursor(self):
+        """Test cursors with values of the wrong type are not found"""
+        Tag.objects.create(user=self.user, name='Alpha')
+        for position in (['a', 'zzz'], [['a'], {'b': 1}], ['a', None]):
+            cursor = base64.b64encode(
+                f'p={json.dumps(position)}'.encode()
+            ).decode()
+
+            res = self.client.get(TAGS_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_tag_successful(self):
         """Test creating a new tag"""
         payload = {'name': 'Simple'}
@@ -96,6 +149,7 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
+        tag1.refresh_from_db()
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
         self.assertIn(serializer1.data, res.data)
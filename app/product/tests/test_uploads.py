@@ -0,0 +1,193 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUpload, Product
+from product import uploads
+
+
+def image_upload_url(product_id):
+    return reverse('product:product-upload-image', args=[product_id])
+
+
+def session_url(product_id, upload_id=None):
+    if upload_id is None:
+        return reverse('product:product-image-upload', args=[product_id])
+    return reverse(
+        'product:product-image-upload-chunk', args=[product_id, upload_id]
+    )
+
+
+def jpeg(size=(10, 10)):
+    """Return the bytes of a generated JPEG"""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@patch('product.views.enqueue_product_image')
+class UploadTests(TestCase):
+    """Test streaming and resumable image uploads"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        settings = override_settings(MEDIA_ROOT=self.root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('user', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            user=self.user, title='Sample product', time_minutes=10,
+            price=5.00
+        )
+
+    def _post(self, content, name='image.jpg'):
+        file = BytesIO(content)
+        file.name = name
+        return self.client.post(
+            image_upload_url(self.product.id), {'image': file},
+            format='multipart'
+        )
+
+    def _partials(self):
+        return os.listdir(os.path.join(self.root.name, uploads.PARTIAL_DIR))
+
+    def _patch(self, upload_id, offset, chunk):
+        return self.client.generic(
+            'PATCH', session_url(self.product.id, upload_id), chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_streamed_upload(self, enqueue):
+        """Test an upload is stored under its digest without partials"""
+        content = jpeg()
+
+        res = self._post(content, name='photo.JPEG')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            self.product.image.name, f'uploads/product/{digest}.jpg'
+        )
+        with self.product.image.open() as file:
+            self.assertEqual(file.read(), content)
+        self.assertEqual(self._partials(), [])
+        enqueue.assert_called_once()
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large(self, enqueue):
+        """Test an upload over the byte limit is refused"""
+        res = self._post(jpeg() + bytes(100))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertEqual(self._partials(), [])
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.image)
+
+    def test_not_an_image(self, enqueue):
+        """Test a file that isn't an image is refused"""
+        res = self._post(b'%PDF-1.4 not an image', name='file.jpg')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.assertEqual(self._partials(), [])
+
+    @override_settings(IMAGE_MAX_PIXELS=99)
+    def test_too_many_pixels(self, enqueue):
+        """Test an image over the pixel limit is refused from its header"""
+        res = self._post(jpeg(size=(10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        enqueue.assert_not_called()
+
+    def test_resumable_upload(self, enqueue):
+        """Test an image sent in chunks is set once complete"""
+        content = jpeg(size=(200, 200))
+        middle = len(content) // 2
+
+        res = self.client.post(
+            session_url(self.product.id), {'size': len(content)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        upload_id = res.data['id']
+
+        res = self._patch(upload_id, 0, content[:middle])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Upload-Offset'], str(middle))
+        res = self.client.get(session_url(self.product.id, upload_id))
+        self.assertEqual(res.data['offset'], middle)
+
+        res = self._patch(upload_id, middle, content[middle:])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('image', res.data)
+        self.product.refresh_from_db()
+        with self.product.image.open() as file:
+            self.assertEqual(file.read(), content)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self._partials(), [])
+
+    def test_offset_conflict(self, enqueue):
+        """Test a chunk that doesn't start at the offset is refused"""
+        content = jpeg()
+        upload = ImageUpload.objects.create(
+            user=self.user, product=self.product, size=len(content)
+        )
+        self._patch(upload.id, 0, content[:10])
+
+        res = self._patch(upload.id, 0, content[:10])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 10)
+
+    def test_session_too_large(self, enqueue):
+        """Test sessions can't be started for oversized images"""
+        with self.settings(IMAGE_MAX_UPLOAD_SIZE=100):
+            res = self.client.post(
+                session_url(self.product.id), {'size': 101}
+            )
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def test_session_of_other_user(self, enqueue):
+        """Test sessions are private to the user who started them"""
+        other = get_user_model().objects.create_user('other', 'testpass')
+        upload = ImageUpload.objects.create(
+            user=other, product=self.product, size=10
+        )
+
+        res = self.client.get(session_url(self.product.id, upload.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_partials_not_served(self, enqueue):
+        """Test partial upload files can't be downloaded"""
+        upload = ImageUpload.objects.create(
+            user=self.user, product=self.product, size=100
+        )
+        self._patch(upload.id, 0, jpeg()[:10])
+
+        res = self.client.get(
+            reverse('media', args=[f'{uploads.PARTIAL_DIR}/{upload.id.hex}'
+                                   '.part'])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,138 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Attribute, Product, Tag
+from core.tests.utils import PRODUCT_URL, detail_url, sample_attribute, \
+    sample_product, sample_tag
+
+
+BULK_URL = reverse('product:product-bulk')
+TAGS_URL = reverse('product:tag-list')
+
+
+class UsageCountTests(TestCase):
+    """Test the maintained product counts of tags and attributes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(self.user, 'Wood')
+        self.other_tag = sample_tag(self.user, 'Metal')
+        self.attribute = sample_attribute(self.user)
+
+    def assertCounts(self, tag, other_tag, attribute=None):
+        self.assertEqual(
+            Tag.objects.get(pk=self.tag.pk).product_count, tag
+        )
+        self.assertEqual(
+            Tag.objects.get(pk=self.other_tag.pk).product_count, other_tag
+        )
+        if attribute is not None:
+            self.assertEqual(
+                Attribute.objects.get(pk=self.attribute.pk).product_count,
+                attribute
+            )
+
+    def test_m2m_changes(self):
+        """Test adding, removing and clearing links through the ORM"""
+        first = sample_product(user=self.user)
+        second = sample_product(user=self.user)
+
+        first.tags.add(self.tag, self.other_tag)
+        second.tags.add(self.tag)
+        first.attributes.add(self.attribute)
+        self.assertCounts(2, 1, 1)
+
+        first.tags.remove(self.tag)
+        self.assertCounts(1, 1)
+
+        first.tags.clear()
+        self.assertCounts(1, 0)
+
+        self.other_tag.product_set.add(first, second)
+        self.assertCounts(1, 2)
+
+        self.other_tag.product_set.clear()
+        self.assertCounts(1, 0)
+
+    def test_api_writes(self):
+        """Test creating, updating and deleting products via the API"""
+        res = self.client.post(PRODUCT_URL, {
+            'title': 'Desk', 'time_minutes': 5, 'price': '10.00',
+            'tags': [self.tag.id], 'attributes': [self.attribute.id],
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(1, 0, 1)
+
+        url = detail_url(res.data['id'])
+        self.client.patch(url, {'tags': [self.other_tag.id]})
+        self.assertCounts(0, 1)
+
+        self.client.delete(url)
+        self.assertCounts(0, 0, 0)
+
+    def test_bulk_writes(self):
+        """Test the bulk endpoint keeps the counts up to date"""
+        res = self.client.post(BULK_URL, [
+            {'title': f'Product {i}', 'time_minutes': 1, 'price': '1.00',
+             'tags': [self.tag.id], 'attributes': [self.attribute.id]}
+            for i in range(3)
+        ], format='json')
+        ids = [result['id'] for result in res.data['results']]
+        self.assertCounts(3, 0, 3)
+
+        self.client.patch(BULK_URL, [
+            {'id': ids[0], 'tags': [self.other_tag.id]},
+        ], format='json')
+        self.assertCounts(2, 1, 3)
+
+        self.client.delete(BULK_URL, ids[1:], format='json')
+        self.assertCounts(0, 1, 1)
+
+    def test_orm_deletes(self):
+        """Test deleting products outside the API, as the admin does"""
+        first = sample_product(user=self.user)
+        second = sample_product(user=self.user)
+        third = sample_product(user=self.user)
+        for product in (first, second, third):
+            product.tags.add(self.tag)
+        third.attributes.add(self.attribute)
+
+        first.delete()
+        self.assertCounts(2, 0, 1)
+
+        Product.objects.filter(pk__in=[second.pk, third.pk]).delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_assigned_only_and_count(self):
+        """Test tags list their product count and filter on it"""
+        sample_product(user=self.user).tags.add(self.tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            res.data, [{'id': self.tag.id, 'name': 'Wood', 'product_count': 1}]
+        )
+
+    def test_reconcile(self):
+        """Test the reconciliation command fixes drifted counts"""
+        sample_product(user=self.user).tags.add(self.tag)
+        Tag.objects.filter(pk=self.tag.pk).update(product_count=5)
+        Tag.objects.filter(pk=self.other_tag.pk).update(product_count=2)
+        out = io.StringIO()
+
+        call_command('reconcile_usage_counts', stdout=out)
+
+        self.assertCounts(1, 0)
+        self.assertIn('tags: 2 fixed', out.getvalue())
+        self.assertIn('attributes: 0 fixed', out.getvalue())
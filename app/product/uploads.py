@@ -0,0 +1,283 @@
+"""Streaming, size-bounded product image uploads
+
+Upload bytes go straight to a partial file next to the media files, are
+hashed as they arrive and moved to their content-addressed name once
+complete, so no upload is held in memory. The format and dimensions are
+read from the first bytes with Pillow, which parses the header without
+decoding any pixels; uploads over IMAGE_MAX_UPLOAD_SIZE bytes or
+IMAGE_MAX_PIXELS pixels, or in another format, are refused as soon as
+that is known.
+
+Images can also be sent in pieces through resumable upload sessions
+(core.models.ImageUpload), which keep their partial file between
+requests.
+"""
+import datetime
+import fcntl
+import hashlib
+import os
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import exceptions, status
+
+from core.models import ImageUpload
+
+
+# Formats accepted, with the extension they are stored under
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+# Bytes read before giving up on finding the image header
+SNIFF_BYTES = 256 * 1024
+PARTIAL_DIR = '.uploads'
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('The image is too large.')
+    default_code = 'too_large'
+
+
+class OffsetConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'offset_conflict'
+
+    def __init__(self, offset):
+        super().__init__(
+            {'detail': _('The chunk must start at the current offset.')}
+        )
+        # Kept a number for clients to resume from
+        self.detail['offset'] = offset
+
+
+def invalid_image(message=None):
+    return exceptions.ValidationError({'image': [message or _(
+        'Upload a valid image. The file you uploaded was either not an '
+        'image or a corrupted image.'
+    )]})
+
+
+def sniff(head):
+    """Return the format, width and height of an image from its start
+
+    Returns None while `head` is too short to tell, and raises a
+    ValidationError for an unsupported format or too many pixels.
+    """
+    too_many_pixels = invalid_image(_(
+        'The image has more than %(pixels)d pixels.'
+    ) % {'pixels': settings.IMAGE_MAX_PIXELS})
+    try:
+        image = Image.open(BytesIO(head))
+    except Image.DecompressionBombError:
+        raise too_many_pixels
+    except (OSError, SyntaxError, ValueError):
+        if len(head) >= SNIFF_BYTES:
+            raise invalid_image()
+        return None
+
+    if image.format not in IMAGE_FORMATS:
+        raise invalid_image()
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise too_many_pixels
+    return image.format, width, height
+
+
+def partial_path(name):
+    """Return the path of a partial upload file"""
+    directory = default_storage.path(PARTIAL_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{name}.part')
+
+
+def store(path, image_format, digest=None):
+    """Move a complete upload to its content-addressed storage name
+
+    Returns the storage name; an identical image already stored is kept
+    and the upload dropped.
+    """
+    if digest is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    name = os.path.join(
+        'uploads/product/',
+        f'{digest.hexdigest()}.{IMAGE_FORMATS[image_format]}'
+    )
+
+    final_path = default_storage.path(name)
+    if os.path.exists(final_path):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(path, final_path)
+    return name
+
+
+class StoredImage:
+    """An uploaded image already in storage, as found in request.FILES"""
+
+    def __init__(self, name, size, image_format, width, height):
+        self.name = name
+        self.size = size
+        self.format = image_format
+        self.width = width
+        self.height = height
+
+    def close(self):
+        pass
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """Stream the `image` file of a multipart body to storage"""
+    field_name = 'image'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.path = None
+        self.file = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Leave room for the multipart headers around the file
+        if content_length > settings.IMAGE_MAX_UPLOAD_SIZE + CHUNK_SIZE:
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name or self.file is not None:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.path = partial_path(uuid.uuid4().hex)
+        self.file = open(self.path, 'wb')
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.sniffed = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.cleanup()
+            raise UploadTooLarge()
+        if self.sniffed is None:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            try:
+                self.sniffed = sniff(self.head)
+            except exceptions.ValidationError:
+                self.cleanup()
+                raise
+
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.close()
+        try:
+            if self.sniffed is None:
+                raise invalid_image()
+        except exceptions.ValidationError:
+            self.cleanup()
+            raise
+
+        name = store(self.path, self.sniffed[0], self.digest)
+        self.path = None
+        return StoredImage(name, file_size, *self.sniffed)
+
+    def cleanup(self):
+        """Remove the partial file of an upload that didn't complete"""
+        if self.file is not None:
+            self.file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+def expire_sessions():
+    """Drop upload sessions and partial files older than their TTL
+
+    Partial files are swept by age too, which catches those left by
+    interrupted streaming uploads and by deleted products.
+    """
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.IMAGE_UPLOAD_SESSION_TTL
+    )
+    ImageUpload.objects.filter(created__lt=cutoff).delete()
+
+    directory = os.path.dirname(partial_path('x'))
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.stat().st_mtime < cutoff.timestamp():
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def session_offset(upload):
+    """Return the number of bytes received for an upload session"""
+    try:
+        return os.path.getsize(partial_path(upload.id.hex))
+    except FileNotFoundError:
+        return 0
+
+
+def append_chunk(upload, offset, stream, length):
+    """Append `length` bytes of the stream to an upload session
+
+    The chunk must start at the session's current offset, and only one
+    chunk is written at a time. Returns the new offset and, once the
+    first bytes show an acceptable image, its format and dimensions.
+    """
+    if offset + length > upload.size:
+        raise exceptions.ValidationError(
+            {'detail': _('The chunk runs past the declared size.')}
+        )
+
+    path = partial_path(upload.id.hex)
+    with open(path, 'ab') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetConflict(session_offset(upload))
+        current = os.fstat(file.fileno()).st_size
+        if offset != current:
+            raise OffsetConflict(current)
+
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            file.write(chunk)
+            remaining -= len(chunk)
+        file.flush()
+        new_offset = file.tell()
+
+    with open(path, 'rb') as file:
+        head = file.read(SNIFF_BYTES)
+    try:
+        sniffed = sniff(head)
+        if sniffed is None and new_offset >= upload.size:
+            raise invalid_image()
+    except exceptions.ValidationError:
+        os.remove(path)
+        upload.delete()
+        raise
+    return new_offset, sniffed
+
+
+def finish_session(upload, sniffed):
+    """Store the completed image of an upload session and end it"""
+    name = store(partial_path(upload.id.hex), sniffed[0])
+    upload.delete()
+    return name
@@ -0,0 +1,103 @@
+"""Product counts of tags and attributes
+
+`Tag.product_count` and `Attribute.product_count` are recounted from the
+join tables for the rows a write touched: from signals when product tags
+or attributes change through the ORM or a product is deleted (including
+admin and user cascades), and explicitly by the bulk paths, which bypass
+those signals or would recount once per product. Recounting rather than
+adding and subtracting keeps concurrent writers from drifting the
+counts; the `reconcile_usage_counts` command repairs anything else.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Attribute, Product, Tag
+
+
+# Counted model -> (join table, its column pointing at the model)
+RELATIONS = {
+    Tag: (Product.tags.through, 'tag_id'),
+    Attribute: (Product.attributes.through, 'attribute_id'),
+}
+
+_batch = threading.local()
+
+
+def model_for_through(through):
+    """Return the counted model of a product join table"""
+    for model, (relation, column) in RELATIONS.items():
+        if relation is through:
+            return model
+
+
+def linked_ids(product_ids):
+    """Map each counted model to the IDs linked to the given products"""
+    linked = {}
+    for model, (through, column) in RELATIONS.items():
+        linked[model] = set(through.objects.filter(
+            product_id__in=product_ids
+        ).values_list(column, flat=True).distinct())
+
+    return linked
+
+
+def refresh_usage_counts(model, ids):
+    """Recount the products linked to the given tags or attributes"""
+    ids = list(ids)
+    if not ids:
+        return
+
+    through, column = RELATIONS[model]
+    counts = through.objects.filter(
+        **{column: OuterRef('pk')}
+    ).order_by().values(column).annotate(count=Count('*')).values('count')
+    model.objects.filter(pk__in=ids).update(
+        product_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()), 0
+        ),
+        updated_at=timezone.now()
+    )
+
+
+def refresh_linked(linked):
+    """Recount every ID of a `linked_ids` style mapping"""
+    for model, ids in linked.items():
+        refresh_usage_counts(model, ids)
+
+
+def in_batch():
+    """Return whether deleted products are recounted by `deleting`"""
+    return getattr(_batch, 'active', False)
+
+
+@contextmanager
+def deleting(product_ids):
+    """Recount the links of products deleted in the block all at once
+
+    The per-product delete signals stand down meanwhile, so deleting
+    thousands of products costs a few queries rather than a few each.
+    """
+    linked = linked_ids(product_ids)
+    _batch.active = True
+    try:
+        yield
+    finally:
+        _batch.active = False
+    refresh_linked(linked)
+
+
+def reconcile(model, user=None):
+    """Fix the counts that drifted and return how many were wrong"""
+    queryset = model.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    wrong = list(queryset.annotate(
+        actual=Count('product')
+    ).exclude(product_count=F('actual')).values_list('pk', flat=True))
+    refresh_usage_counts(model, wrong)
+
+    return len(wrong)
@@ -1,29 +1,46 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.text import compress_sequence
+from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import IntegerField, ListField
 from rest_framework.response import Response
-from core.models import Tag, Attribute, Product
+from rest_framework.settings import api_settings
+from core.models import Tag, Attribute, ImageUpload, Product
 
-from product import serializers
+from product import export, serializers, uploads, usage
+from product.cache import CachedResponseMixin
+from product.images import delete_variants, enqueue_product_image
+from product.pagination import AttributePagination, ProductPagination
+from product.parsers import NDJSONParser
+from product.search import refresh_search_vectors, search_products
+from product.sync import SyncMixin
+from user.authentication import CachedTokenAuthentication
 
 
-class BaseAttributeViewSet(viewsets.GenericViewSet,
+class BaseAttributeViewSet(SyncMixin, viewsets.GenericViewSet,
                            mixins.ListModelMixin,
                            mixins.CreateModelMixin):
     """Base viewset for user owned attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = AttributePagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get('assigned_only'))
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(product__isnull=False)
+            queryset = queryset.filter(product_count__gt=0)
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
 
     def perform_create(self, serializer):
         """Create a new object"""
@@ -42,37 +59,104 @@ class AttributeViewSet(BaseAttributeViewSet):
     serializer_class = serializers.AttributeSerializer
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedResponseMixin, SyncMixin, viewsets.ModelViewSet):
     """Manage products in the database"""
     serializer_class = serializers.ProductSerializer
     queryset = Product.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = ProductPagination
+    throttle_scope = 'products'
+    # Read-only actions rendered from `.values()` rows when
+    # API_FAST_SERIALIZERS is on; the output is the same either way
+    values_serializer_classes = {
+        'list': serializers.ProductValuesSerializer,
+        'retrieve': serializers.ProductDetailValuesSerializer,
+    }
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError(_('Expected a comma separated list of IDs'))
+
+    def _filter_related(self, queryset, through, field, ids, match_all):
+        """Filter products through an M2M table without joining it
+
+        The matching product IDs are resolved in a subquery on the join
+        table, so products never fan out into duplicate rows and no
+        DISTINCT is needed over the product columns.
+        """
+        ids = set(ids)
+        rows = through.objects.filter(**{f'{field}__in': ids})
+        if match_all:
+            rows = rows.values('product_id').annotate(
+                matched=Count(field)
+            ).filter(matched=len(ids))
+
+        return queryset.filter(id__in=rows.values('product_id'))
 
     def get_queryset(self):
         """Retrieve the products for the authenticated user"""
         tags = self.request.query_params.get('tags')
         attributes = self.request.query_params.get('attributes')
-        queryset = self.queryset
+        match_all = self.request.query_params.get('match') == 'all'
+        queryset = self.queryset.filter(user=self.request.user)
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, Product.tags.through, 'tag_id',
+                tag_ids, match_all
+            )
         if attributes:
             attribute_ids = self._params_to_ints(attributes)
-            queryset = queryset.filter(ingredients__id__in=attribute_ids)
+            queryset = self._filter_related(
+                queryset, Product.attributes.through, 'attribute_id',
+                attribute_ids, match_all
+            )
+
+        return self._prefetch_related(queryset)
 
-        return self.queryset.filter(user=self.request.user)
+    def _prefetch_related(self, queryset):
+        """Prefetch the relations the action's serializer renders
+
+        The list/write serializer only renders related primary keys, so the
+        prefetch loads IDs alone; the detail serializer nests full objects.
+        The fast-path serializers read `.values()` rows and fetch the
+        relations themselves.
+        """
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, serializers.ProductValuesSerializer):
+            return queryset.values(*serializer_class.value_fields())
+        if not issubclass(serializer_class, serializers.ProductSerializer):
+            return queryset
+
+        if issubclass(serializer_class, serializers.ProductDetailSerializer):
+            fields = ('id', 'name', 'product_count')
+        else:
+            fields = ('id',)
+
+        return queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only(*fields).order_by(
+                'id'
+            )),
+            Prefetch('attributes', queryset=Attribute.objects.only(
+                *fields
+            ).order_by('id')),
+        )
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
+        if settings.API_FAST_SERIALIZERS and \
+                self.action in self.values_serializer_classes:
+            return self.values_serializer_classes[self.action]
         if self.action == 'retrieve':
             return serializers.ProductDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'image_upload_chunk'):
             return serializers.ProductImageSerializer
+        elif self.action == 'bulk':
+            return serializers.ProductBulkSerializer
 
         return self.serializer_class
 
@@ -80,23 +164,246 @@ class ProductViewSet(viewsets.ModelViewSet):
         """Create a new product"""
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        """Update a product"""
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        """Delete a product"""
+        instance.delete()
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to a product"""
+        """Upload an image to a product
+
+        The file is streamed to storage as it arrives, see product.uploads.
+        """
         product = self.get_object()
-        serializer = self.get_serializer(
-            product,
-            data=request.data
+        handler = uploads.StreamingImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        try:
+            image = request.FILES.get('image')
+        finally:
+            handler.cleanup()
+        if image is None:
+            raise uploads.invalid_image()
+
+        return self._set_image(product, image.name)
+
+    @action(methods=['POST'], detail=True, url_path='image-upload')
+    def image_upload(self, request, pk=None):
+        """Start a resumable upload of an image of `size` bytes"""
+        product = self.get_object()
+        field = IntegerField(min_value=1)
+        try:
+            size = field.run_validation(request.data.get('size'))
+        except ValidationError as exc:
+            raise ValidationError({'size': exc.detail})
+        if size > settings.IMAGE_MAX_UPLOAD_SIZE:
+            raise uploads.UploadTooLarge()
+
+        uploads.expire_sessions()
+        upload = ImageUpload.objects.create(
+            user=request.user, product=product, size=size
+        )
+        return Response(
+            {'id': upload.id, 'size': size, 'offset': 0},
+            status=status.HTTP_201_CREATED
         )
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+    @action(methods=['GET', 'PATCH'], detail=True,
+            url_path=r'image-upload/(?P<upload_id>[0-9a-f-]+)')
+    def image_upload_chunk(self, request, pk=None, upload_id=None):
+        """Report the offset of a resumable upload or append a chunk to it
+
+        A chunk is the raw request body and its `Upload-Offset` header must
+        match the bytes received so far. The image is set on the product
+        once all of them have arrived.
+        """
+        product = self.get_object()
+        try:
+            upload = ImageUpload.objects.get(
+                id=upload_id, user=request.user, product=product
             )
+        except (ImageUpload.DoesNotExist, DjangoValidationError):
+            raise NotFound()
+
+        if request.method == 'GET':
+            offset = uploads.session_offset(upload)
+            return self._upload_progress(upload, offset)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': _(
+                'Send the Upload-Offset and Content-Length headers.'
+            )})
+        offset, sniffed = uploads.append_chunk(
+            upload, offset, request.stream, length
+        )
+        if offset < upload.size:
+            return self._upload_progress(upload, offset)
+
+        return self._set_image(product, uploads.finish_session(
+            upload, sniffed
+        ))
+
+    def _upload_progress(self, upload, offset):
+        response = Response(
+            {'id': upload.id, 'size': upload.size, 'offset': offset}
+        )
+        response['Upload-Offset'] = offset
+        return response
+
+    def _set_image(self, product, name):
+        """Give the product a stored image and schedule its variants"""
+        if product.image.name and product.image.name != name:
+            previous = Product(
+                id=product.id, image=product.image.name,
+                image_variants=product.image_variants
+            )
+            transaction.on_commit(lambda: delete_variants(previous))
+        product.image = name
+        product.image_variants = ''
+        product.save(update_fields=['image', 'image_variants', 'updated_at'])
+        enqueue_product_image(product)
+        serializer = self.get_serializer(product)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False)
+    def search(self, request):
+        """Return the products best matching the `q` search text
+
+        Results are ranked, so instead of cursor pages the top `limit`
+        matches are returned.
+        """
+        text = request.query_params.get('q', '')
+        paginator = self.paginator
+        limit = paginator.get_page_size(request)
+
+        queryset = search_products(self.get_queryset(), text)[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream the user's whole catalog as NDJSON, CSV or a JSON array
+
+        Pick the format with `?output=ndjson|csv|json`; the stream is gzipped
+        on the fly when the client accepts gzip encoding.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.EXPORT_FORMATS:
+            raise ValidationError(
+                {'output': [_('Expected one of: ndjson, csv, json')]}
+            )
+
+        content_type, render = export.EXPORT_FORMATS[output]
+        rows = export.iter_products(
+            Product.objects.filter(user=request.user),
+            settings.EXPORT_CHUNK_SIZE
+        )
+        stream = render(rows)
+
+        gzipped = export.accepts_gzip(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if gzipped:
+            stream = compress_sequence(stream)
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = \
+            f'attachment; filename="products.{output}"'
+        response['Vary'] = 'Accept-Encoding'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False,
+            parser_classes=api_settings.DEFAULT_PARSER_CLASSES + [
+                NDJSONParser
+            ])
+    def bulk(self, request):
+        """Create, update or delete a batch of products in one transaction
+
+        Items that fail validation are reported by index and skipped unless
+        `?atomic=true` is passed, in which case nothing is written.
+        """
+        atomic = request.query_params.get('atomic') in ('1', 'true')
+
+        with transaction.atomic():
+            if request.method == 'DELETE':
+                results, errors = self._bulk_delete(request.data, atomic)
+            else:
+                results, errors = self._bulk_save(request, atomic)
+
+            if atomic and errors:
+                return Response(
+                    {'results': [], 'errors': errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        if results:
+            if request.method != 'DELETE':
+                refresh_search_vectors(
+                    [r['id'] for r in results], user_id=request.user.id
+                )
+            self.invalidate_cache()
 
         return Response(
-            serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
+            {'results': results, 'errors': errors},
+            status=status.HTTP_200_OK
         )
+
+    def _bulk_save(self, request, atomic):
+        """Validate the payload and write the valid products"""
+        user_products = Product.objects.filter(user=request.user)
+        partial = request.method == 'PATCH'
+        serializer = self.get_serializer(
+            user_products if partial else None,
+            data=request.data,
+            many=True,
+            partial=partial
+        )
+        serializer.is_valid(raise_exception=True)
+
+        errors = [
+            {'index': index, 'errors': detail}
+            for index, detail in sorted(serializer.item_errors.items())
+        ]
+        if atomic and errors:
+            return [], errors
+
+        saved = serializer.save(user=request.user)
+        results = [
+            {'index': index, 'id': product.id} for index, product in saved
+        ]
+        return results, errors
+
+    def _bulk_delete(self, data, atomic):
+        """Delete the products whose IDs are listed in the payload"""
+        field = ListField(child=IntegerField())
+        ids = field.run_validation(data)
+
+        products = Product.objects.filter(user=self.request.user, id__in=ids)
+        found = set(products.values_list('id', flat=True))
+        results, errors, listed = [], [], {}
+        for index, pk in enumerate(ids):
+            if pk not in found:
+                message = _('Not found.')
+            elif pk in listed:
+                message = _('Already listed at index {index}.').format(
+                    index=listed[pk]
+                )
+            else:
+                listed[pk] = index
+                results.append({'index': index, 'id': pk})
+                continue
+            errors.append({'index': index, 'errors': {'id': [message]}})
+        if atomic and errors:
+            return [], errors
+
+        with usage.deleting(found):
+            products.delete()
+        return results, errors
@@ -0,0 +1,209 @@
+"""Token authentication with a cache of token -> user lookups"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import AuthToken
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """LRU cache of authenticated tokens with a TTL
+
+    Entries live in process memory, or, when a cache alias is given, only
+    in that shared Django cache: a token deleted, rotated or deactivated
+    in one worker must not stay valid in the others' memory. Local tokens
+    are stored pickled so every request gets its own copy of the user.
+    The shared cache holds just the user id and timestamps, never the
+    user's password hash; the user is loaded when the token is used.
+    """
+
+    def __init__(self, max_size, ttl, alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared_key(self, key):
+        return f'auth:token:{key}'
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        """Return the cached token for the key or None"""
+        token = None
+        if self.alias:
+            entry = self.shared.get(self._shared_key(key))
+            if entry is not None:
+                user_id, created, expires_at = entry
+                token = AuthToken(
+                    key=key, user_id=user_id, created=created,
+                    expires_at=expires_at
+                )
+        else:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    token = entry[2]
+            if token is not None:
+                token = pickle.loads(token)
+
+        with self._lock:
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return token
+
+    def set(self, token):
+        """Cache a token, with its user loaded when kept in this process"""
+        if self.alias:
+            self.shared.set(
+                self._shared_key(token.key),
+                (token.user_id, token.created, token.expires_at), self.ttl
+            )
+        else:
+            data = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+            self._store(token.key, token.user_id, data)
+
+    def _store(self, key, user_id, data):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user_id, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        """Drop the given token keys"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.alias:
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+
+    def delete_user(self, user_id, keys=()):
+        """Drop every token of a user
+
+        Keys in the shared cache must be passed in, since only the local
+        cache can be searched by user.
+        """
+        with self._lock:
+            local = [
+                key for key, entry in self._entries.items()
+                if entry[1] == user_id
+            ]
+        self.delete(*set(local) | set(keys))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+
+class LastUsedRecorder:
+    """Batch the last_used_at writes of authenticated tokens
+
+    Keys used since the last write are collected in memory and written in
+    one UPDATE at most every `interval` seconds, by whichever request
+    comes after the interval is up.
+    """
+    batch_size = 500
+
+    def __init__(self, interval, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._keys = set()
+        self._flushed_at = clock()
+        self._lock = threading.Lock()
+
+    def touch(self, key):
+        """Note that a token was just used"""
+        with self._lock:
+            self._keys.add(key)
+            if self.clock() - self._flushed_at < self.interval:
+                return
+            keys = self._take()
+        self.write(keys)
+
+    def flush(self):
+        """Write every pending key now"""
+        with self._lock:
+            keys = self._take()
+        self.write(keys)
+
+    def _take(self):
+        keys, self._keys = self._keys, set()
+        self._flushed_at = self.clock()
+        return keys
+
+    def write(self, keys):
+        keys = sorted(keys)
+        now = timezone.now()
+        try:
+            for i in range(0, len(keys), self.batch_size):
+                AuthToken.objects.filter(
+                    key__in=keys[i:i + self.batch_size]
+                ).update(last_used_at=now)
+        except DatabaseError:
+            # Bookkeeping only; never fail the request over it
+            logger.warning('Could not record token use', exc_info=True)
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+    alias=settings.TOKEN_CACHE_ALIAS,
+)
+last_used = LastUsedRecorder(settings.AUTH_TOKEN_LAST_USED_INTERVAL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Expiring token authentication that skips the query on cache hits"""
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(token)
+
+        if token.expired:
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        # Loads the user of a token from the shared cache
+        if not token.user.is_active:
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        last_used.touch(key)
+        return (token.user, token)
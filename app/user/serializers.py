@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 
+from core.models import AuthToken
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object"""
@@ -51,3 +53,12 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class TokenSerializer(serializers.ModelSerializer):
+    """Serializer for an issued auth token"""
+    token = serializers.CharField(source='key')
+
+    class Meta:
+        model = AuthToken
+        fields = ('token', 'expires_at')
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import AuthToken
+from user.authentication import token_cache
+
+
+@receiver(post_save, sender=AuthToken)
+@receiver(post_delete, sender=AuthToken)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a token from the cache when it is rotated or deleted"""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Drop a user's tokens so changes like deactivation apply at once"""
+    keys = ()
+    if token_cache.alias:
+        keys = AuthToken.objects.filter(user_id=instance.pk).values_list(
+            'key', flat=True
+        )
+    token_cache.delete_user(instance.pk, keys)
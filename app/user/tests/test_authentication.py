@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+from user.authentication import TokenCache, last_used, token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        last_used.flush()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123',
+            name='Test'
+        )
+        self.token = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test that the token query only runs on the first request"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(
+            token_cache.stats(), {'hits': 1, 'misses': 1, 'size': 1}
+        )
+
+    def test_deleted_token_rejected(self):
+        """Test that deleting a token invalidates the cached entry"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a user invalidates their tokens"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_refreshes_cached_user(self):
+        """Test that updating the profile is visible on the next request"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Renamed'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Renamed')
+
+
+class TokenCacheTests(TestCase):
+    """Test the token cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'Testpass123'
+        )
+
+    def _token(self, key):
+        return AuthToken(key=key, user=self.user)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used token is evicted first"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set(self._token('a'))
+        cache.set(self._token('b'))
+        cache.get('a')
+
+        cache.set(self._token('c'))
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c').user.email, self.user.email)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """Test that tokens expire after the TTL"""
+        monotonic.return_value = 100
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.set(self._token('a'))
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_delete_user(self):
+        """Test dropping every token of a user"""
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.set(self._token('a'))
+        cache.set(self._token('b'))
+
+        cache.delete_user(self.user.pk)
+
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_shared_cache_only(self):
+        """Test a token dropped by one worker is gone for every worker"""
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        worker, other = (TokenCache(10, 60, alias='default') for _ in 'ab')
+        worker.set(self._token('a'))
+        self.assertIsNotNone(other.get('a'))
+
+        other.delete('a')
+
+        self.assertIsNone(worker.get('a'))
+
+    def test_shared_cache_holds_no_user(self):
+        """Test the shared entry holds ids, not the user's password hash"""
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        cache = TokenCache(10, 60, alias='default')
+        cache.set(self._token('a'))
+
+        entry = caches['default'].get('auth:token:a')
+        self.assertNotIn(self.user.password, repr(entry))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get('a').user.email, self.user.email)
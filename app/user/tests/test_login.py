@@ -0,0 +1,181 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashers
+from user.throttles import LoginAccountRateThrottle
+
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+ADMIN_LOGIN_URL = reverse('admin:login')
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'core.hashers.PBKDF2PasswordHasher',
+    'core.hashers.PBKDF2SHA1PasswordHasher',
+], PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    """Test password hashing and throttling of logins"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'testpass'
+        )
+        self.payload = {'email': 'test@gmail.com', 'password': 'testpass'}
+
+    def test_rehash_legacy_hasher(self):
+        """Test a password hashed by a later hasher is upgraded on login"""
+        self.user.password = make_password('testpass', hasher='pbkdf2_sha1')
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_rehash_new_cost(self):
+        """Test changing the hashing cost upgrades hashes on login"""
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1200):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1200$'))
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_hashing_busy(self):
+        """Test logins fail fast when every hashing slot is taken"""
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with hashers.hashing_slot():
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait(5)
+        try:
+            res = self.client.post(TOKEN_URL, self.payload)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(
+            self.client.post(TOKEN_URL, self.payload).status_code,
+            status.HTTP_200_OK
+        )
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_hashing_busy_admin_login(self):
+        """Test logins outside the API get a 503 too when hashing is busy"""
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with hashers.hashing_slot():
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait(5)
+        try:
+            res = self.client.post(ADMIN_LOGIN_URL, {
+                'username': 'test@gmail.com', 'password': 'testpass'
+            })
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    @override_settings(
+        PASSWORD_HASH_CONCURRENCY=1, PASSWORD_HASH_MAX_WAITING=1,
+        PASSWORD_HASH_WAIT_TIMEOUT=5
+    )
+    def test_hashing_queue_bounded(self):
+        """Test only PASSWORD_HASH_MAX_WAITING hashes wait for a slot"""
+        held, release, queued = threading.Event(), threading.Event(), []
+
+        def hold():
+            with hashers.hashing_slot():
+                held.set()
+                release.wait(5)
+
+        def wait():
+            with hashers.hashing_slot():
+                queued.append(True)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait(5)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        while not hashers._waiting:
+            time.sleep(0.001)
+        try:
+            with self.assertRaises(hashers.HashingBusy):
+                with hashers.hashing_slot():
+                    pass
+        finally:
+            release.set()
+            holder.join()
+            waiter.join()
+
+        self.assertEqual(queued, [True])
+
+    def test_throttle_account(self):
+        """Test token requests for one account are rate limited"""
+        with patch.object(
+            LoginAccountRateThrottle, 'rate', '2/min', create=True
+        ):
+            codes = [
+                self.client.post(TOKEN_URL, self.payload).status_code
+                for _ in range(3)
+            ]
+            other = self.client.post(
+                TOKEN_URL, {'email': 'other@gmail.com', 'password': 'x'}
+            )
+
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_list_body(self):
+        """Test a token request with a JSON list is refused, not a 500"""
+        res = self.client.post(TOKEN_URL, [1, 2], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_throttle_signup(self):
+        """Test a client address can only create so many accounts
+
+        However the client sets X-Forwarded-For without a proxy in front.
+        """
+        codes = [
+            self.client.post(CREATE_USER_URL, {
+                'email': f'new{i}@gmail.com', 'password': 'testpass',
+                'name': 'New'
+            }, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i in range(11)
+        ]
+
+        self.assertEqual(codes, [201] * 10 + [429])
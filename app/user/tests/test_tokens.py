@@ -0,0 +1,133 @@
+import datetime
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken
+from user.authentication import LastUsedRecorder, last_used, token_cache
+
+
+TOKEN_URL = reverse('user:token')
+ROTATE_URL = reverse('user:token-rotate')
+ME_URL = reverse('user:me')
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class AuthTokenTests(TestCase):
+    """Test expiring and rotating auth tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        last_used.flush()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'testpass'
+        )
+        self.client = APIClient()
+
+    def login(self):
+        return self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'}
+        )
+
+    def test_token_reused_until_expired(self):
+        """Test logging in again returns the current token until it expires"""
+        first = self.login().data
+        second = self.login().data
+
+        self.assertEqual(first, second)
+        token = AuthToken.objects.get(key=first['token'])
+        self.assertGreater(token.expires_at, timezone.now())
+
+        token.expires_at = timezone.now()
+        token.save()
+        third = self.login().data
+
+        self.assertNotEqual(third['token'], first['token'])
+
+    def test_expired_token_rejected(self):
+        """Test an expired token is refused even while it is cached"""
+        token = AuthToken.objects.issue(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        later = token.expires_at + datetime.timedelta(seconds=1)
+        with patch('core.models.timezone.now', return_value=later):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(res.data['detail']), 'Token has expired.')
+
+    def test_rotate(self):
+        """Test rotating swaps the request token for a new one"""
+        old = AuthToken.objects.issue(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {old.key}')
+        self.client.get(ME_URL)
+
+        res = self.client.post(ROTATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], old.key)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+    def test_rotate_requires_token(self):
+        """Test rotating needs an authenticated request"""
+        res = self.client.post(ROTATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_last_used_batched(self):
+        """Test token use is written once per interval for every token"""
+        clock = FakeClock()
+        recorder = LastUsedRecorder(interval=60, clock=clock)
+        first, second = (
+            AuthToken.objects.issue(self.user) for _ in range(2)
+        )
+
+        with self.assertNumQueries(0):
+            recorder.touch(first.key)
+            recorder.touch(second.key)
+        clock.now = 61
+        with self.assertNumQueries(1):
+            recorder.touch(first.key)
+
+        self.assertEqual(
+            AuthToken.objects.filter(last_used_at__isnull=False).count(), 2
+        )
+
+    def test_prune_tokens(self):
+        """Test pruning deletes only the expired tokens, in chunks"""
+        valid = AuthToken.objects.issue(self.user)
+        for _ in range(3):
+            AuthToken.objects.create(
+                user=self.user, expires_at=timezone.now()
+            )
+
+        out = io.StringIO()
+        call_command('prune_tokens', chunk_size=2, stdout=out)
+
+        self.assertIn('Deleted 3 expired tokens', out.getvalue())
+        self.assertEqual(
+            list(AuthToken.objects.values_list('key', flat=True)),
+            [valid.key]
+        )
@@ -0,0 +1,45 @@
+import hashlib
+from collections.abc import Mapping
+
+from rest_framework.throttling import BaseThrottle
+
+from core.throttling import BucketRateThrottle
+
+
+class LoginRateThrottle(BucketRateThrottle):
+    """Limit the token requests of one client address
+
+    Login buckets are kept in the default cache, so that with a shared one
+    the limits hold across workers even when the API's buckets don't.
+    """
+    scope = 'login'
+    cache_alias = 'default'
+
+    def get_ident(self, request):
+        # By address even when the request carries a token
+        return BaseThrottle.get_ident(self, request)
+
+
+class LoginAccountRateThrottle(BucketRateThrottle):
+    """Limit the token requests for one account from any address"""
+    scope = 'login_account'
+    cache_alias = 'default'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': hashlib.sha256(
+                email.strip().lower().encode()
+            ).hexdigest(),
+        }
+
+
+class SignupRateThrottle(LoginRateThrottle):
+    """Limit the accounts one client address creates"""
+    scope = 'signup'
@@ -1,24 +1,57 @@
-from rest_framework import generics, authentication, permissions
+from django.db import transaction
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from user.serializers import UserSerializer, AuthTokenSerializer
+from rest_framework.views import APIView
+
+from core.models import AuthToken
+from user.authentication import CachedTokenAuthentication
+from user.serializers import UserSerializer, AuthTokenSerializer, \
+    TokenSerializer
+from user.throttles import LoginAccountRateThrottle, LoginRateThrottle, \
+    SignupRateThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    throttle_classes = (SignupRateThrottle,)
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginRateThrottle, LoginAccountRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """Return the user's current token, issuing one if it expired"""
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        token = AuthToken.objects.current(serializer.validated_data['user'])
+        return Response(TokenSerializer(token).data)
+
+
+class RotateTokenView(APIView):
+    """Replace the token of the request with a new one"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'token'
+
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            token = AuthToken.objects.issue(request.user)
+            request.auth.delete()
+        return Response(TokenSerializer(token).data)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):